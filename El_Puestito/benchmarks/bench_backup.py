@@ -0,0 +1,100 @@
+"""
+Latencia de creacion de ordenes mientras corre un respaldo en linea. Compara la
+linea base (sin respaldo) contra el respaldo en un solo paso (todas las paginas de
+una vez) y contra el respaldo por pasos pequenos con pausa entre pasos.
+
+Uso (desde El_Puestito/):
+    python -m benchmarks.bench_backup --historico 300000 --ordenes 300
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import threading
+import statistics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+_tmp_dir = tempfile.mkdtemp()
+_bench_db = os.path.join(_tmp_dir, "puestito.db")
+os.environ['PUESTITO_DB_PATH'] = _bench_db
+os.environ.setdefault('APPDATA', tempfile.gettempdir())
+
+from src.database.connection import db_manager
+from src.database.schema_manager import SchemaManager
+from src.database.repositories.orders import OrderRepository
+from src.database.backup import BackupManager
+
+def poblar(historico):
+    menu_ids = [r['id_item'] for r in db_manager.fetchall("SELECT id_item FROM menu_items WHERE disponible = 1;")]
+    with db_manager.transaction() as cursor:
+        for o in range(historico // 5):
+            cursor.execute(
+                "INSERT INTO ordenes (mesa_key, estado, fecha_apertura, fecha_cierre, client_uuid) VALUES ('1', 'cerrada', datetime('now'), datetime('now'), ?);",
+                (f"hist-{o}",)
+            )
+            id_orden = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO orden_detalle (id_orden, id_item_menu, cantidad, precio_unitario_congelado, nombre_congelado, notas, destino, estado_item) VALUES (?, ?, 1, 4500, 'Platillo', ?, 'cocina', 'listo');",
+                [(id_orden, menu_ids[i % len(menu_ids)], "x" * 40) for i in range(5)]
+            )
+    return menu_ids
+
+def crear_ordenes(repo, menu_ids, cantidad, etiqueta):
+    tiempos = []
+    for n in range(cantidad):
+        orden = {
+            "numero_mesa": str(n % 20 + 1),
+            "order_id": f"{etiqueta}-{n}",
+            "items": [{"item_id": menu_ids[(n + i) % len(menu_ids)], "cantidad": 1, "notas": ""} for i in range(4)],
+        }
+        t0 = time.perf_counter()
+        repo.create_new_order(orden)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return tiempos
+
+def resumen(tiempos):
+    tiempos = sorted(tiempos)
+    return f"p50={statistics.median(tiempos):6.2f}ms p95={tiempos[int(len(tiempos) * 0.95) - 1]:6.2f}ms max={tiempos[-1]:7.2f}ms"
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--historico", type=int, default=300000)
+    parser.add_argument("--ordenes", type=int, default=300)
+    args = parser.parse_args()
+
+    SchemaManager()
+    menu_ids = poblar(args.historico)
+    repo = OrderRepository()
+    paginas = db_manager.fetchone("PRAGMA page_count;")["page_count"]
+    print(f"Base: {args.historico} lineas historicas, {paginas} paginas")
+
+    print(f"{'sin respaldo':>24}: {resumen(crear_ordenes(repo, menu_ids, args.ordenes, 'base'))}")
+
+    escenarios = (
+        ("respaldo de un paso", {"pages_per_step": 10 ** 9, "pause_ms": 0}),
+        ("respaldo por pasos", {"pages_per_step": 256, "pause_ms": 5}),
+    )
+    for etiqueta, ajustes in escenarios:
+        backup = BackupManager(settings={**ajustes, "directory": os.path.join(_tmp_dir, "backups"), "keep": 2})
+        resultado = {}
+        hilo = threading.Thread(target=lambda: resultado.update(backup.run()[0]))
+        tiempos = []
+        hilo.start()
+        n = 0
+        while hilo.is_alive() or not tiempos:
+            tiempos += crear_ordenes(repo, menu_ids, 1, f"{etiqueta}-{n}")
+            n += 1
+        hilo.join()
+        print(f"{etiqueta:>24}: {resumen(tiempos)} | {len(tiempos)} ordenes durante el respaldo | "
+              f"respaldo {resultado.get('duration_ms')}ms integrity={resultado.get('integrity')}")
+
+    db_manager.close_all()
+    shutil.rmtree(_tmp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Simula una rafaga de viernes por la noche: muchos hilos de Werkzeug atendiendo
+peticiones de meseros, cada una abre su conexion, hace un par de consultas y la
+libera en el teardown de Flask. Compara el costo por peticion con y sin pool.
+
+Uso (desde El_Puestito/):
+    python -m benchmarks.bench_connection_pool --meseros 30 --peticiones 40
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+import threading
+import statistics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+_fd, _bootstrap_db = tempfile.mkstemp(suffix='.db')
+os.environ.setdefault('PUESTITO_DB_PATH', _bootstrap_db)
+os.environ.setdefault('APPDATA', tempfile.gettempdir())
+
+from src.database.connection import DatabaseManager
+
+def preparar_db(path):
+    db = DatabaseManager(db_path=path, settings={"pool": {"enabled": False}})
+    db.execute("CREATE TABLE IF NOT EXISTS ordenes (id_orden INTEGER PRIMARY KEY, mesa_key TEXT, estado TEXT, fecha_apertura TEXT);")
+    for i in range(200):
+        db.execute("INSERT INTO ordenes (mesa_key, estado, fecha_apertura) VALUES (?, 'activa', datetime('now'));", (str(i % 30),))
+    db.close_all()
+
+def simular_rafaga(db, meseros, peticiones):
+    tiempos_overhead = []
+    lock = threading.Lock()
+
+    def mesero():
+        # Cada peticion corre en un hilo nuevo, como Werkzeug con threaded=True.
+        for _ in range(peticiones):
+            def peticion():
+                t0 = time.perf_counter()
+                db.get_conn()
+                t1 = time.perf_counter()
+                db.fetchall("SELECT mesa_key, COUNT(*) FROM ordenes WHERE estado = 'activa' GROUP BY mesa_key;")
+                t2 = time.perf_counter()
+                db.close_conn_for_thread()
+                t3 = time.perf_counter()
+                with lock:
+                    tiempos_overhead.append(((t1 - t0) + (t3 - t2)) * 1e6)
+            hilo = threading.Thread(target=peticion)
+            hilo.start()
+            hilo.join()
+
+    hilos = [threading.Thread(target=mesero) for _ in range(meseros)]
+    inicio = time.perf_counter()
+    for h in hilos: h.start()
+    for h in hilos: h.join()
+    total = time.perf_counter() - inicio
+    return tiempos_overhead, total
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--meseros", type=int, default=30)
+    parser.add_argument("--peticiones", type=int, default=40)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    preparar_db(path)
+
+    for etiqueta, pool in (("sin pool", {"enabled": False}), ("con pool", {"enabled": True, "min_size": 4, "max_size": 16})):
+        db = DatabaseManager(db_path=path, settings={"pool": pool})
+        tiempos, total = simular_rafaga(db, args.meseros, args.peticiones)
+        tiempos.sort()
+        p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+        print(f"{etiqueta:>9}: {len(tiempos)} peticiones en {total:.2f}s | "
+              f"overhead conexion p50={statistics.median(tiempos):.1f}us p95={p95:.1f}us")
+        if db.pool:
+            print(f"           stats: {db.pool_stats()}")
+        db.close_all()
+
+    os.unlink(path)
+    os.close(_fd)
+    os.unlink(_bootstrap_db)
+
+if __name__ == "__main__":
+    main()
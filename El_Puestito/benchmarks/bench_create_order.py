@@ -0,0 +1,107 @@
+"""
+Tiempo que create_new_order retiene el candado de escritura (BEGIN IMMEDIATE ->
+COMMIT) para una orden de 20 renglones con inventario automatico. Compara la
+resolucion renglon por renglon (dos SELECT y un UPDATE por item) contra la
+version actual (menu desde el catalogo en memoria, un IN (...) para stock y un
+executemany para descontarlo).
+
+Uso (desde El_Puestito/):
+    python -m benchmarks.bench_create_order --ordenes 500 --renglones 20
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import statistics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['PUESTITO_DB_PATH'] = os.path.join(_tmp_dir, "puestito.db")
+os.environ.setdefault('APPDATA', tempfile.gettempdir())
+
+from src.database.connection import db_manager
+from src.database.schema_manager import SchemaManager
+from src.database.repositories.orders import OrderRepository
+
+def insertar_por_renglon(cursor, orden):
+    # Copia de la version anterior de _insert_order: consultas y descuento item por item.
+    cursor.execute(
+        "INSERT INTO ordenes (mesa_key, estado, fecha_apertura, client_uuid, proformas_impresas) VALUES (?, 'activa', datetime('now'), ?, 0);",
+        (str(orden['numero_mesa']), orden['order_id'])
+    )
+    id_orden = cursor.lastrowid
+    detalle_batch = []
+    for item in orden['items']:
+        item_id, cantidad = item['item_id'], item['cantidad']
+        cursor.execute("""
+            SELECT i.id_item, i.nombre, i.precio, i.precio_michelada, c.destino, i.disponible
+            FROM menu_items i
+            JOIN menu_categorias c ON i.id_categoria = c.id_categoria
+            WHERE i.id_item = ?
+        """, (item_id,))
+        menu_item = cursor.fetchone()
+        cursor.execute("SELECT cantidad, es_automatico FROM inventario WHERE id_menu_vinculado = ?", (item_id,))
+        stock_info = cursor.fetchone()
+        if stock_info and stock_info['es_automatico']:
+            if stock_info['cantidad'] < cantidad:
+                raise ValueError("Stock insuficiente")
+            cursor.execute("UPDATE inventario SET cantidad = cantidad - ? WHERE id_menu_vinculado = ?", (cantidad, item_id))
+        detalle_batch.append((id_orden, item_id, cantidad, menu_item['precio'], menu_item['nombre'], None, '', menu_item['destino'], None, None))
+    cursor.executemany(
+        "INSERT INTO orden_detalle (id_orden, id_item_menu, cantidad, precio_unitario_congelado, nombre_congelado, imagen_congelada, notas, destino, id_cerveza, nombre_cerveza) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
+        detalle_batch
+    )
+
+def medir(insertar, menu_ids, ordenes, renglones, etiqueta):
+    tiempos = []
+    for n in range(ordenes):
+        orden = {
+            "numero_mesa": str(n % 20 + 1),
+            "order_id": f"{etiqueta}-{n}",
+            "items": [{"item_id": menu_ids[(n + i) % len(menu_ids)], "cantidad": 1, "notas": ""} for i in range(renglones)],
+        }
+        t0 = time.perf_counter()
+        with db_manager.transaction() as cursor:
+            insertar(cursor, orden)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return tiempos
+
+def resumen(tiempos):
+    tiempos = sorted(tiempos)
+    return f"p50={statistics.median(tiempos):6.3f}ms p95={tiempos[int(len(tiempos) * 0.95) - 1]:6.3f}ms"
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ordenes", type=int, default=500)
+    parser.add_argument("--renglones", type=int, default=20)
+    args = parser.parse_args()
+
+    SchemaManager()
+    menu_ids = [r['id_item'] for r in db_manager.fetchall("SELECT id_item FROM menu_items WHERE disponible = 1;")]
+    with db_manager.transaction() as cursor:
+        cursor.executemany(
+            "INSERT INTO inventario (nombre, cantidad, es_automatico, id_menu_vinculado) VALUES (?, 1000000, 1, ?);",
+            [(f"Stock {item_id}", item_id) for item_id in menu_ids]
+        )
+    print(f"Orden de {args.renglones} renglones sobre {len(menu_ids)} productos con inventario automatico")
+
+    repo = OrderRepository()
+    escenarios = (
+        ("renglon por renglon", insertar_por_renglon),
+        ("catalogo + lotes", repo._insert_order),
+    )
+    for etiqueta, insertar in escenarios:
+        medir(insertar, menu_ids, 20, args.renglones, f"calentamiento-{etiqueta}")
+        tiempos = medir(insertar, menu_ids, args.ordenes, args.renglones, etiqueta)
+        print(f"{etiqueta:>20}: candado retenido {resumen(tiempos)}")
+
+    db_manager.close_all()
+    shutil.rmtree(_tmp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Consultas calientes de caja y KDS sobre una base con mucho historial: compara los
+indices de tabla completa (migraciones 001/003) contra los indices parciales de la
+migracion 004 (solo ordenes activas / detalles pendientes). Reporta tiempos y el
+tamano de cada indice en paginas.
+
+Uso (desde El_Puestito/):
+    python -m benchmarks.bench_partial_indexes --historico 500000 --mesas 25
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+import statistics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+_fd, _bench_db = tempfile.mkstemp(suffix='.db')
+os.close(_fd)
+os.environ['PUESTITO_DB_PATH'] = _bench_db
+os.environ.setdefault('APPDATA', tempfile.gettempdir())
+
+from src.database.connection import db_manager
+from src.database.schema_manager import SchemaManager
+from src.database.repositories.orders import OrderRepository
+from src.database.active_orders import active_orders
+
+ITEMS_POR_ORDEN = 5
+
+def poblar(historico, mesas):
+    menu_ids = [r['id_item'] for r in db_manager.fetchall("SELECT id_item FROM menu_items;")]
+    with db_manager.transaction() as cursor:
+        for o in range(historico // ITEMS_POR_ORDEN):
+            cursor.execute(
+                "INSERT INTO ordenes (mesa_key, estado, fecha_apertura, fecha_cierre, client_uuid) VALUES (?, 'cerrada', datetime('now', ?), datetime('now', ?), ?);",
+                (str(o % 20 + 1), f"-{o // 150} days", f"-{o // 150} days", f"hist-{o}")
+            )
+            id_orden = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO orden_detalle (id_orden, id_item_menu, cantidad, precio_unitario_congelado, nombre_congelado, destino, estado_item) VALUES (?, ?, 1, 4500, 'Platillo', ?, 'listo');",
+                [(id_orden, menu_ids[(o + i) % len(menu_ids)], 'cocina' if i % 2 else 'barra') for i in range(ITEMS_POR_ORDEN)]
+            )
+        for m in range(mesas):
+            cursor.execute(
+                "INSERT INTO ordenes (mesa_key, estado, fecha_apertura, client_uuid) VALUES (?, 'activa', datetime('now'), ?);",
+                (f"{m + 1}", f"activa-{m}")
+            )
+            id_orden = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO orden_detalle (id_orden, id_item_menu, cantidad, precio_unitario_congelado, nombre_congelado, destino, estado_item) VALUES (?, ?, 1, 4500, 'Platillo', ?, ?);",
+                [(id_orden, menu_ids[i % len(menu_ids)], 'cocina' if i % 2 else 'barra', 'pendiente' if i < 4 else 'listo') for i in range(8)]
+            )
+
+def indices_completos():
+    with db_manager.transaction() as cursor:
+        cursor.execute("DROP INDEX IF EXISTS idx_ordenes_activas_mesa;")
+        cursor.execute("DROP INDEX IF EXISTS idx_detalle_pendiente_destino;")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orden_detalle_estado_item ON orden_detalle(estado_item);")
+
+def indices_parciales():
+    from src.database.migrator import migration_runner
+    db_manager.execute("PRAGMA user_version = 3;")
+    migration_runner.apply_pending()
+
+def tamano_indices():
+    filas = db_manager.fetchall("""
+        SELECT name, COUNT(*) AS paginas FROM dbstat
+        WHERE name IN ('idx_orden_detalle_estado_item', 'idx_detalle_pendiente_destino', 'idx_ordenes_activas_mesa', 'idx_ordenes_estado_fecha_cierre')
+        GROUP BY name;
+    """)
+    return {f['name']: f['paginas'] for f in filas}
+
+def medir(repo, repeticiones):
+    consultas = {
+        "KDS cocina": repo.get_active_cocina_orders,
+        "caja (rebuild)": active_orders.rebuild,
+        "buscar mesa activa": lambda: db_manager.fetchone("SELECT id_orden FROM ordenes WHERE mesa_key = ? AND estado = 'activa'", ("7",)),
+    }
+    resultados = {}
+    for nombre, consulta in consultas.items():
+        consulta()
+        tiempos = []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            consulta()
+            tiempos.append((time.perf_counter() - t0) * 1e6)
+        resultados[nombre] = statistics.median(tiempos)
+    return resultados
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--historico", type=int, default=500000)
+    parser.add_argument("--mesas", type=int, default=25)
+    parser.add_argument("--repeticiones", type=int, default=200)
+    args = parser.parse_args()
+
+    SchemaManager()
+    t0 = time.perf_counter()
+    poblar(args.historico, args.mesas)
+    print(f"Base: {args.historico} lineas historicas + {args.mesas} mesas activas ({time.perf_counter() - t0:.1f}s para generar)")
+    repo = OrderRepository()
+
+    for etiqueta, preparar in (("indices completos", indices_completos), ("indices parciales", indices_parciales)):
+        preparar()
+        tiempos = medir(repo, args.repeticiones)
+        detalle = " | ".join(f"{k} p50={v:8.1f}us" for k, v in tiempos.items())
+        print(f"{etiqueta:>18}: {detalle}")
+        try:
+            print(f"{'':>18}  paginas por indice: {tamano_indices()}")
+        except Exception:
+            pass
+
+    db_manager.close_all()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(_bench_db + suffix):
+            os.unlink(_bench_db + suffix)
+
+if __name__ == "__main__":
+    main()
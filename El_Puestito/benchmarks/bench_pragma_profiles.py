@@ -0,0 +1,107 @@
+"""
+Compara los perfiles de database.performance con una carga parecida al servicio:
+transacciones cortas de creacion de orden (orden + 4 lineas + descuento de
+inventario) y un reporte de ventas sobre el historial. Mide ordenes/s, latencia
+de commit y el tamano que alcanza el WAL.
+
+Uso (desde El_Puestito/):
+    python -m benchmarks.bench_pragma_profiles --ordenes 3000 --historico 200000
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import statistics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['PUESTITO_DB_PATH'] = os.path.join(_tmp_dir, "bootstrap.db")
+os.environ.setdefault('APPDATA', tempfile.gettempdir())
+
+from src.database.connection import DatabaseManager
+from src.database.checkpoint import CheckpointScheduler
+
+ESQUEMA = (
+    "CREATE TABLE ordenes (id_orden INTEGER PRIMARY KEY AUTOINCREMENT, mesa_key TEXT NOT NULL, estado TEXT NOT NULL, fecha_apertura TEXT NOT NULL, fecha_cierre TEXT);",
+    "CREATE TABLE orden_detalle (id_detalle INTEGER PRIMARY KEY AUTOINCREMENT, id_orden INTEGER NOT NULL, id_item_menu TEXT NOT NULL, cantidad INTEGER NOT NULL, precio INTEGER NOT NULL, notas TEXT);",
+    "CREATE TABLE inventario (id_menu_vinculado TEXT PRIMARY KEY, cantidad INTEGER NOT NULL);",
+    "CREATE INDEX idx_ordenes_estado_fecha_cierre ON ordenes(estado, fecha_cierre);",
+    "CREATE INDEX idx_orden_detalle_id_orden ON orden_detalle(id_orden);",
+)
+
+def preparar(path, historico):
+    db = DatabaseManager(db_path=path, settings={"performance": {"profile": "default"}, "instrumentation": {"enabled": False}})
+    with db.transaction() as cursor:
+        for sql in ESQUEMA:
+            cursor.execute(sql)
+        cursor.executemany("INSERT INTO inventario VALUES (?, 1000000);", [(f"item_{i}",) for i in range(50)])
+        for o in range(historico // 4):
+            cursor.execute("INSERT INTO ordenes (mesa_key, estado, fecha_apertura, fecha_cierre) VALUES ('1', 'cerrada', datetime('now', ?), datetime('now', ?));",
+                           (f"-{o % 365} days", f"-{o % 365} days"))
+            cursor.executemany("INSERT INTO orden_detalle (id_orden, id_item_menu, cantidad, precio, notas) VALUES (?, ?, 1, 4500, 'sin cebolla');",
+                               [(cursor.lastrowid, f"item_{(o + i) % 50}") for i in range(4)])
+    db.close_all()
+    CheckpointScheduler(db=db, settings={}).checkpoint("TRUNCATE")
+
+def carga(db, ordenes):
+    tiempos = []
+    wal_max = 0
+    for n in range(ordenes):
+        t0 = time.perf_counter()
+        with db.transaction() as cursor:
+            cursor.execute("INSERT INTO ordenes (mesa_key, estado, fecha_apertura) VALUES (?, 'activa', datetime('now'));", (str(n % 20),))
+            id_orden = cursor.lastrowid
+            for i in range(4):
+                item = f"item_{(n + i) % 50}"
+                cursor.execute("INSERT INTO orden_detalle (id_orden, id_item_menu, cantidad, precio, notas) VALUES (?, ?, 1, 4500, '');", (id_orden, item))
+                cursor.execute("UPDATE inventario SET cantidad = cantidad - 1 WHERE id_menu_vinculado = ?;", (item,))
+        tiempos.append((time.perf_counter() - t0) * 1000)
+        if n % 100 == 0:
+            wal_max = max(wal_max, os.path.getsize(db.db_path + "-wal"))
+    return tiempos, wal_max
+
+def reporte(db):
+    t0 = time.perf_counter()
+    db.fetchall("""
+        SELECT DATE(o.fecha_cierre) AS fecha, SUM(d.cantidad * d.precio) AS total
+        FROM ordenes o JOIN orden_detalle d ON o.id_orden = d.id_orden
+        WHERE o.estado = 'cerrada' AND o.fecha_cierre >= date('now', '-90 days') AND o.fecha_cierre < date('now', '+1 day')
+        GROUP BY fecha;
+    """)
+    return (time.perf_counter() - t0) * 1000
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ordenes", type=int, default=3000)
+    parser.add_argument("--historico", type=int, default=200000)
+    args = parser.parse_args()
+
+    plantilla = os.path.join(_tmp_dir, "plantilla.db")
+    preparar(plantilla, args.historico)
+
+    for perfil in ("default", "balanced", "throughput"):
+        path = os.path.join(_tmp_dir, f"{perfil}.db")
+        shutil.copy(plantilla, path)
+        db = DatabaseManager(db_path=path, settings={"performance": {"profile": perfil}, "instrumentation": {"enabled": False}})
+        t0 = time.perf_counter()
+        tiempos, wal_max = carga(db, args.ordenes)
+        total = time.perf_counter() - t0
+        tiempos.sort()
+        reporte(db)
+        con_wal = statistics.median(reporte(db) for _ in range(5))
+        CheckpointScheduler(db=db, settings={}).checkpoint("PASSIVE")
+        sin_wal = statistics.median(reporte(db) for _ in range(5))
+        print(f"{perfil:>10}: {args.ordenes / total:7.0f} ordenes/s | commit p50={statistics.median(tiempos):5.2f}ms "
+              f"p99={tiempos[int(len(tiempos) * 0.99) - 1]:5.2f}ms max={tiempos[-1]:6.2f}ms | "
+              f"WAL max={wal_max / 1024 / 1024:5.1f} MiB | reporte 90 dias={con_wal:6.1f}ms (tras checkpoint {sin_wal:6.1f}ms)")
+        db.close_all()
+
+    shutil.rmtree(_tmp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
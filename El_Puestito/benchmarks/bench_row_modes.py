@@ -0,0 +1,128 @@
+"""
+Mide cuanto cuesta armar un snapshot de ordenes activas (lo que la caja pide en
+cada refresco) con la materializacion vieja (dict por fila + copia a dict) contra
+el modo record que usa ActiveOrdersStore al reconstruirse. Reporta tiempo y memoria asignada por snapshot usando
+tracemalloc.
+
+Uso (desde El_Puestito/):
+    python -m benchmarks.bench_row_modes --mesas 40 --items 12 --repeticiones 200
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+import tracemalloc
+import statistics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+_fd, _bench_db = tempfile.mkstemp(suffix='.db')
+os.close(_fd)
+os.environ['PUESTITO_DB_PATH'] = _bench_db
+os.environ.setdefault('APPDATA', tempfile.gettempdir())
+
+from src.database.connection import db_manager
+from src.database.schema_manager import SchemaManager
+from src.database.active_orders import active_orders
+
+QUERY_CAJA = """
+SELECT
+    o.id_orden, o.mesa_key, o.fecha_apertura,
+    d.id_detalle, d.cantidad, d.precio_unitario_congelado AS precio_unitario,
+    d.nombre_congelado AS nombre, d.imagen_congelada AS imagen,
+    d.notas, d.id_item_menu AS item_id, d.estado_item, d.nombre_cerveza
+FROM ordenes o
+LEFT JOIN orden_detalle d ON o.id_orden = d.id_orden
+WHERE o.estado = 'activa'
+ORDER BY o.fecha_apertura;
+"""
+
+def snapshot_legacy():
+    # Implementacion previa: dict por fila en fetchall y luego otro dict por item.
+    rows = db_manager.fetchall(QUERY_CAJA)
+    caja_data = {}
+    for row in rows:
+        mesa_key = row['mesa_key']
+        if mesa_key not in caja_data:
+            caja_data[mesa_key] = {'id_orden_db': row['id_orden'], 'fecha_apertura': row['fecha_apertura'], 'items': []}
+        if row['id_detalle'] is not None:
+            caja_data[mesa_key]['items'].append({
+                'id_detalle': row['id_detalle'], 'item_id': row['item_id'],
+                'nombre': row['nombre'], 'cantidad': row['cantidad'],
+                'precio_unitario': row['precio_unitario'] / 100.0, 'imagen': row['imagen'],
+                'notas': row['notas'], 'estado_item': row['estado_item'],
+                'nombre_cerveza': row['nombre_cerveza']
+            })
+    return caja_data
+
+def poblar(mesas, items):
+    menu_ids = [r['id_item'] for r in db_manager.fetchall("SELECT id_item FROM menu_items;")]
+    if not menu_ids:
+        db_manager.execute("INSERT OR IGNORE INTO menu_categorias (nombre) VALUES ('Bench');")
+        db_manager.execute("INSERT INTO menu_items (id_item, id_categoria, nombre, precio) SELECT 'bench_1', id_categoria, 'Bench', 4500 FROM menu_categorias WHERE nombre = 'Bench';")
+        menu_ids = ['bench_1']
+    with db_manager.transaction() as cursor:
+        for m in range(mesas):
+            cursor.execute(
+                "INSERT INTO ordenes (mesa_key, estado, fecha_apertura, client_uuid) VALUES (?, 'activa', datetime('now'), ?)",
+                (f"{m + 1}", f"bench-{m}")
+            )
+            id_orden = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO orden_detalle (id_orden, id_item_menu, cantidad, precio_unitario_congelado, nombre_congelado, notas, destino) VALUES (?, ?, ?, ?, ?, ?, 'cocina')",
+                [(id_orden, menu_ids[i % len(menu_ids)], 1 + i % 3, 4500 + i, f"Platillo {i}", "sin cebolla" if i % 4 == 0 else "") for i in range(items)]
+            )
+
+def medir(funcion, repeticiones):
+    funcion()
+    tiempos, picos = [], []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - t0) * 1e6)
+
+    tracemalloc.start()
+    for _ in range(min(repeticiones, 20)):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+        picos.append(pico - base)
+    tracemalloc.stop()
+
+    # Conteo de bloques vivos al final de un snapshot, sin el ruido de tracemalloc en el loop.
+    tracemalloc.start()
+    antes = tracemalloc.take_snapshot()
+    resultado = funcion()
+    despues = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    bloques = sum(stat.count_diff for stat in despues.compare_to(antes, 'filename') if stat.count_diff > 0)
+    del resultado
+    return statistics.median(tiempos), statistics.median(picos), bloques
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mesas", type=int, default=40)
+    parser.add_argument("--items", type=int, default=12)
+    parser.add_argument("--repeticiones", type=int, default=200)
+    args = parser.parse_args()
+
+    SchemaManager()
+    poblar(args.mesas, args.items)
+    assert snapshot_legacy() == active_orders.rebuild()
+
+    print(f"Snapshot de caja: {args.mesas} mesas x {args.items} items ({args.mesas * args.items} filas)")
+    for etiqueta, funcion in (("dict por fila", snapshot_legacy), ("record (rebuild)", active_orders.rebuild)):
+        mediana_us, pico_bytes, bloques = medir(funcion, args.repeticiones)
+        print(f"{etiqueta:>17}: p50={mediana_us:8.1f}us | pico memoria={pico_bytes / 1024:8.1f} KiB | bloques retenidos={bloques}")
+
+    db_manager.close_all()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(_bench_db + suffix):
+            os.unlink(_bench_db + suffix)
+
+if __name__ == "__main__":
+    main()
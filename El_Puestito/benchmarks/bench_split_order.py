@@ -0,0 +1,132 @@
+"""
+Dividir una cuenta de grupo de 40 renglones en 8 subcuentas (5 renglones cada una,
+mitad completos y mitad parciales). Compara el movimiento renglon por renglon (un
+SELECT * y una o dos escrituras por item) contra la version actual (una consulta
+de validacion y escrituras por lote), y mide split_order completo por cuenta.
+
+Uso (desde El_Puestito/):
+    python -m benchmarks.bench_split_order --rondas 200
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import statistics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ['PUESTITO_DB_PATH'] = os.path.join(_tmp_dir, "puestito.db")
+os.environ.setdefault('APPDATA', tempfile.gettempdir())
+
+from src.database.connection import db_manager
+from src.database.schema_manager import SchemaManager
+from src.database.repositories.orders import OrderRepository
+
+RENGLONES = 40
+CUENTAS = 8
+
+def mover_por_renglon(cursor, id_origen, id_destino, items):
+    # Copia de la version anterior de split_order: validacion y escrituras item por item.
+    for item in items:
+        id_detalle = item['id_detalle']
+        qty_split = int(item['cantidad'])
+        row = cursor.execute("SELECT * FROM orden_detalle WHERE id_detalle = ? AND id_orden = ?", (id_detalle, id_origen)).fetchone()
+        if not row or row['cantidad'] < qty_split:
+            raise ValueError(f"Item invalido {id_detalle}")
+        if row['cantidad'] == qty_split:
+            cursor.execute("UPDATE orden_detalle SET id_orden = ? WHERE id_detalle = ?", (id_destino, id_detalle))
+        else:
+            cursor.execute("UPDATE orden_detalle SET cantidad = cantidad - ? WHERE id_detalle = ?", (qty_split, id_detalle))
+            cursor.execute("""
+                INSERT INTO orden_detalle (id_orden, id_item_menu, cantidad, precio_unitario_congelado, nombre_congelado, imagen_congelada, notas, destino, estado_item, id_cerveza, nombre_cerveza)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (id_destino, row['id_item_menu'], qty_split, row['precio_unitario_congelado'], row['nombre_congelado'], row['imagen_congelada'], row['notas'], row['destino'], row['estado_item'], row['id_cerveza'], row['nombre_cerveza']))
+
+def crear_grupo(repo, menu_ids, etiqueta):
+    id_orden = repo.create_new_order({
+        "numero_mesa": "1",
+        "mesas_enlazadas": ["2", "3"],
+        "order_id": etiqueta,
+        "items": [{"item_id": menu_ids[i % len(menu_ids)], "cantidad": 2, "notas": ""} for i in range(RENGLONES)],
+    })
+    detalles = [r['id_detalle'] for r in db_manager.fetchall("SELECT id_detalle FROM orden_detalle WHERE id_orden = ? ORDER BY id_detalle;", (id_orden,))]
+    # Cuenta k: 5 renglones, los pares completos y los impares a la mitad.
+    repartos = [
+        [{"id_detalle": d, "cantidad": 2 if j % 2 == 0 else 1} for j, d in enumerate(detalles[k::CUENTAS])]
+        for k in range(CUENTAS)
+    ]
+    return id_orden, repartos
+
+def cerrar_grupo():
+    with db_manager.transaction() as cursor:
+        cursor.execute("UPDATE ordenes SET estado = 'cerrada', fecha_cierre = datetime('now') WHERE estado = 'activa';")
+        cursor.execute("UPDATE cuentas SET estado = 'cerrada' WHERE estado = 'abierta';")
+
+def medir_movimiento(repo, mover, menu_ids, rondas, etiqueta):
+    tiempos = []
+    for r in range(rondas):
+        id_origen, repartos = crear_grupo(repo, menu_ids, f"{etiqueta}-{r}")
+        destinos = []
+        with db_manager.transaction() as cursor:
+            for k in range(CUENTAS):
+                cursor.execute(
+                    "INSERT INTO ordenes (mesa_key, estado, fecha_apertura, client_uuid) VALUES (?, 'activa', datetime('now'), ?);",
+                    (f"bench-{etiqueta}-{r}-{k}", f"{etiqueta}-{r}-{k}")
+                )
+                destinos.append(cursor.lastrowid)
+        t0 = time.perf_counter()
+        with db_manager.transaction() as cursor:
+            for id_destino, items in zip(destinos, repartos):
+                mover(cursor, id_origen, id_destino, items)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+        cerrar_grupo()
+    return tiempos
+
+def medir_split_order(repo, menu_ids, rondas, etiqueta):
+    tiempos = []
+    for r in range(rondas):
+        _, repartos = crear_grupo(repo, menu_ids, f"{etiqueta}-{r}")
+        for items in repartos:
+            t0 = time.perf_counter()
+            if not repo.split_order("1+2+3", items):
+                raise RuntimeError("split_order fallo")
+            tiempos.append((time.perf_counter() - t0) * 1000)
+        cerrar_grupo()
+    return tiempos
+
+def resumen(tiempos):
+    tiempos = sorted(tiempos)
+    return f"p50={statistics.median(tiempos):6.3f}ms p95={tiempos[int(len(tiempos) * 0.95) - 1]:6.3f}ms"
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rondas", type=int, default=200)
+    args = parser.parse_args()
+
+    SchemaManager()
+    menu_ids = [r['id_item'] for r in db_manager.fetchall("SELECT id_item FROM menu_items WHERE disponible = 1;")]
+    repo = OrderRepository()
+    print(f"Cuenta de grupo con {RENGLONES} renglones dividida en {CUENTAS} subcuentas")
+
+    escenarios = (
+        ("renglon por renglon", mover_por_renglon),
+        ("validacion + lotes", repo._move_lines),
+    )
+    for etiqueta, mover in escenarios:
+        medir_movimiento(repo, mover, menu_ids, 5, f"calentamiento-{etiqueta}")
+        tiempos = medir_movimiento(repo, mover, menu_ids, args.rondas, etiqueta)
+        print(f"{etiqueta:>20}: 8 movimientos en un candado {resumen(tiempos)}")
+
+    medir_split_order(repo, menu_ids, 5, "calentamiento-split")
+    print(f"{'split_order':>20}: por subcuenta {resumen(medir_split_order(repo, menu_ids, args.rondas, 'split'))}")
+
+    db_manager.close_all()
+    shutil.rmtree(_tmp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
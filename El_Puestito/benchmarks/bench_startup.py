@@ -0,0 +1,108 @@
+"""
+Tiempo de arranque del esquema sobre una base con un ano de operacion.
+Compara la secuencia vieja (CREATE TABLE IF NOT EXISTS, sondeos PRAGMA table_info,
+barrido de huerfanos y sondeo de datos en cada arranque) contra el runner de
+migraciones por PRAGMA user_version.
+
+Uso (desde El_Puestito/):
+    python -m benchmarks.bench_startup --dias 365 --ordenes-por-dia 150
+"""
+import os
+import sys
+import time
+import random
+import datetime
+import tempfile
+import argparse
+import statistics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+_fd, _bench_db = tempfile.mkstemp(suffix='.db')
+os.close(_fd)
+os.environ['PUESTITO_DB_PATH'] = _bench_db
+os.environ.setdefault('APPDATA', tempfile.gettempdir())
+
+from src.database.connection import db_manager
+from src.database.schema_manager import SchemaManager
+from src.database.migrator import migration_runner
+
+def poblar_un_ano(dias, ordenes_por_dia, items_por_orden=5):
+    db_manager.execute("INSERT OR IGNORE INTO empleados (id_empleado, nombre, rol) VALUES ('EMP01', 'Mesero', 'mesero');")
+    menu_ids = [r['id_item'] for r in db_manager.fetchall("SELECT id_item FROM menu_items;")]
+    inicio = datetime.datetime.now() - datetime.timedelta(days=dias)
+    rnd = random.Random(7)
+    with db_manager.transaction() as cursor:
+        for d in range(dias):
+            dia = inicio + datetime.timedelta(days=d)
+            cursor.executemany(
+                "INSERT INTO eventos_asistencia (id_empleado, timestamp, tipo) VALUES ('EMP01', ?, ?);",
+                [((dia + datetime.timedelta(hours=h)).isoformat(), t) for h, t in ((10, 'entrada'), (22, 'salida'))]
+            )
+            for o in range(ordenes_por_dia):
+                apertura = dia + datetime.timedelta(minutes=rnd.randint(600, 1380))
+                cursor.execute(
+                    "INSERT INTO ordenes (mesa_key, estado, fecha_apertura, fecha_cierre, client_uuid) VALUES (?, 'cerrada', ?, ?, ?);",
+                    (str(rnd.randint(1, 20)), apertura.isoformat(), (apertura + datetime.timedelta(minutes=45)).isoformat(), f"{d}-{o}")
+                )
+                id_orden = cursor.lastrowid
+                cursor.executemany(
+                    "INSERT INTO orden_detalle (id_orden, id_item_menu, cantidad, precio_unitario_congelado, nombre_congelado, destino, estado_item) VALUES (?, ?, 1, 4500, 'Platillo', 'cocina', 'listo');",
+                    [(id_orden, rnd.choice(menu_ids)) for _ in range(items_por_orden)]
+                )
+
+def arranque_legacy():
+    # Reproduce lo que initialize_schema hacia en cada arranque antes del runner.
+    schema = SchemaManager.__new__(SchemaManager)
+    schema.create_tables()
+    for tabla in ("menu_items", "orden_detalle", "menu_categorias", "empleados", "ordenes"):
+        db_manager.fetchall(f"PRAGMA table_info({tabla})")
+    with db_manager.transaction() as cursor:
+        cursor.execute("DELETE FROM eventos_asistencia WHERE id_empleado NOT IN (SELECT id_empleado FROM empleados);")
+        cursor.execute("DELETE FROM orden_detalle WHERE id_orden NOT IN (SELECT id_orden FROM ordenes);")
+    db_manager.fetchone("SELECT id_empleado FROM empleados LIMIT 1")
+
+def arranque_actual():
+    SchemaManager.__new__(SchemaManager).initialize_schema()
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(tiempos), max(tiempos)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dias", type=int, default=365)
+    parser.add_argument("--ordenes-por-dia", type=int, default=150)
+    parser.add_argument("--repeticiones", type=int, default=10)
+    args = parser.parse_args()
+
+    SchemaManager()
+    t0 = time.perf_counter()
+    poblar_un_ano(args.dias, args.ordenes_por_dia)
+    total = db_manager.fetchone("SELECT COUNT(*) AS n FROM orden_detalle")['n']
+    print(f"Base simulada: {args.dias} dias, {total} lineas de orden ({time.perf_counter() - t0:.1f}s para generar)")
+
+    mediana, maximo = medir(arranque_legacy, args.repeticiones)
+    print(f"   arranque legacy: p50={mediana:8.2f}ms max={maximo:8.2f}ms")
+
+    db_manager.execute("PRAGMA user_version = 0;")
+    t0 = time.perf_counter()
+    arranque_actual()
+    print(f"   primer arranque con migraciones pendientes: {(time.perf_counter() - t0) * 1000:8.2f}ms")
+
+    mediana, maximo = medir(arranque_actual, args.repeticiones)
+    print(f"   arranque con esquema al dia: p50={mediana:8.2f}ms max={maximo:8.2f}ms")
+
+    db_manager.close_all()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(_bench_db + suffix):
+            os.unlink(_bench_db + suffix)
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ from PyQt6.QtWidgets import (
     QLabel, QPushButton, QStackedWidget, QMessageBox
 )
 from PyQt6.QtGui import QPixmap
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import Qt, pyqtSignal, QTimer
 
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
 try:
@@ -25,11 +25,17 @@ from views.role_selection_page import RoleSelectionPage
 from views.admin_page import AdminPage
 from widgets.qr_code_dialog import QRCodeDialog
 from src.app_controller import AppController
+from src.database.archive import order_archiver
+from src.database.backup import backup_manager
+from src.database.checkpoint import checkpoint_scheduler
+from src.database.active_orders import active_orders
+from background_tasks import Worker
 from logger_setup import setup_logger
 
 logger = setup_logger()
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_MAINTENANCE_INTERVAL_MS = 6 * 60 * 60 * 1000
 
 class MainWindow(QMainWindow):
 
@@ -108,6 +114,13 @@ class MainWindow(QMainWindow):
         self.thread.start()
         logger.info("Servidor de asistencia iniciado en segundo plano.")
 
+        self.db_maintenance_timer = QTimer(self)
+        self.db_maintenance_timer.timeout.connect(self.run_db_maintenance)
+        self.db_maintenance_timer.start(DB_MAINTENANCE_INTERVAL_MS)
+        QTimer.singleShot(60 * 1000, self.run_db_maintenance)
+        checkpoint_scheduler.start()
+        active_orders.start()
+
     def update_and_save_config(self, updated_config):
         self.app_config = updated_config 
         self.save_app_config() 
@@ -226,6 +239,13 @@ class MainWindow(QMainWindow):
         except FileNotFoundError:
             logger.warning(f"No se encontró el archivo de estilos '{filename}' en la ruta calculada.")
 
+    def run_db_maintenance(self):
+        self.app_controller.threadpool.start(Worker(self._tarea_mantenimiento_db))
+
+    def _tarea_mantenimiento_db(self):
+        order_archiver.run()
+        backup_manager.run()
+
     def closeEvent(self, event):
         logger.info("Cerrando la aplicación...")
 
@@ -240,6 +260,8 @@ class MainWindow(QMainWindow):
             else:
                 logger.info("Hilo del servidor detenido limpiamente.")
         
+        active_orders.stop()
+        checkpoint_scheduler.stop(truncate=True)
         self.save_app_config() 
         super().closeEvent(event)
 
@@ -8,6 +8,7 @@ from .orders import orders_bp
 from .attendance import attendance_bp
 from .reports import reports_bp
 from .biometric import biometric_bp
+from .diagnostics import diagnostics_bp
 
 api_bp.register_blueprint(main_bp)
 api_bp.register_blueprint(auth_bp)
@@ -16,3 +17,4 @@ api_bp.register_blueprint(orders_bp)
 api_bp.register_blueprint(attendance_bp)
 api_bp.register_blueprint(reports_bp)
 api_bp.register_blueprint(biometric_bp)
+api_bp.register_blueprint(diagnostics_bp)
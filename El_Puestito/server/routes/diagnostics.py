@@ -0,0 +1,48 @@
+from flask import Blueprint, jsonify, request, current_app
+from logger_setup import setup_logger
+from server.routes.kds import require_auth
+
+logger = setup_logger()
+diagnostics_bp = Blueprint('diagnostics', __name__)
+
+@diagnostics_bp.route('/api/diagnostics/db', methods=['GET'])
+@require_auth
+def get_db_diagnostics():
+    try:
+        from src.database.connection import db_manager
+        from src.database.active_orders import active_orders
+        from src.database.idempotency import order_idempotency
+        limit = request.args.get('limit', 50, type=int)
+        sort_by = request.args.get('sort', 'total_ms')
+        return jsonify({
+            "queries": db_manager.query_stats(limit=limit, sort_by=sort_by),
+            "pool": db_manager.pool_stats(),
+            "analytics_pool": db_manager.analytics_pool_stats(),
+            "write_queue": db_manager.write_queue_stats(),
+            "cache": db_manager.cache_stats(),
+            "active_orders": active_orders.stats(),
+            "idempotency": order_idempotency.stats(),
+            "broadcast": current_app.worker.broadcaster.stats(),
+        })
+    except Exception as e:
+        logger.error(f"Error generando diagnostico de base de datos: {e}", exc_info=True)
+        return jsonify({"error": "Error interno"}), 500
+
+@diagnostics_bp.route('/api/diagnostics/db/reset', methods=['POST'])
+@require_auth
+def reset_db_diagnostics():
+    from src.database.connection import db_manager
+    db_manager.reset_query_stats()
+    return jsonify({"status": "success"})
+
+@diagnostics_bp.route('/api/diagnostics/order-totals', methods=['GET'])
+@require_auth
+def check_order_totals():
+    try:
+        from src.database.repositories.orders import order_repo
+        repair = request.args.get('repair', '0') in ('1', 'true')
+        drift = order_repo.check_order_totals(repair=repair)
+        return jsonify({"drift": [dict(row) for row in drift], "repaired": repair and bool(drift)})
+    except Exception as e:
+        logger.error(f"Error verificando totales de ordenes: {e}", exc_info=True)
+        return jsonify({"error": "Error interno"}), 500
@@ -96,17 +96,30 @@ def complete_kds_order():
         data = request.json
         mesa_key = data.get('mesa_key')
         destino = data.get('destino')
+        items = data.get('items')
         
-        order_service.mark_order_ready(mesa_key, destino)
+        # Con items se marcan solo esas unidades/renglones ([{id_detalle, cantidad?}]); sin items, toda la comanda.
+        if items is not None:
+            if not isinstance(items, list) or not items:
+                return jsonify({"status": "error", "message": "items debe ser una lista no vacia"}), 400
+            unidades, mesas = order_service.mark_items_ready(items, destino)
+            if not unidades:
+                return jsonify({"status": "error", "message": "Los items ya no estan pendientes"}), 409
+        else:
+            order_service.mark_order_ready(mesa_key, destino)
+            mesas = [mesa_key]
         
-        worker.socketio.emit('kds_update', {'destino': destino}, to=destino)
+        worker.notificar_kds(destino)
         worker.kds_estado_cambiado.emit(destino)
-        worker.socketio.emit('mesas_actualizadas', order_service.get_active_orders_caja())
+        worker.notificar_mesas()
         
-        mensaje_alerta = f"Mesa {mesa_key}: Pedido de {destino} listo"
-        worker.socketio.emit('alerta_orden_lista', {'mesa_key': mesa_key, 'destino': destino, 'mensaje': mensaje_alerta})
+        for mesa in mesas:
+            mensaje_alerta = f"Mesa {mesa}: Pedido de {destino} listo"
+            worker.socketio.emit('alerta_orden_lista', {'mesa_key': mesa, 'destino': destino, 'mensaje': mensaje_alerta})
         
         return jsonify({"status": "success"}), 200
+    except ValueError as ve:
+        return jsonify({"status": "error", "message": str(ve)}), 400
     except Exception as e:
         logger.error(f"Error completando orden KDS: {e}")
         return jsonify({"status": "error", "message": "Error interno"}), 500
@@ -1,4 +1,4 @@
-from flask import Blueprint, jsonify, request, current_app, send_from_directory
+from flask import Blueprint, Response, jsonify, request, current_app, send_from_directory
 from logger_setup import setup_logger
 from server.routes.kds import require_auth
 from src.path_manager import get_persistent_path, get_asset_path
@@ -54,21 +54,19 @@ def serve_image(filename):
 @require_auth
 def get_menu():
     try:
-        from src.database.repositories.menu import menu_repo
-        menu_data = menu_repo.get_menu_with_categories()
-        menu_filtrado = {"categorias": []}
-        for categoria_original in menu_data.get("categorias", []):
-            items_disponibles = [item for item in categoria_original.get("items", []) if item.get("disponible", True)]
-            if items_disponibles:
-                nueva_categoria = categoria_original.copy()
-                items_app_format = []
-                for item in items_disponibles:
-                    item_copy = item.copy()
-                    item_copy['id'] = item_copy.pop('id_item', item_copy.get('id'))
-                    items_app_format.append(item_copy)
-                nueva_categoria["items"] = items_app_format
-                menu_filtrado["categorias"].append(nueva_categoria)
-        return jsonify(menu_filtrado)
+        from src.database.menu_catalog import menu_catalog
+        body, body_gzip, etag = menu_catalog.snapshot().published()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        elif request.accept_encodings['gzip']:
+            response = Response(body_gzip, content_type='application/json; charset=utf-8')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(body, content_type='application/json; charset=utf-8')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept-Encoding')
+        return response
     except Exception as e:
         return jsonify({"error": "No se pudo cargar el menu"}), 500
 
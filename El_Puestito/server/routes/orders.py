@@ -5,6 +5,8 @@ from server.routes.kds import require_auth
 logger = setup_logger()
 orders_bp = Blueprint('orders', __name__)
 
+MAX_ORDENES_POR_LOTE = 200
+
 @orders_bp.route('/nueva-orden', methods=['POST'])
 @require_auth
 def recibir_orden():
@@ -14,25 +16,59 @@ def recibir_orden():
         from src.services.order_service import order_service
         
         order_id = orden.get("order_id")
-        from src.database.repositories.orders import order_repo
-        if order_repo.check_duplicate_order_id(order_id):
-            return jsonify({"status": "ok_duplicate"}), 200
-        
         logger.info(f"Procesando nueva orden sincronamente via API: {order_id}")
-        try:
-            nuevo_id = order_service.create_new_order(orden)
-            worker.socketio.emit('kds_update', {'destino': 'all'}, to='cocina')
-            worker.socketio.emit('kds_update', {'destino': 'all'}, to='barra')
-            worker.socketio.emit('mesas_actualizadas', order_service.get_active_orders_caja())
-            worker.ordenes_modificadas.emit() 
-            return jsonify({"status": "ok_new"}), 200
-        except ValueError as ve:
-            logger.warning(f"Orden rechazada por validacion: {ve}")
-            return jsonify({"error": "Item Agotado o Invalido", "mensaje": str(ve)}), 400
+        # Los reintentos con el mismo order_id reciben la respuesta original sin volver a SQLite.
+        outcome, replayed = order_service.submit_order(orden)
+        if outcome.status == "rejected":
+            if not replayed:
+                logger.warning(f"Orden rechazada por validacion: {outcome.error}")
+            return jsonify({"error": "Item Agotado o Invalido", "mensaje": outcome.error}), 400
+        if replayed:
+            return jsonify({"status": "ok_duplicate"}), 200
+        worker.notificar_kds('cocina', 'barra')
+        worker.notificar_mesas()
+        worker.ordenes_modificadas.emit() 
+        return jsonify({"status": "ok_new"}), 200
     except Exception as e:
         logger.error(f"Error procesando nueva orden: {e}")
         return jsonify({"error": "Error interno al procesar la orden"}), 500
 
+@orders_bp.route('/api/orders/batch', methods=['POST'])
+@require_auth
+def recibir_lote_ordenes():
+    try:
+        worker = current_app.worker
+        data = request.json
+        ordenes = data.get('ordenes') if isinstance(data, dict) else data
+        if not isinstance(ordenes, list) or not ordenes:
+            return jsonify({"error": "Se esperaba una lista de ordenes"}), 400
+        if len(ordenes) > MAX_ORDENES_POR_LOTE:
+            return jsonify({"error": f"Maximo {MAX_ORDENES_POR_LOTE} ordenes por lote"}), 400
+
+        from src.services.order_service import order_service
+        validas = [i for i, orden in enumerate(ordenes)
+                   if isinstance(orden, dict) and orden.get('numero_mesa') is not None and isinstance(orden.get('items'), list)
+                   and isinstance(orden.get('order_id'), (str, type(None)))]
+        resultados = [{"status": "rejected", "mensaje": "Orden incompleta"} for _ in ordenes]
+        for i, (outcome, replayed) in zip(validas, order_service.submit_orders_batch([ordenes[i] for i in validas])):
+            if outcome.status == "rejected":
+                resultados[i] = {"status": "rejected", "mensaje": outcome.error}
+            else:
+                resultados[i] = {"status": "ok_duplicate" if replayed else "ok_new"}
+        for orden, resultado in zip(ordenes, resultados):
+            resultado["order_id"] = orden.get("order_id") if isinstance(orden, dict) else None
+
+        nuevas = sum(1 for r in resultados if r["status"] == "ok_new")
+        logger.info(f"Lote recibido via API: {len(ordenes)} ordenes, {nuevas} nuevas.")
+        if nuevas:
+            worker.notificar_kds('cocina', 'barra')
+            worker.notificar_mesas()
+            worker.ordenes_modificadas.emit()
+        return jsonify({"resultados": resultados}), 200
+    except Exception as e:
+        logger.error(f"Error procesando lote de ordenes: {e}")
+        return jsonify({"error": "Error interno al procesar el lote"}), 500
+
 @orders_bp.route('/api/split-order', methods=['POST'])
 @require_auth
 def split_order_endpoint():
@@ -47,7 +83,7 @@ def split_order_endpoint():
         if not mesa_key or not items: return jsonify({"error": "Datos incompletos"}), 400
         success = order_service.split_order(mesa_key, items, target_account_key, new_account_name)
         if success:
-            worker.socketio.emit('mesas_actualizadas', order_service.get_active_orders_caja())
+            worker.notificar_mesas()
             worker.ordenes_modificadas.emit() 
             return jsonify({"status": "success"}), 200
         return jsonify({"error": "Error al dividir cuenta"}), 500
@@ -64,6 +100,22 @@ def get_estado_mesas():
     except Exception as e:
         return jsonify({"error": "No se pudo cargar el estado de las mesas"}), 500
 
+@orders_bp.route('/api/mesas/resync', methods=['GET'])
+@require_auth
+def resync_mesas():
+    from src.database.active_orders import active_orders
+    try:
+        since = request.args.get('since', type=int)
+        if since is not None and request.args.get('epoch') == active_orders.epoch:
+            delta = active_orders.changes_since(since)
+            if delta is not None:
+                return jsonify(delta)
+        seq, mesas = active_orders.versioned_snapshot()
+        return jsonify({"epoch": active_orders.epoch, "seq": seq, "mesas": mesas})
+    except Exception as e:
+        logger.error(f"Error en resync de mesas: {e}")
+        return jsonify({"error": "No se pudo cargar el estado de las mesas"}), 500
+
 @orders_bp.route('/api/cancel-order', methods=['POST'])
 @require_auth
 def cancel_order_endpoint():
@@ -75,7 +127,7 @@ def cancel_order_endpoint():
         if not mesa_key: return jsonify({"error": "Falta mesa_key"}), 400
         success = order_service.cancel_order(mesa_key)
         if success:
-            worker.socketio.emit('mesas_actualizadas', order_service.get_active_orders_caja())
+            worker.notificar_mesas()
             return jsonify({"status": "success"}), 200
         return jsonify({"error": "No se pudo cancelar"}), 400
     except Exception:
@@ -93,9 +145,8 @@ def remove_items_endpoint():
         if not mesa_key or not items: return jsonify({"error": "Datos incompletos"}), 400
         success = order_service.remove_items_from_order(mesa_key, items)
         if success:
-            worker.socketio.emit('mesas_actualizadas', order_service.get_active_orders_caja())
-            worker.socketio.emit('kds_update', {'destino': 'cocina'}, to='cocina')
-            worker.socketio.emit('kds_update', {'destino': 'barra'}, to='barra')
+            worker.notificar_kds('cocina', 'barra')
+            worker.notificar_mesas()
             worker.ordenes_modificadas.emit() 
             return jsonify({"status": "success"}), 200
         return jsonify({"error": "No se pudieron eliminar"}), 400
@@ -114,10 +165,8 @@ def update_item_note_endpoint():
         from src.database.repositories.orders import order_repo
         success = order_repo.update_item_note(id_detalle, nota)
         if success:
-            from src.services.order_service import order_service
-            worker.socketio.emit('kds_update', {'destino': 'all'}, to='cocina')
-            worker.socketio.emit('kds_update', {'destino': 'all'}, to='barra')
-            worker.socketio.emit('mesas_actualizadas', order_service.get_active_orders_caja())
+            worker.notificar_kds('cocina', 'barra')
+            worker.notificar_mesas()
             worker.ordenes_modificadas.emit()
             return jsonify({"status": "success"}), 200
         return jsonify({"error": "Error BD"}), 500
@@ -2,12 +2,14 @@ import os
 import json
 import datetime
 import logging
+import threading
 from PyQt6.QtCore import QObject, pyqtSignal
 from flask import Flask, session
-from flask_socketio import SocketIO, join_room, disconnect
+from flask_socketio import SocketIO, join_room, leave_room, disconnect
 from logger_setup import setup_logger
 from server.routes import api_bp
 from path_manager import get_persistent_path, get_base_dir
+from src.realtime.broadcaster import CoalescingBroadcaster
 
 logger = setup_logger()
 
@@ -15,6 +17,9 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TEMPLATE_DIR = os.path.join(get_base_dir(), 'server', 'templates')
 STATIC_DIR = os.path.join(get_base_dir(), 'server', 'static')
 
+# Salas por protocolo de estado de mesas: snapshot completo (clientes viejos) o deltas con seq.
+MESAS_ROOMS = {'full': 'mesas_full', 'delta': 'mesas_delta'}
+
 class ServerWorker(QObject):
     asistencia_recibida = pyqtSignal(dict)
     nueva_orden_recibida = pyqtSignal(dict)
@@ -35,6 +40,9 @@ class ServerWorker(QObject):
         self.clear_mode_active = False
         self.enroll_status = {"step": 0, "message": "Esperando inicio..."}
 
+        self._mesas_lock = threading.Lock()
+        self._mesas_seq_emitido = 0
+
         self.app = Flask(__name__, template_folder=TEMPLATE_DIR, static_folder=STATIC_DIR)
         self.app.secret_key = self._get_or_create_secret_key()
         self.app.worker = self
@@ -49,6 +57,8 @@ class ServerWorker(QObject):
             self.app, 
             async_mode='threading'
         )
+        # Las rutas y la UI marcan eventos como pendientes; se envian una vez por ventana.
+        self.broadcaster = CoalescingBroadcaster(self._emitir, self.config.get('realtime', {}))
 
         @self.socketio.on('connect')
         def on_connect():
@@ -56,6 +66,7 @@ class ServerWorker(QObject):
             api_key = request.args.get('api_key')
             
             if api_key and api_key == self.API_KEY:
+                self._unir_sala_mesas(request.args.get('mesas', 'full'))
                 logger.info("Cliente movil conectado via API KEY")
                 return True
                 
@@ -66,8 +77,46 @@ class ServerWorker(QObject):
                 return False
             
             join_room(destino)
+            self._unir_sala_mesas(request.args.get('mesas', 'full'))
             logger.info(f"Cliente conectado y unido a sala: {destino}")
 
+        @self.socketio.on('mesas_protocolo')
+        def on_mesas_protocolo(data):
+            modo = (data or {}).get('modo', 'full')
+            for room in MESAS_ROOMS.values():
+                leave_room(room)
+            self._unir_sala_mesas(modo)
+
+    def _unir_sala_mesas(self, modo):
+        room = MESAS_ROOMS.get(modo)
+        if room:
+            join_room(room)
+
+    def _emitir(self, event, payload, to):
+        self.socketio.emit(event, payload, to=to)
+
+    def notificar_kds(self, *destinos):
+        for destino in destinos:
+            self.broadcaster.mark('kds_update', {'destino': destino}, to=destino)
+
+    def notificar_mesas(self):
+        self.broadcaster.mark_task(('mesas', None), self.emitir_mesas)
+
+    def emitir_mesas(self):
+        # Snapshot completo para la sala 'mesas_full' y solo las mesas que cambiaron desde el
+        # ultimo envio para 'mesas_delta'. Si el historial ya no cubre el hueco se manda reset.
+        from src.database.active_orders import active_orders
+        with self._mesas_lock:
+            seq, mesas = active_orders.versioned_snapshot()
+            self.socketio.emit('mesas_actualizadas', mesas, to=MESAS_ROOMS['full'])
+            if seq == self._mesas_seq_emitido:
+                return
+            delta = active_orders.changes_since(self._mesas_seq_emitido)
+            if delta is None:
+                delta = {"epoch": active_orders.epoch, "base_seq": None, "seq": seq, "reset": True, "upserts": mesas, "deletes": []}
+            self.socketio.emit('mesas_delta', delta, to=MESAS_ROOMS['delta'])
+            self._mesas_seq_emitido = delta["seq"]
+
     def _load_config(self):
         try:
             path = get_persistent_path("config.json")
@@ -112,17 +161,16 @@ class ServerWorker(QObject):
 
     def forzar_actualizacion_kds(self, destino):
         try:
-            self.socketio.emit('kds_update', {'destino': destino})
-            from src.services.order_service import order_service
-            self.socketio.emit('mesas_actualizadas', order_service.get_active_orders_caja())
+            self.broadcaster.mark('kds_update', {'destino': destino})
+            self.notificar_mesas()
         except Exception as e:
             logger.error(f"Error emitiendo socket: {e}")
 
     def _validate_order_items(self, orden):
         try:
-            from src.database.repositories.menu import menu_repo
+            from src.database.menu_catalog import menu_catalog
             from src.database.repositories.inventory import inventory_repo
-            available_ids = menu_repo.get_available_menu_items()
+            available_ids = menu_catalog.snapshot().available_ids
             items_en_orden = orden.get("items", [])
             
             cantidades_requeridas = {}
@@ -153,18 +201,17 @@ class ServerWorker(QObject):
         logger.info(f"Retransmitiendo evento interno: {event_name}")
         
         if event_name == 'config_update':
+            from src.database.menu_catalog import menu_catalog
+            menu_catalog.invalidate()
             self.cargar_pines_kds()
             self.socketio.emit('config_update', payload_data)
 
         elif event_name in ['mesas_actualizadas', 'mesas_update', 'order_updated']:
-            def emit_update():
-                self.socketio.sleep(0.1)
-                from src.services.order_service import order_service
-                table_state_payload = order_service.get_active_orders_caja()
-                self.socketio.emit('mesas_actualizadas', table_state_payload)
-            self.socketio.start_background_task(emit_update)
+            self.notificar_mesas()
             
         elif event_name == 'menu_actualizado':
+            from src.database.menu_catalog import menu_catalog
+            menu_catalog.invalidate()
             self.socketio.emit('menu_actualizado', {'mensaje': 'Menu cambiado'})
             
         elif event_name == 'api/biometric/start-clear':
@@ -185,6 +232,7 @@ class ServerWorker(QObject):
         })
 
     def stop_server(self):
+        self.broadcaster.stop()
         try:
             self.socketio.stop()
         except Exception as e:
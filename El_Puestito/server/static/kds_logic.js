@@ -10,7 +10,8 @@ if (window.location.pathname.startsWith('/kds/')) {
         }
     }
     
-    const socket = io();
+    // El KDS no usa el estado de mesas; no se une a ninguna sala de mesas.
+    const socket = io({ query: { mesas: 'none' } });
     const alertOverlay = document.getElementById('disconnect-alert');
 
     socket.on('connect', () => {
@@ -130,6 +131,10 @@ if (window.location.pathname.startsWith('/kds/')) {
     `;
     document.head.appendChild(styleSheet);
 
+    // Unidades seleccionadas por id_detalle (tocar un renglon suma una, al pasar del total vuelve a 0).
+    // Se conservan entre recargas para que un kds_update no borre lo que el cocinero ya marco.
+    const seleccion = new Map();
+
     let isFetching = false;
     async function loadOrders() {
         if (isFetching) return;
@@ -161,6 +166,13 @@ if (window.location.pathname.startsWith('/kds/')) {
         const container = document.getElementById('orders-container');
         container.innerHTML = '';
 
+        const vigentes = new Map();
+        orders.forEach(group => group.items.forEach(item => vigentes.set(item.id_detalle, item.cantidad)));
+        for (const [id, n] of seleccion) {
+            if (!vigentes.has(id)) seleccion.delete(id);
+            else seleccion.set(id, Math.min(n, vigentes.get(id)));
+        }
+
         if (orders.length === 0) {
             container.innerHTML = `
                 <div style="grid-column: 1/-1; text-align: center; margin-top: 100px; opacity: 0.5;">
@@ -196,14 +208,33 @@ if (window.location.pathname.startsWith('/kds/')) {
             
             const itemsContainer = document.createElement('div');
             itemsContainer.className = 'card-items';
+
+            const btn = document.createElement('button');
+            const actualizarBoton = () => {
+                const unidades = group.items.reduce((acc, item) => acc + (seleccion.get(item.id_detalle) || 0), 0);
+                btn.textContent = unidades ? `✓ LISTO (${unidades})` : '✓ LISTO';
+            };
             
             group.items.forEach(item => {
                 const row = document.createElement('div');
                 row.className = 'item-row';
+                row.style.cursor = 'pointer';
                 
                 const qty = document.createElement('div');
                 qty.className = 'qty-box';
-                qty.textContent = item.cantidad;
+                const pintarSeleccion = () => {
+                    const marcadas = seleccion.get(item.id_detalle) || 0;
+                    qty.textContent = marcadas ? `${marcadas}/${item.cantidad}` : item.cantidad;
+                    row.style.outline = marcadas ? '2px solid #00d26a' : '';
+                };
+                pintarSeleccion();
+                row.addEventListener('click', () => {
+                    const siguiente = ((seleccion.get(item.id_detalle) || 0) + 1) % (item.cantidad + 1);
+                    if (siguiente) seleccion.set(item.id_detalle, siguiente);
+                    else seleccion.delete(item.id_detalle);
+                    pintarSeleccion();
+                    actualizarBoton();
+                });
                 
                 const info = document.createElement('div');
                 info.className = 'item-info';
@@ -237,10 +268,9 @@ if (window.location.pathname.startsWith('/kds/')) {
 
             const actions = document.createElement('div');
             actions.className = 'card-actions';
-            const btn = document.createElement('button');
             btn.className = 'btn-complete';
-            btn.textContent = '✓ LISTO';
-            btn.addEventListener('click', (e) => window.markReady(group.numero_mesa, e));
+            actualizarBoton();
+            btn.addEventListener('click', (e) => window.markReady(group, e));
             
             actions.appendChild(btn);
             card.appendChild(actions);
@@ -254,9 +284,15 @@ if (window.location.pathname.startsWith('/kds/')) {
         return date.toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
     }
 
-    window.markReady = async function(mesaKey, e) {
+    // Con renglones seleccionados solo se marcan esas unidades; sin seleccion, toda la comanda.
+    window.markReady = async function(group, e) {
         const btn = e.target.closest('button');
         const originalText = btn.innerHTML;
+        const items = group.items
+            .filter(item => seleccion.has(item.id_detalle))
+            .map(item => ({ id_detalle: item.id_detalle, cantidad: seleccion.get(item.id_detalle) }));
+        const body = { mesa_key: group.numero_mesa, destino: DESTINO };
+        if (items.length) body.items = items;
         
         btn.innerHTML = 'Enviando...';
         btn.disabled = true;
@@ -268,13 +304,14 @@ if (window.location.pathname.startsWith('/kds/')) {
                 headers: {
                     'Content-Type': 'application/json'
                 },
-                body: JSON.stringify({ mesa_key: mesaKey, destino: DESTINO })
+                body: JSON.stringify(body)
             });
 
             if (!response.ok) {
                  const errorData = await response.json().catch(() => ({}));
                  throw new Error(errorData.message || "Error al completar la orden");
             }
+            items.forEach(item => seleccion.delete(item.id_detalle));
         } catch (e) {
             console.error("Error de conexión al completar orden:", e);
             btn.disabled = false;
@@ -190,16 +190,20 @@ class AppController(QObject):
         self.threadpool.start(worker)
 
     def procesar_item_individual_listo(self, id_detalle, mesa_key, destino):
+        return self.procesar_items_listos([{'id_detalle': id_detalle, 'cantidad': 1}], mesa_key, destino)
+
+    def procesar_items_listos(self, lineas, mesa_key, destino):
+        # Un solo refresco, un broadcast y una alerta por lote, no por unidad.
         try:
-            resultado = self.order_service.mark_individual_item_ready(id_detalle)
-            if resultado:
+            unidades, _ = self.order_service.mark_items_ready(lineas, destino)
+            if unidades:
                 self.ordenes_actualizadas.emit()
                 self.notificar_cambios_mesas()
                 self.notificar_alerta_kds(mesa_key, destino)
                 return True
             return False
         except Exception as e:
-            logger.error(f"Error procesando item listo: {e}")
+            logger.error(f"Error procesando items listos: {e}")
             return False
         
     def formatear_sensor_biometrico(self):
@@ -0,0 +1,256 @@
+import uuid
+import threading
+from collections import deque
+from contextlib import contextmanager
+from src.database.connection import db_manager
+from src.database.repositories.accounts import account_repo
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+ORDER_TABLES = frozenset(("ordenes", "orden_detalle", "cuentas", "cuenta_mesas"))
+
+DEFAULT_ACTIVE_ORDERS_SETTINGS = {
+    "enabled": True,
+    "verify_interval_s": 300.0,
+    "delta_history": 256,
+}
+
+_ACTIVE_ORDERS_QUERY = """
+SELECT
+    o.id_orden, o.mesa_key, o.id_cuenta, o.fecha_apertura, o.total_centavos, o.items_count,
+    d.id_detalle, d.cantidad, d.precio_unitario_congelado AS precio_unitario,
+    d.nombre_congelado AS nombre, d.imagen_congelada AS imagen,
+    d.notas, d.id_item_menu AS item_id, d.estado_item, d.nombre_cerveza
+FROM ordenes o
+LEFT JOIN orden_detalle d ON o.id_orden = d.id_orden
+WHERE o.estado = 'activa'{filtro}
+ORDER BY o.fecha_apertura, d.id_detalle;
+"""
+
+class TouchedOrders:
+    __slots__ = ("orders", "mesas")
+
+    def __init__(self):
+        self.orders = set()
+        self.mesas = set()
+
+class ActiveOrdersStore:
+    def __init__(self, db=db_manager, settings=None):
+        self.db = db
+        settings = {**DEFAULT_ACTIVE_ORDERS_SETTINGS, **(settings if settings is not None else db.settings.get("active_orders", {}))}
+        self.enabled = settings["enabled"]
+        self.verify_interval = max(1.0, float(settings["verify_interval_s"]))
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._orders = {}
+        self._detalle_index = {}
+        self._generation = 0
+        self._loaded_generation = -1
+        # Cada publicacion con cambios incrementa seq y guarda el delta (upserts/deletes por mesa).
+        # epoch cambia en cada arranque para que los clientes detecten que su seq ya no aplica.
+        self.epoch = uuid.uuid4().hex[:12]
+        self._seq = 0
+        self._deltas = deque(maxlen=max(1, int(settings["delta_history"])))
+        self._counters = {"rebuilds": 0, "refreshes": 0, "external_invalidations": 0, "checks": 0, "mismatches": 0}
+        self._stop = threading.Event()
+        self._thread = None
+        self.db.add_invalidation_listener(self._on_tables_changed)
+
+    def _on_tables_changed(self, tables):
+        # Escrituras hechas fuera de tracking() (SQL directo, otra herramienta): se reconstruye todo.
+        if getattr(self._local, 'depth', 0):
+            return
+        if "*" in tables or not ORDER_TABLES.isdisjoint(tables):
+            with self._lock:
+                self._generation += 1
+                self._counters["external_invalidations"] += 1
+
+    def _query(self, filtro="", params=()):
+        orders = {}
+        vistas = set()
+        cuentas = {}
+        for row in self.db.fetchall(_ACTIVE_ORDERS_QUERY.format(filtro=filtro), params, row_mode='record'):
+            orden = orders.get(row.mesa_key)
+            if orden is None:
+                orden = orders[row.mesa_key] = {
+                    'id_orden_db': row.id_orden,
+                    'fecha_apertura': row.fecha_apertura,
+                    'total': 0.0,
+                    'items_count': 0,
+                    'items': []
+                }
+                cuentas[row.mesa_key] = row.id_cuenta
+            # Una cuenta puede tener varias ordenes activas: sus totales se suman una vez por orden.
+            if row.id_orden not in vistas:
+                vistas.add(row.id_orden)
+                orden['total'] = (round(orden['total'] * 100) + row.total_centavos) / 100.0
+                orden['items_count'] += row.items_count
+            if row.id_detalle is not None:
+                orden['items'].append({
+                    'id_detalle': row.id_detalle, 'item_id': row.item_id,
+                    'nombre': row.nombre, 'cantidad': row.cantidad,
+                    'precio_unitario': row.precio_unitario / 100.0, 'imagen': row.imagen,
+                    'notas': row.notas, 'estado_item': row.estado_item,
+                    'nombre_cerveza': row.nombre_cerveza
+                })
+        # Mesas y subcuenta vienen de cuentas/cuenta_mesas; las ordenes sin id_cuenta se interpretan por su mesa_key.
+        descripciones = account_repo.describe_accounts(cuentas.values(), self.db)
+        for mesa_key, orden in orders.items():
+            orden['cuenta'] = descripciones.get(cuentas[mesa_key]) or account_repo.describe_legacy(mesa_key)
+        return orders
+
+    def _publish(self, orders):
+        previous = self._orders
+        upserts = {k: v for k, v in orders.items() if previous.get(k) is not v and previous.get(k) != v}
+        deletes = [k for k in previous if k not in orders]
+        self._detalle_index = {item['id_detalle']: mesa_key for mesa_key, orden in orders.items() for item in orden['items']}
+        self._orders = orders
+        if upserts or deletes:
+            self._seq += 1
+            self._deltas.append((self._seq, upserts, deletes))
+
+    def snapshot(self):
+        # Solo lectura: el dict publicado nunca se modifica, cada cambio publica uno nuevo.
+        if not self.enabled:
+            return self._query()
+        if self._loaded_generation != self._generation:
+            with self._lock:
+                if self._loaded_generation != self._generation:
+                    self.rebuild()
+        return self._orders
+
+    def versioned_snapshot(self):
+        orders = self.snapshot()
+        if not self.enabled:
+            return 0, orders
+        with self._lock:
+            return self._seq, self._orders
+
+    def changes_since(self, seq):
+        # Delta combinado desde seq hasta el actual; None si el historial ya no lo cubre (resync).
+        if not self.enabled:
+            return None
+        self.snapshot()
+        with self._lock:
+            current = self._seq
+            if seq > current or (seq < current and (not self._deltas or self._deltas[0][0] > seq + 1)):
+                return None
+            upserts, deletes = {}, set()
+            for delta_seq, delta_upserts, delta_deletes in self._deltas:
+                if delta_seq <= seq:
+                    continue
+                for mesa_key in delta_deletes:
+                    upserts.pop(mesa_key, None)
+                    deletes.add(mesa_key)
+                for mesa_key, orden in delta_upserts.items():
+                    upserts[mesa_key] = orden
+                    deletes.discard(mesa_key)
+        return {"epoch": self.epoch, "base_seq": seq, "seq": current, "upserts": upserts, "deletes": sorted(deletes)}
+
+    def mesa_for_detalle(self, id_detalle):
+        if isinstance(id_detalle, str) and id_detalle.isdigit():
+            id_detalle = int(id_detalle)
+        return self._detalle_index.get(id_detalle)
+
+    def rebuild(self):
+        with self._lock:
+            generation = self._generation
+            orders = self._query()
+            self._publish(orders)
+            self._loaded_generation = generation
+            self._counters["rebuilds"] += 1
+        return orders
+
+    @contextmanager
+    def tracking(self):
+        # Los metodos de escritura del repositorio anotan que ordenes/mesas tocaron; tras el
+        # COMMIT solo esas mesas se vuelven a leer y se sustituyen en el estado en memoria.
+        touched = TouchedOrders()
+        self._local.depth = getattr(self._local, 'depth', 0) + 1
+        try:
+            yield touched
+        finally:
+            self._local.depth -= 1
+        self.refresh(touched.orders, touched.mesas)
+
+    def refresh(self, order_ids=(), mesa_keys=()):
+        order_ids = [i for i in order_ids if i is not None]
+        mesa_keys = {k for k in mesa_keys if k is not None}
+        if not self.enabled or not (order_ids or mesa_keys):
+            return
+        if self.db.in_transaction():
+            # Dentro de una transaccion externa aun no hay COMMIT; se relee todo en la siguiente lectura.
+            with self._lock:
+                self._generation += 1
+            return
+        with self._lock:
+            if self._loaded_generation != self._generation:
+                self.rebuild()
+                return
+            if order_ids:
+                placeholders = ','.join('?' * len(order_ids))
+                rows = self.db.fetchall(f"SELECT DISTINCT mesa_key FROM ordenes WHERE id_orden IN ({placeholders});", order_ids, row_mode='tuple')
+                mesa_keys.update(row[0] for row in rows)
+            if not mesa_keys:
+                return
+            keys = list(mesa_keys)
+            fresh = self._query(f" AND o.mesa_key IN ({','.join('?' * len(keys))})", keys)
+            orders = {k: v for k, v in self._orders.items() if k not in mesa_keys}
+            orders.update(fresh)
+            self._publish(dict(sorted(orders.items(), key=lambda kv: kv[1]['fecha_apertura'] or '')))
+            self._counters["refreshes"] += 1
+
+    def verify(self):
+        # Compara el estado en memoria contra SQLite; si difiere lo reemplaza y lo reporta.
+        if not self.enabled:
+            return True
+        with self._lock:
+            self._counters["checks"] += 1
+            if self._loaded_generation != self._generation:
+                self.rebuild()
+                return True
+            generation = self._generation
+            fresh = self._query()
+            if fresh == self._orders:
+                return True
+            self._counters["mismatches"] += 1
+            diferentes = sorted(set(fresh) ^ set(self._orders) | {k for k in fresh.keys() & self._orders.keys() if fresh[k] != self._orders[k]})
+            logger.warning(f"Estado de ordenes activas desincronizado en mesas {diferentes}. Se reemplaza con SQLite.")
+            self._publish(fresh)
+            self._loaded_generation = generation
+            return False
+
+    def start(self):
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self.rebuild()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ordenes-activas", daemon=True)
+        self._thread.start()
+        logger.info(f"Estado de ordenes activas cargado: {len(self._orders)} mesas.")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(5)
+
+    def _run(self):
+        while not self._stop.wait(self.verify_interval):
+            try:
+                self.verify()
+            except Exception as e:
+                logger.error(f"Error verificando ordenes activas: {e}")
+            finally:
+                self.db.close_conn_for_thread()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({
+                "enabled": self.enabled, "mesas": len(self._orders), "stale": self._loaded_generation != self._generation,
+                "epoch": self.epoch, "seq": self._seq, "deltas_retained": len(self._deltas),
+            })
+        return stats
+
+active_orders = ActiveOrdersStore()
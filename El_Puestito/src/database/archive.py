@@ -0,0 +1,144 @@
+import os
+import sqlite3
+import datetime
+from src.database.connection import db_manager
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+HISTORY_SCHEMA = "historial"
+# cuenta_mesas no tiene llave simple: en el historial se deduplica con un indice UNIQUE.
+ARCHIVED_TABLES = (
+    ("ordenes", "id_orden"), ("orden_detalle", "id_detalle"),
+    ("cuentas", "id_cuenta"), ("cuenta_mesas", None), ("mesas", "id_mesa"),
+)
+HISTORY_TABLES = tuple(table for table, _ in ARCHIVED_TABLES)
+
+DEFAULT_ARCHIVE_SETTINGS = {
+    "enabled": True,
+    "retention_days": 90,
+    "batch_size": 500,
+    "history_filename": "puestito_history.db",
+}
+
+def history_union(select_sql, params=(), cold_sql=None):
+    # select_sql usa {ordenes}, {orden_detalle}, {cuentas}, {cuenta_mesas} y {mesas}; si hay historial
+    # adjunto se repite la consulta contra sus tablas con UNION ALL, cada rama con sus propios indices.
+    # cold_sql (mismas columnas y parametros) sirve para columnas que las filas archivadas no tienen llenas.
+    hot = select_sql.format(**{table: f"main.{table}" for table in HISTORY_TABLES})
+    if not db_manager.has_attachment(HISTORY_SCHEMA):
+        return hot, tuple(params)
+    cold = (cold_sql or select_sql).format(**{table: f"{HISTORY_SCHEMA}.{table}" for table in HISTORY_TABLES})
+    return f"{hot}\nUNION ALL\n{cold}", tuple(params) * 2
+
+class OrderArchiver:
+    def __init__(self, db=db_manager, settings=None):
+        self.db = db
+        settings = {**DEFAULT_ARCHIVE_SETTINGS, **(settings if settings is not None else db.settings.get("archive", {}))}
+        self.enabled = settings["enabled"]
+        self.retention_days = int(settings["retention_days"])
+        self.batch_size = max(1, int(settings["batch_size"]))
+        self.history_path = settings.get("history_path") or os.path.join(
+            os.path.dirname(os.path.abspath(db.db_path)), settings["history_filename"]
+        )
+        if os.path.exists(self.history_path):
+            self.db.attach(HISTORY_SCHEMA, self.history_path)
+
+    def _columns(self, conn, schema, table):
+        return [(row[1], row[2], row[5]) for row in conn.execute(f"PRAGMA {schema}.table_info({table});").fetchall()]
+
+    def _sync_history_schema(self, conn):
+        # El historial sigue al esquema caliente: tablas nuevas se crean y columnas nuevas se agregan.
+        # Sin llaves foraneas: el menu y los empleados no viven en el historial.
+        for table, pk in ARCHIVED_TABLES:
+            hot = self._columns(conn, "main", table)
+            cold = {name for name, _, _ in self._columns(conn, "archivo", table)}
+            if not cold:
+                defs = ", ".join(f"{name} {ctype}{' PRIMARY KEY' if name == pk else ''}" for name, ctype, _ in hot)
+                conn.execute(f"CREATE TABLE archivo.{table} ({defs});")
+            else:
+                for name, ctype, _ in hot:
+                    if name not in cold:
+                        conn.execute(f"ALTER TABLE archivo.{table} ADD COLUMN {name} {ctype};")
+        conn.execute("CREATE INDEX IF NOT EXISTS archivo.idx_hist_ordenes_estado_fecha_cierre ON ordenes(estado, fecha_cierre);")
+        conn.execute("CREATE INDEX IF NOT EXISTS archivo.idx_hist_detalle_id_orden ON orden_detalle(id_orden);")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS archivo.idx_hist_cuenta_mesas ON cuenta_mesas(id_cuenta, id_mesa);")
+
+    def _candidates(self, conn, cutoff):
+        return [row[0] for row in conn.execute("""
+            SELECT id_orden FROM main.ordenes
+            WHERE estado IN ('cerrada', 'cancelada') AND fecha_cierre < ?
+            ORDER BY id_orden LIMIT ?;
+        """, (cutoff, self.batch_size)).fetchall()]
+
+    def _account_candidates(self, conn, cutoff):
+        # Cuentas cerradas sin ordenes en la base caliente. Una cuenta madre espera a que sus
+        # subcuentas se hayan mudado: la llave foranea id_padre no puede quedar colgando.
+        return [row[0] for row in conn.execute("""
+            SELECT c.id_cuenta FROM main.cuentas c
+            WHERE c.estado != 'abierta' AND c.fecha_cierre < ?
+            AND NOT EXISTS (SELECT 1 FROM main.ordenes o WHERE o.id_cuenta = c.id_cuenta)
+            AND NOT EXISTS (SELECT 1 FROM main.cuentas h WHERE h.id_padre = c.id_cuenta)
+            ORDER BY c.id_cuenta LIMIT ?;
+        """, (cutoff, self.batch_size)).fetchall()]
+
+    def _move_in_batches(self, conn, candidates, statements):
+        # Un lote por transaccion para no retener el lock de escritura del POS.
+        # En WAL el COMMIT no es atomico entre archivos: si se corta entre ambos, el
+        # INSERT OR IGNORE del siguiente lote deja el historial igual y el DELETE termina la mudanza.
+        moved = 0
+        while True:
+            conn.execute("BEGIN IMMEDIATE;")
+            try:
+                ids = candidates()
+                if not ids:
+                    conn.execute("COMMIT;")
+                    break
+                marks = ", ".join("?" for _ in ids)
+                for statement in statements:
+                    conn.execute(statement.format(marks=marks), ids)
+                conn.execute("COMMIT;")
+            except Exception:
+                conn.execute("ROLLBACK;")
+                raise
+            moved += len(ids)
+        return moved
+
+    def run(self, now=None):
+        if not self.enabled:
+            return 0
+        cutoff = ((now or datetime.datetime.now()) - datetime.timedelta(days=self.retention_days)).date().isoformat()
+        conn = self.db._create_connection()
+        conn.isolation_level = None
+        archived = cuentas = 0
+        try:
+            if not self._candidates(conn, cutoff) and not self._account_candidates(conn, cutoff):
+                return 0
+            conn.execute("ATTACH DATABASE ? AS archivo;", (self.history_path,))
+            self._sync_history_schema(conn)
+            columns = {table: ", ".join(name for name, _, _ in self._columns(conn, "main", table)) for table, _ in ARCHIVED_TABLES}
+            archived = self._move_in_batches(conn, lambda: self._candidates(conn, cutoff), (
+                f"INSERT OR IGNORE INTO archivo.ordenes ({columns['ordenes']}) SELECT {columns['ordenes']} FROM main.ordenes WHERE id_orden IN ({{marks}});",
+                f"INSERT OR IGNORE INTO archivo.orden_detalle ({columns['orden_detalle']}) SELECT {columns['orden_detalle']} FROM main.orden_detalle WHERE id_orden IN ({{marks}});",
+                "DELETE FROM main.orden_detalle WHERE id_orden IN ({marks});",
+                "DELETE FROM main.ordenes WHERE id_orden IN ({marks});",
+            ))
+            # Despues de las ordenes: las cuentas cuyas ordenes ya se mudaron quedan libres.
+            # Las mesas fisicas se copian (el historial necesita sus etiquetas) pero siguen en la base caliente.
+            cuentas = self._move_in_batches(conn, lambda: self._account_candidates(conn, cutoff), (
+                f"INSERT OR IGNORE INTO archivo.cuentas ({columns['cuentas']}) SELECT {columns['cuentas']} FROM main.cuentas WHERE id_cuenta IN ({{marks}});",
+                f"INSERT OR IGNORE INTO archivo.mesas ({columns['mesas']}) SELECT {columns['mesas']} FROM main.mesas WHERE id_mesa IN (SELECT id_mesa FROM main.cuenta_mesas WHERE id_cuenta IN ({{marks}}));",
+                f"INSERT OR IGNORE INTO archivo.cuenta_mesas ({columns['cuenta_mesas']}) SELECT {columns['cuenta_mesas']} FROM main.cuenta_mesas WHERE id_cuenta IN ({{marks}});",
+                "DELETE FROM main.cuenta_mesas WHERE id_cuenta IN ({marks});",
+                "DELETE FROM main.cuentas WHERE id_cuenta IN ({marks});",
+            ))
+            logger.info(f"Archivo historico: {archived} ordenes y {cuentas} cuentas anteriores a {cutoff} movidas a {self.history_path}")
+        except sqlite3.Error as e:
+            logger.error(f"Error archivando ordenes historicas: {e}")
+        finally:
+            conn.close()
+        if (archived or cuentas) and HISTORY_SCHEMA not in self.db.attachments:
+            self.db.attach(HISTORY_SCHEMA, self.history_path)
+        return archived
+
+order_archiver = OrderArchiver()
@@ -0,0 +1,111 @@
+import os
+import time
+import glob
+import sqlite3
+import datetime
+from src.database.connection import db_manager
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+DEFAULT_BACKUP_SETTINGS = {
+    "enabled": True,
+    "keep": 7,
+    "pages_per_step": 256,
+    "pause_ms": 5.0,
+    "directory": "backups",
+    "include_history": True,
+}
+
+class BackupManager:
+    def __init__(self, db=db_manager, settings=None):
+        self.db = db
+        settings = {**DEFAULT_BACKUP_SETTINGS, **(settings if settings is not None else db.settings.get("backup", {}))}
+        self.enabled = settings["enabled"]
+        self.keep = max(1, int(settings["keep"]))
+        self.pages_per_step = max(1, int(settings["pages_per_step"]))
+        self.pause = max(0.0, float(settings["pause_ms"])) / 1000.0
+        self.include_history = settings["include_history"]
+        base_dir = os.path.dirname(os.path.abspath(db.db_path))
+        self.directory = settings["directory"] if os.path.isabs(settings["directory"]) else os.path.join(base_dir, settings["directory"])
+        self.history_path = os.path.join(base_dir, db.settings.get("archive", {}).get("history_filename", "puestito_history.db"))
+
+    def run(self):
+        if not self.enabled:
+            return []
+        os.makedirs(self.directory, exist_ok=True)
+        results = [self.backup_file(self.db.db_path, "puestito")]
+        if self.include_history and os.path.exists(self.history_path):
+            results.append(self.backup_file(self.history_path, "puestito_history"))
+        return results
+
+    def _yield_to_writers(self, status, remaining, total):
+        # Se llama despues de cada paso de pages_per_step paginas: soltar el GIL y el disco un momento.
+        if remaining and self.pause:
+            time.sleep(self.pause)
+
+    def _reserve_path(self, prefix):
+        # Milisegundos en el nombre y, si aun asi choca, un sufijo: el .tmp se crea en exclusiva
+        # para que dos respaldos simultaneos nunca escriban sobre el mismo archivo.
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        n = 0
+        while True:
+            final_path = os.path.join(self.directory, f"{prefix}_{stamp}{f'_{n}' if n else ''}.db")
+            if not os.path.exists(final_path):
+                try:
+                    os.close(os.open(final_path + ".tmp", os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                    return final_path
+                except FileExistsError:
+                    pass
+            n += 1
+
+    def backup_file(self, source_path, prefix):
+        final_path = self._reserve_path(prefix)
+        temp_path = final_path + ".tmp"
+        result = {"source": source_path, "path": final_path, "ok": False}
+        t0 = time.perf_counter()
+        src = sqlite3.connect(source_path, check_same_thread=False)
+        dest = sqlite3.connect(temp_path)
+        try:
+            # Una transaccion de lectura abierta fija la instantanea WAL: las escrituras del POS
+            # durante la copia no obligan a reiniciar el backup.
+            src.execute("BEGIN;")
+            src.execute("SELECT COUNT(*) FROM sqlite_master;").fetchone()
+            src.backup(dest, pages=self.pages_per_step, progress=self._yield_to_writers)
+            src.rollback()
+            check = dest.execute("PRAGMA integrity_check;").fetchone()[0]
+            result["integrity"] = check
+            result["pages"] = dest.execute("PRAGMA page_count;").fetchone()[0]
+            dest.close()
+            if check != "ok":
+                logger.error(f"Respaldo de {source_path} fallo integrity_check: {check}")
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, final_path)
+                result["ok"] = True
+                self._rotate(prefix)
+        except sqlite3.Error as e:
+            logger.error(f"Error respaldando {source_path}: {e}")
+            result["error"] = str(e)
+            dest.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        finally:
+            src.close()
+        result["duration_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        if result["ok"]:
+            logger.info(f"Respaldo creado: {final_path} ({result['pages']} paginas, {result['duration_ms']} ms)")
+        return result
+
+    def _rotate(self, prefix):
+        snapshots = sorted(glob.glob(os.path.join(self.directory, f"{prefix}_[0-9]*_[0-9]*.db")))
+        for old in snapshots[:-self.keep]:
+            try:
+                os.remove(old)
+            except OSError as e:
+                logger.warning(f"No se pudo borrar respaldo viejo {old}: {e}")
+
+    def list_backups(self):
+        return sorted(glob.glob(os.path.join(self.directory, "*.db")), reverse=True)
+
+backup_manager = BackupManager()
@@ -0,0 +1,121 @@
+import os
+import time
+import sqlite3
+import datetime
+import threading
+from src.database.connection import db_manager
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+DEFAULT_CHECKPOINT_SETTINGS = {
+    "enabled": True,
+    "poll_seconds": 10.0,
+    "idle_seconds": 30.0,
+    "min_wal_bytes": 1024 * 1024,
+    "closing_time": "23:30",
+}
+
+class CheckpointScheduler:
+    def __init__(self, db=db_manager, settings=None):
+        self.db = db
+        perf = db.settings.get("performance", {})
+        settings = {**DEFAULT_CHECKPOINT_SETTINGS, **(settings if settings is not None else perf.get("checkpoint", {}))}
+        self.enabled = settings["enabled"]
+        self.poll = max(0.1, float(settings["poll_seconds"]))
+        self.idle = max(0.0, float(settings["idle_seconds"]))
+        self.min_wal_bytes = int(settings["min_wal_bytes"])
+        self.closing_time = datetime.datetime.strptime(settings["closing_time"], "%H:%M").time()
+        self.wal_path = db.db_path + "-wal"
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_size = None
+        self._stable_since = None
+        self._last_truncate_day = None
+        self._lock = threading.Lock()
+        self._counters = {"passive": 0, "truncate": 0, "busy": 0, "frames_checkpointed": 0}
+        self._last_result = None
+
+    def start(self):
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-checkpoint", daemon=True)
+        self._thread.start()
+        logger.info("Planificador de checkpoints WAL iniciado.")
+
+    def stop(self, truncate=True):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(self.poll + 5)
+        if truncate and self.enabled:
+            self.checkpoint("TRUNCATE")
+
+    def _wal_size(self):
+        try:
+            return os.path.getsize(self.wal_path)
+        except OSError:
+            return 0
+
+    def _run(self):
+        while not self._stop.wait(self.poll):
+            try:
+                self.tick()
+                self.db.reap_pools()
+            except Exception as e:
+                logger.error(f"Error en planificador de checkpoints: {e}")
+
+    def tick(self, now=None):
+        now = now or datetime.datetime.now()
+        if now.time() >= self.closing_time and self._last_truncate_day != now.date():
+            self._last_truncate_day = now.date()
+            return self.checkpoint("TRUNCATE")
+
+        # El WAL solo crece con escrituras: si su tamano no cambia en idle_seconds, no hay servicio activo.
+        size = self._wal_size()
+        monotonic = time.monotonic()
+        if size != self._last_size:
+            self._last_size = size
+            self._stable_since = monotonic
+            return None
+        if size >= self.min_wal_bytes and monotonic - self._stable_since >= self.idle:
+            result = self.checkpoint("PASSIVE")
+            self._stable_since = monotonic
+            return result
+        return None
+
+    def checkpoint(self, mode="PASSIVE"):
+        if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+            raise ValueError(f"Modo de checkpoint invalido: {mode}")
+        t0 = time.perf_counter()
+        conn = sqlite3.connect(self.db.db_path, timeout=5.0)
+        try:
+            busy, log_frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode});").fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Checkpoint {mode} no completado: {e}")
+            return None
+        finally:
+            conn.close()
+        result = {
+            "mode": mode, "busy": bool(busy), "wal_frames": log_frames, "checkpointed": checkpointed,
+            "duration_ms": round((time.perf_counter() - t0) * 1000, 2), "at": datetime.datetime.now().isoformat(),
+        }
+        with self._lock:
+            self._counters["passive" if mode == "PASSIVE" else "truncate"] += 1
+            self._counters["busy"] += int(bool(busy))
+            self._counters["frames_checkpointed"] += max(0, checkpointed)
+            self._last_result = result
+        self._last_size = self._wal_size()
+        logger.info(f"Checkpoint WAL {mode}: {checkpointed}/{log_frames} frames en {result['duration_ms']} ms")
+        return result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["last"] = self._last_result
+        stats["enabled"] = self.enabled
+        stats["running"] = bool(self._thread and self._thread.is_alive())
+        stats["wal_bytes"] = self._wal_size()
+        return stats
+
+checkpoint_scheduler = CheckpointScheduler()
@@ -1,54 +1,393 @@
+import os
+import json
 import sqlite3
+import pathlib
 import threading
+from contextlib import contextmanager
 from logger_setup import setup_logger
 from src.path_manager import get_persistent_path
+from src.database.pool import ConnectionPool
+from src.database.write_queue import WriteQueue
+from src.database.rows import row_converter
+from src.database.instrumentation import QueryStats, InstrumentedConnection
+from src.database.performance import resolve_pragmas
+from src.database.query_cache import QueryCache
 
 logger = setup_logger()
 
+DEFAULT_POOL_SETTINGS = {
+    "enabled": True,
+    "min_size": 2,
+    "max_size": 16,
+    "checkout_timeout": 30.0,
+    "idle_timeout": 300.0,
+    "health_check_interval": 30.0,
+}
+
+DEFAULT_WRITE_QUEUE_SETTINGS = {
+    "enabled": False,
+    "max_batch": 64,
+    "max_wait_ms": 2.0,
+    "result_timeout_s": 30.0,
+}
+
+DEFAULT_INSTRUMENTATION_SETTINGS = {
+    "enabled": True,
+    "slow_query_ms": 100.0,
+    "sample_size": 512,
+    "explain_slow": True,
+    "explain_interval_s": 60.0,
+}
+
+DEFAULT_ANALYTICS_SETTINGS = {
+    "enabled": True,
+    "max_size": 4,
+    "cache_size": -65536,
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+DEFAULT_CACHE_SETTINGS = {
+    "enabled": True,
+    "max_entries": 256,
+}
+
+LANES = ("main", "analytics")
+
+def load_database_settings():
+    try:
+        config_path = get_persistent_path("config.json")
+        if not os.path.exists(config_path):
+            return {}
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get("database", {}) or {}
+    except Exception as e:
+        logger.error(f"Error leyendo seccion 'database' de config.json: {e}")
+        return {}
+
 class DatabaseManager:
-    def __init__(self, db_path=None):
-        import os
+    def __init__(self, db_path=None, settings=None):
         self.db_path = db_path or os.environ.get('PUESTITO_DB_PATH') or get_persistent_path("puestito.db")
+        self.settings = settings if settings is not None else load_database_settings()
         self.local = threading.local()
+        self.attachments = {}
+        self._attach_version = 0
+        self._attach_lock = threading.Lock()
         logger.info(f"DatabaseManager inicializado. Conectando a: {self.db_path}")
         with sqlite3.connect(self.db_path) as conn:
             conn.execute("PRAGMA journal_mode=WAL;")
+        self.performance_profile, self.pragmas = resolve_pragmas(self.settings.get("performance", {}))
+        logger.info(f"Perfil de rendimiento SQLite: {self.performance_profile} {self.pragmas}")
+
+        instr_settings = {**DEFAULT_INSTRUMENTATION_SETTINGS, **self.settings.get("instrumentation", {})}
+        self.instrumentation = None
+        if instr_settings["enabled"]:
+            self.instrumentation = QueryStats(
+                slow_query_ms=instr_settings["slow_query_ms"],
+                sample_size=instr_settings["sample_size"],
+                explain_slow=instr_settings["explain_slow"],
+                explain_interval_s=instr_settings["explain_interval_s"],
+            )
+
+        cache_settings = {**DEFAULT_CACHE_SETTINGS, **self.settings.get("cache", {})}
+        self.query_cache = QueryCache(max_entries=cache_settings["max_entries"], enabled=bool(cache_settings["enabled"]))
+
+        pool_settings = {**DEFAULT_POOL_SETTINGS, **self.settings.get("pool", {})}
+        self.pool = None
+        if pool_settings["enabled"]:
+            self.pool = ConnectionPool(
+                self._create_connection,
+                min_size=pool_settings["min_size"],
+                max_size=pool_settings["max_size"],
+                checkout_timeout=pool_settings["checkout_timeout"],
+                idle_timeout=pool_settings["idle_timeout"],
+                health_check_interval=pool_settings["health_check_interval"],
+            )
+
+        # Carril de lectura para reportes: conexiones query_only con cache propia, asi los
+        # agregados largos no desalojan las paginas que usa el flujo de ordenes.
+        analytics_settings = {**DEFAULT_ANALYTICS_SETTINGS, **self.settings.get("analytics", {})}
+        self.analytics_pool = None
+        if analytics_settings["enabled"]:
+            self.analytics_pragmas = {
+                "query_only": "ON",
+                "cache_size": int(analytics_settings["cache_size"]),
+                "mmap_size": int(analytics_settings["mmap_size"]),
+            }
+            self.analytics_pool = ConnectionPool(
+                self._create_analytics_connection,
+                min_size=0,
+                max_size=analytics_settings["max_size"],
+                checkout_timeout=pool_settings["checkout_timeout"],
+                idle_timeout=pool_settings["idle_timeout"],
+                health_check_interval=pool_settings["health_check_interval"],
+                name="analitica",
+            )
+
+        queue_settings = {**DEFAULT_WRITE_QUEUE_SETTINGS, **self.settings.get("write_queue", {})}
+        self.write_queue = None
+        self.write_timeout = float(queue_settings["result_timeout_s"])
+        if queue_settings["enabled"]:
+            self.write_queue = WriteQueue(
+                self._create_connection,
+                max_batch=queue_settings["max_batch"],
+                max_wait_ms=queue_settings["max_wait_ms"],
+            )
+            logger.info("Modo de escritura serializada activo (group commit).")
+
+    def _create_connection(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, factory=InstrumentedConnection, uri=True)
+        conn.query_stats = self.instrumentation
+        conn.query_cache = self.query_cache
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout = 30000;")
+        conn.execute("PRAGMA foreign_keys = ON;")
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value};")
+        return conn
+
+    def _create_analytics_connection(self):
+        conn = self._create_connection()
+        for name, value in self.analytics_pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value};")
+        return conn
 
     def get_conn(self):
-        if not hasattr(self.local, 'conn'):
-            self.local.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.local.conn.row_factory = sqlite3.Row
-            self.local.conn.execute("PRAGMA busy_timeout = 30000;") 
-            self.local.conn.execute("PRAGMA foreign_keys = ON;")
-        return self.local.conn
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.pool.checkout() if self.pool else self._create_connection()
+            self.local.conn = conn
+        if getattr(conn, 'attach_version', 0) != self._attach_version and not conn.in_transaction:
+            self._sync_attachments(conn)
+        return conn
+
+    def attach(self, schema, path, read_only=True):
+        uri = pathlib.Path(path).resolve().as_uri() + ("?mode=ro" if read_only else "")
+        with self._attach_lock:
+            self.attachments[schema] = uri
+            self._attach_version += 1
+        logger.info(f"Base de datos adjunta como '{schema}': {path}")
+
+    def detach(self, schema):
+        with self._attach_lock:
+            if self.attachments.pop(schema, None) is not None:
+                self._attach_version += 1
+
+    def has_attachment(self, schema):
+        return schema in self.attachments
+
+    def _sync_attachments(self, conn):
+        # Cada conexion del pool adjunta/desadjunta de forma perezosa al tomarla, fuera de transaccion.
+        with self._attach_lock:
+            version, wanted = self._attach_version, dict(self.attachments)
+        current = {row[1] for row in conn.execute("PRAGMA database_list;").fetchall()} - {"main", "temp"}
+        for schema in current - set(wanted):
+            conn.execute(f"DETACH DATABASE {schema};")
+            current.discard(schema)
+        for schema, uri in wanted.items():
+            if schema not in current:
+                try:
+                    conn.execute(f"ATTACH DATABASE ? AS {schema};", (uri,))
+                    current.add(schema)
+                except sqlite3.Error as e:
+                    logger.error(f"No se pudo adjuntar '{schema}' ({uri}): {e}")
+        conn.attached = current
+        conn.attach_version = version
 
     def close_conn_for_thread(self):
-        if hasattr(self.local, 'conn'):
-            self.local.conn.close()
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
             del self.local.conn
+            if self.pool:
+                self.pool.checkin(conn)
+            else:
+                conn.close()
+
+    def pool_stats(self):
+        if not self.pool:
+            return {"enabled": False}
+        return {"enabled": True, **self.pool.stats()}
+
+    def reap_pools(self):
+        # Cierra las conexiones ociosas por mas de idle_timeout aunque nadie devuelva otra al pool.
+        for pool in (self.pool, self.analytics_pool):
+            if pool:
+                pool.reap()
+
+    def analytics_pool_stats(self):
+        if not self.analytics_pool:
+            return {"enabled": False}
+        return {"enabled": True, **self.analytics_pool.stats()}
+
+    def write_queue_stats(self):
+        if not self.write_queue:
+            return {"enabled": False}
+        return {"enabled": True, **self.write_queue.stats()}
+
+    def query_stats(self, limit=50, sort_by="total_ms"):
+        if not self.instrumentation:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "since": self.instrumentation.started_at,
+            "slow_query_ms": self.instrumentation.slow_threshold * 1000,
+            "queries": self.instrumentation.snapshot(limit=limit, sort_by=sort_by),
+        }
+
+    def cache_stats(self):
+        return self.query_cache.stats()
+
+    def clear_query_cache(self):
+        self.query_cache.clear()
+
+    def add_invalidation_listener(self, callback):
+        # callback(tablas) se invoca tras cada COMMIT que modifico esas tablas.
+        self.query_cache.add_listener(callback)
+
+    def remove_invalidation_listener(self, callback):
+        self.query_cache.remove_listener(callback)
+
+    def reset_query_stats(self):
+        if self.instrumentation:
+            self.instrumentation.reset()
+
+    def close_all(self):
+        self.close_conn_for_thread()
+        if self.write_queue:
+            self.write_queue.stop()
+        if self.pool:
+            self.pool.close_all()
+        if self.analytics_pool:
+            self.analytics_pool.close_all()
+
+    def _thread_in_transaction(self):
+        conn = getattr(self.local, 'conn', None)
+        return conn is not None and conn.in_transaction
+
+    @contextmanager
+    def transaction(self):
+        # Unidad de trabajo: la transaccion externa hace un solo COMMIT (un fsync);
+        # los bloques anidados usan SAVEPOINT y solo revierten su propio trabajo.
+        conn = self.get_conn()
+        depth = getattr(self.local, 'tx_depth', 0)
+        savepoint = f"sp_{depth}"
+        if depth == 0:
+            if conn.in_transaction:
+                logger.warning("Transaccion implicita pendiente al abrir unidad de trabajo. Se confirma antes de continuar.")
+                conn.commit()
+            conn.execute("BEGIN IMMEDIATE;")
+        else:
+            conn.execute(f"SAVEPOINT {savepoint};")
+        self.local.tx_depth = depth + 1
+        try:
+            yield conn.cursor()
+        except BaseException:
+            self.local.tx_depth = depth
+            if depth == 0:
+                conn.rollback()
+            else:
+                conn.execute(f"ROLLBACK TO {savepoint};")
+                conn.execute(f"RELEASE {savepoint};")
+            raise
+        self.local.tx_depth = depth
+        if depth == 0:
+            conn.commit()
+        else:
+            conn.execute(f"RELEASE {savepoint};")
+
+    def in_transaction(self):
+        return getattr(self.local, 'tx_depth', 0) > 0
+
+    def execute_async(self, query, params=()):
+        if not self.write_queue:
+            raise RuntimeError("execute_async requiere database.write_queue.enabled")
+        return self.write_queue.submit(query, params)
 
     def execute(self, query, params=()):
+        # Si el hilo ya tiene una transaccion abierta, encolar la escritura provocaria un
+        # interbloqueo con el hilo escritor; se ejecuta directo sobre su conexion.
+        if self.write_queue and not self._thread_in_transaction():
+            result = self.write_queue.submit(query, params).result(timeout=self.write_timeout)
+            if query.strip().upper().startswith("INSERT"):
+                return result.lastrowid
+            return result.rowcount
+
         conn = self.get_conn()
         cursor = conn.cursor()
         cursor.execute(query, params)
-        conn.commit()
+        if not self.in_transaction():
+            conn.commit()
         if query.strip().upper().startswith("INSERT"):
             return cursor.lastrowid
         return cursor.rowcount
 
-    def fetchone(self, query, params=()):
-        conn = self.get_conn()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        row = cursor.fetchone()
-        return dict(row) if row else None
+    @contextmanager
+    def _lane(self, lane):
+        if lane not in LANES:
+            raise ValueError(f"lane invalido: {lane!r}. Opciones: {', '.join(LANES)}")
+        if lane == "main" or not self.analytics_pool:
+            yield self.get_conn()
+            return
+        conn = self.analytics_pool.checkout()
+        try:
+            if getattr(conn, 'attach_version', 0) != self._attach_version:
+                self._sync_attachments(conn)
+            yield conn
+        finally:
+            self.analytics_pool.checkin(conn)
 
-    def fetchall(self, query, params=()):
-        conn = self.get_conn()
+    def _select(self, conn, query, params, row_mode):
         cursor = conn.cursor()
+        if row_mode != "dict":
+            cursor.row_factory = None
         cursor.execute(query, params)
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
+        return cursor, row_converter(cursor, row_mode)
+
+    def fetchone(self, query, params=(), row_mode="dict", lane="main"):
+        with self._lane(lane) as conn:
+            cursor, convert = self._select(conn, query, params, row_mode)
+            row = cursor.fetchone()
+            cursor.close()
+        if row is None:
+            return None
+        return convert(row) if convert else row
+
+    def fetchall(self, query, params=(), row_mode="dict", lane="main", cache=None):
+        # cache: tablas que lee la consulta. Cualquier escritura sobre ellas invalida la entrada.
+        if cache and self.query_cache.enabled and not self._thread_in_transaction():
+            return self._cached_fetchall(query, params, row_mode, lane, cache)
+        with self._lane(lane) as conn:
+            cursor, convert = self._select(conn, query, params, row_mode)
+            rows = cursor.fetchall()
+        return list(map(convert, rows)) if convert else rows
+
+    def _cached_fetchall(self, query, params, row_mode, lane, tables):
+        tables = tuple(sorted({t.lower() for t in tables}))
+        frozen_params = tuple(sorted(params.items())) if isinstance(params, dict) else tuple(params)
+        key = (query, frozen_params, row_mode, lane)
+        hit, rows, token = self.query_cache.get(key, tables)
+        if not hit:
+            rows = tuple(self.fetchall(query, params, row_mode=row_mode, lane=lane))
+            self.query_cache.put(key, tables, rows, token)
+        # Los dict son mutables: cada llamada recibe copias para no contaminar la cache.
+        if row_mode == "dict":
+            return [dict(row) for row in rows]
+        return list(rows)
+
+    def iterate(self, query, params=(), row_mode="dict", batch_size=256, lane="main"):
+        # Streaming: nunca materializa el resultado completo, solo lotes de batch_size filas.
+        with self._lane(lane) as conn:
+            cursor, convert = self._select(conn, query, params, row_mode)
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    if convert:
+                        yield from map(convert, rows)
+                    else:
+                        yield from rows
+            finally:
+                cursor.close()
 
 # Singleton instance
 db_manager = DatabaseManager()
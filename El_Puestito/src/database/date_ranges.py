@@ -0,0 +1,15 @@
+import datetime
+
+def as_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.datetime.strptime(str(value).strip()[:10], '%Y-%m-%d').date()
+
+def day_bounds(start, end=None):
+    # Rango semiabierto [inicio, fin + 1 dia) como texto ISO. Compara la columna tal cual
+    # (sin DATE()), de modo que SQLite puede usar el indice sobre la fecha.
+    start_date = as_date(start)
+    end_date = as_date(end) if end is not None else start_date
+    return start_date.isoformat(), (end_date + datetime.timedelta(days=1)).isoformat()
@@ -0,0 +1,134 @@
+import threading
+from collections import OrderedDict, namedtuple
+from src.database.connection import db_manager
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+DEFAULT_IDEMPOTENCY_SETTINGS = {
+    "max_entries": 2048,
+    "wait_timeout_s": 10.0,
+}
+
+# status: 'ok' (id_orden creado) o 'rejected' (error de validacion, mensaje en error).
+OrderOutcome = namedtuple("OrderOutcome", "status id_orden error")
+
+class IdempotencyStore:
+    def __init__(self, db=db_manager, settings=None):
+        self.db = db
+        settings = {**DEFAULT_IDEMPOTENCY_SETTINGS, **(settings if settings is not None else db.settings.get("idempotency", {}))}
+        self.max_entries = max(1, int(settings["max_entries"]))
+        self.wait_timeout = float(settings["wait_timeout_s"])
+        self._lock = threading.Lock()
+        self._outcomes = OrderedDict()
+        self._inflight = {}
+        self._counters = {"executed": 0, "replayed": 0, "waited": 0, "recovered": 0, "evictions": 0}
+
+    def run(self, key, execute):
+        # Devuelve (outcome, replayed). Un reintento con la misma llave recibe el resultado
+        # original; si llega mientras el primero sigue en curso, espera a que termine.
+        if key is None:
+            return execute(), False
+        while True:
+            with self._lock:
+                outcome = self._outcomes.get(key)
+                if outcome is not None:
+                    self._outcomes.move_to_end(key)
+                    self._counters["replayed"] += 1
+                    return outcome, True
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = threading.Event()
+                    break
+                self._counters["waited"] += 1
+            # Si el primero fallo sin resultado (error interno), este reintento lo vuelve a ejecutar.
+            event.wait(self.wait_timeout)
+
+        try:
+            outcome = execute()
+            self.remember(key, outcome)
+            with self._lock:
+                self._counters["executed"] += 1
+            return outcome, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def run_many(self, keys, execute):
+        # Version por lote de run(): execute(indices) -> {indice: outcome} solo para las llaves
+        # que esta llamada reclamo. Repetidas dentro del lote y reintentos reciben el original.
+        resultados = [None] * len(keys)
+        ejecutar, esperar, copias, reclamadas = [], [], [], {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key is None:
+                    ejecutar.append(i)
+                    continue
+                outcome = self._outcomes.get(key)
+                if outcome is not None:
+                    self._outcomes.move_to_end(key)
+                    self._counters["replayed"] += 1
+                    resultados[i] = (outcome, True)
+                elif key in reclamadas:
+                    copias.append((i, reclamadas[key][0]))
+                elif key in self._inflight:
+                    self._counters["waited"] += 1
+                    esperar.append((i, key, self._inflight[key]))
+                else:
+                    reclamadas[key] = (i, threading.Event())
+                    self._inflight[key] = reclamadas[key][1]
+                    ejecutar.append(i)
+
+        try:
+            outcomes = execute(ejecutar) if ejecutar else {}
+            for i in ejecutar:
+                if keys[i] is not None:
+                    self.remember(keys[i], outcomes[i])
+                resultados[i] = (outcomes[i], False)
+            with self._lock:
+                self._counters["executed"] += len(ejecutar)
+        finally:
+            with self._lock:
+                for key in reclamadas:
+                    self._inflight.pop(key, None)
+            for _, event in reclamadas.values():
+                event.set()
+
+        for i, original in copias:
+            resultados[i] = (resultados[original][0], True)
+        with self._lock:
+            self._counters["replayed"] += len(copias)
+        for i, key, event in esperar:
+            event.wait(self.wait_timeout)
+            resultados[i] = self.run(key, lambda i=i: execute([i])[i])
+        return resultados
+
+    def recover(self, key):
+        # Llave fuera del LRU (reinicio o desalojo): el indice UNIQUE de client_uuid la rechazo.
+        row = self.db.fetchone("SELECT id_orden FROM ordenes WHERE client_uuid = ?;", (key,), row_mode='tuple')
+        if row is None:
+            return None
+        with self._lock:
+            self._counters["recovered"] += 1
+        return OrderOutcome("ok", row[0], None)
+
+    def remember(self, key, outcome):
+        with self._lock:
+            self._outcomes[key] = outcome
+            self._outcomes.move_to_end(key)
+            while len(self._outcomes) > self.max_entries:
+                self._outcomes.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._outcomes.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({"size": len(self._outcomes), "max_entries": self.max_entries, "inflight": len(self._inflight)})
+        return stats
+
+order_idempotency = IdempotencyStore()
@@ -0,0 +1,196 @@
+import re
+import time
+import sqlite3
+import threading
+from collections import deque
+from logger_setup import setup_logger
+from src.database.query_cache import written_tables
+
+logger = setup_logger()
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+_EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT", "REPLACE")
+
+def fingerprint(sql):
+    # Normaliza literales y listas IN (?, ?, ...) para que consultas iguales con distintos valores se agrupen.
+    normalized = _STRING_LITERAL.sub("?", sql)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _IN_LIST.sub("IN (?+)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip().rstrip(";").strip()
+
+def params_shape(params, many=False):
+    if many:
+        params = list(params)
+        first = params_shape(params[0]) if params else "()"
+        return f"{len(params)} x {first}"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in params) + ")"
+
+class _Entry:
+    __slots__ = ("count", "total", "max", "slow", "samples", "last_explain")
+
+    def __init__(self, sample_size):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+        self.samples = deque(maxlen=sample_size)
+        self.last_explain = 0.0
+
+class QueryStats:
+    def __init__(self, slow_query_ms=100.0, sample_size=512, explain_slow=True, explain_interval_s=60.0):
+        self.slow_threshold = float(slow_query_ms) / 1000.0
+        self.sample_size = max(1, int(sample_size))
+        self.explain_slow = bool(explain_slow)
+        self.explain_interval = float(explain_interval_s)
+        self._entries = {}
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+        self._started = time.time()
+
+    def _fingerprint(self, sql):
+        fp = self._fingerprints.get(sql)
+        if fp is None:
+            fp = fingerprint(sql)
+            if len(self._fingerprints) > 4096:
+                self._fingerprints.clear()
+            self._fingerprints[sql] = fp
+        return fp
+
+    def record(self, conn, sql, params, elapsed, many=False):
+        fp = self._fingerprint(sql)
+        is_slow = elapsed >= self.slow_threshold
+        explain = False
+        with self._lock:
+            entry = self._entries.get(fp)
+            if entry is None:
+                entry = self._entries[fp] = _Entry(self.sample_size)
+            entry.count += 1
+            entry.total += elapsed
+            entry.samples.append(elapsed)
+            if elapsed > entry.max:
+                entry.max = elapsed
+            if is_slow:
+                entry.slow += 1
+                now = time.monotonic()
+                if self.explain_slow and now - entry.last_explain >= self.explain_interval:
+                    entry.last_explain = now
+                    explain = True
+        if is_slow:
+            self._log_slow(conn, sql, fp, params, elapsed, many, explain)
+
+    def _log_slow(self, conn, sql, fp, params, elapsed, many, explain):
+        plan = ""
+        if explain and fp.upper().startswith(_EXPLAINABLE):
+            try:
+                sample = (list(params)[0] if params else ()) if many else params
+                rows = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", sample).fetchall()
+                if rows:
+                    plan = " | plan: " + "; ".join(str(row[3]) for row in rows)
+            except sqlite3.Error as e:
+                plan = f" | plan no disponible: {e}"
+        logger.warning(
+            f"Consulta lenta ({elapsed * 1000:.1f} ms) params={params_shape(params, many)}: {fp}{plan}"
+        )
+
+    def snapshot(self, limit=50, sort_by="total_ms"):
+        with self._lock:
+            items = [(fp, e.count, e.total, e.max, e.slow, sorted(e.samples)) for fp, e in self._entries.items()]
+        report = []
+        for fp, count, total, max_, slow, samples in items:
+            report.append({
+                "fingerprint": fp,
+                "count": count,
+                "slow": slow,
+                "total_ms": round(total * 1000, 3),
+                "mean_ms": round(total / count * 1000, 3),
+                "p50_ms": round(samples[int((len(samples) - 1) * 0.50)] * 1000, 3),
+                "p95_ms": round(samples[int((len(samples) - 1) * 0.95)] * 1000, 3),
+                "max_ms": round(max_ * 1000, 3),
+            })
+        if report and sort_by not in report[0]:
+            sort_by = "total_ms"
+        report.sort(key=lambda r: r[sort_by], reverse=True)
+        return report[:limit] if limit else report
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self._started = time.time()
+
+    @property
+    def started_at(self):
+        return self._started
+
+# El tiempo medido es el de execute(): SQLite evalua el primer paso ahi (incluido ORDER BY/GROUP BY),
+# los fetch posteriores no se cuentan.
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        t0 = time.perf_counter()
+        try:
+            result = super().execute(sql, parameters)
+        finally:
+            stats = self.connection.query_stats
+            if stats is not None:
+                stats.record(self.connection, sql, parameters, time.perf_counter() - t0)
+        if self.connection.query_cache is not None:
+            self.connection.track_writes(sql)
+        return result
+
+    def executemany(self, sql, seq_of_parameters):
+        stats = self.connection.query_stats
+        if stats is not None and not isinstance(seq_of_parameters, (list, tuple)):
+            seq_of_parameters = list(seq_of_parameters)
+        t0 = time.perf_counter()
+        try:
+            result = super().executemany(sql, seq_of_parameters)
+        finally:
+            if stats is not None:
+                stats.record(self.connection, sql, seq_of_parameters, time.perf_counter() - t0, many=True)
+        if self.connection.query_cache is not None:
+            self.connection.track_writes(sql)
+        return result
+
+class InstrumentedConnection(sqlite3.Connection):
+    query_stats = None
+    query_cache = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pending_tables = set()
+
+    def track_writes(self, sql):
+        # Las tablas escritas se purgan al ejecutar y otra vez al confirmar, para que ninguna
+        # lectura concurrente deje en cache datos previos al COMMIT.
+        tables = written_tables(sql)
+        if tables:
+            self.query_cache.invalidate(tables, notify=False)
+            self.pending_tables |= tables
+        if self.pending_tables and not self.in_transaction:
+            self.flush_invalidations()
+
+    def flush_invalidations(self):
+        tables, self.pending_tables = frozenset(self.pending_tables), set()
+        if tables and self.query_cache is not None:
+            self.query_cache.invalidate(tables)
+
+    def commit(self):
+        super().commit()
+        self.flush_invalidations()
+
+    def rollback(self):
+        super().rollback()
+        self.flush_invalidations()
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,109 @@
+import gzip
+import json
+import hashlib
+import threading
+from collections import namedtuple
+from src.database.connection import db_manager
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+MENU_TABLES = frozenset(("menu_items", "menu_categorias"))
+
+MenuEntry = namedtuple("MenuEntry", "id_item nombre precio precio_michelada destino disponible id_categoria")
+
+class MenuSnapshot:
+    __slots__ = ("version", "items", "available_ids", "menu", "menu_publico", "_publicado")
+
+    def __init__(self, version, items, menu, menu_publico):
+        self.version = version
+        self.items = items
+        self.available_ids = frozenset(item_id for item_id, entry in items.items() if entry.disponible)
+        self.menu = menu
+        self.menu_publico = menu_publico
+        self._publicado = None
+
+    def get(self, item_id):
+        return self.items.get(item_id)
+
+    def published(self):
+        # JSON, gzip y ETag se generan una sola vez por version del catalogo.
+        if self._publicado is None:
+            body = json.dumps(self.menu_publico, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            etag = hashlib.sha256(body).hexdigest()[:32]
+            self._publicado = (body, gzip.compress(body, compresslevel=6, mtime=0), etag)
+        return self._publicado
+
+class MenuCatalog:
+    def __init__(self, db=db_manager):
+        self.db = db
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._generation = 0
+        self.db.add_invalidation_listener(self._on_tables_changed)
+
+    def _on_tables_changed(self, tables):
+        if "*" in tables or not MENU_TABLES.isdisjoint(tables):
+            self.invalidate()
+
+    def invalidate(self):
+        self._generation += 1
+
+    def snapshot(self):
+        # Los lectores toman la referencia una sola vez; la recarga arma un objeto nuevo y lo
+        # publica con una asignacion, nunca se modifica un catalogo que ya esta en uso.
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self._generation:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != self._generation:
+                snapshot = self._load(self._generation)
+                self._snapshot = snapshot
+            return snapshot
+
+    def _load(self, version):
+        rows = self.db.fetchall("""
+            SELECT c.id_categoria AS cat_id, c.nombre AS cat_nombre, c.destino AS cat_destino, i.*
+            FROM menu_categorias c
+            LEFT JOIN menu_items i ON i.id_categoria = c.id_categoria
+            ORDER BY c.nombre, c.id_categoria, i.rowid;
+        """, row_mode='record')
+
+        items = {}
+        categorias = []
+        publico = []
+        actual = None
+        for row in rows:
+            if actual is None or actual["id"] != row.cat_id:
+                actual = {"id": row.cat_id, "nombre": row.cat_nombre, "destino": row.cat_destino or 'cocina', "items": []}
+                categorias.append(actual)
+            if row.id_item is None:
+                continue
+            item_dict = dict(zip(row._fields[3:], row[3:]))
+            precio_michelada = item_dict.get('precio_michelada') or 0
+            items[row.id_item] = MenuEntry(
+                row.id_item, item_dict['nombre'], item_dict['precio'], precio_michelada,
+                actual["destino"], bool(item_dict.get('disponible', 1)), row.cat_id
+            )
+            item_dict['precio'] = item_dict['precio'] / 100.0
+            if 'precio_michelada' in item_dict:
+                item_dict['precio_michelada'] = precio_michelada / 100.0
+            actual["items"].append(item_dict)
+
+        menu = {"categorias": []}
+        for cat in categorias:
+            menu["categorias"].append({"nombre": cat["nombre"], "destino": cat["destino"], "items": cat["items"]})
+            disponibles = []
+            for item in cat["items"]:
+                if item.get("disponible", True):
+                    item_app = dict(item)
+                    item_app['id'] = item_app.pop('id_item')
+                    disponibles.append(item_app)
+            if disponibles:
+                publico.append({"nombre": cat["nombre"], "destino": cat["destino"], "items": disponibles})
+
+        logger.info(f"Catalogo de menu cargado (version {version}): {len(items)} productos.")
+        return MenuSnapshot(version, items, menu, {"categorias": publico})
+
+menu_catalog = MenuCatalog()
@@ -0,0 +1,53 @@
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+PREFIJOS_BARRA_ANTIGUOS = ("MIC", "OBA", "BSA", "CER", "RTD")
+
+def _columns(cursor, table):
+    return {info[1] for info in cursor.execute(f"PRAGMA table_info({table})").fetchall()}
+
+def _migrate_hardcoded_destinations(cursor):
+    logger.info("Migrando logica de prefijos a base de datos...")
+    marcadores = ", ".join("?" for _ in PREFIJOS_BARRA_ANTIGUOS)
+    cursor.execute(
+        f"""
+        UPDATE menu_categorias SET destino = 'barra'
+        WHERE id_categoria IN (SELECT id_categoria FROM menu_items WHERE substr(id_item, 1, 3) IN ({marcadores}));
+        """,
+        PREFIJOS_BARRA_ANTIGUOS
+    )
+
+def upgrade(cursor):
+    # Antes se verificaban en cada arranque; ahora corren una sola vez por base de datos.
+    if 'precio_michelada' not in _columns(cursor, "menu_items"):
+        logger.info("Migracion de esquema: Agregando columna precio_michelada en menu_items")
+        cursor.execute("ALTER TABLE menu_items ADD COLUMN precio_michelada INTEGER DEFAULT 0;")
+
+    if 'id_cerveza' not in _columns(cursor, "orden_detalle"):
+        cursor.execute("ALTER TABLE orden_detalle ADD COLUMN id_cerveza TEXT;")
+        cursor.execute("ALTER TABLE orden_detalle ADD COLUMN nombre_cerveza TEXT;")
+
+    if 'destino' not in _columns(cursor, "menu_categorias"):
+        logger.info("Migracion de esquema: Falta columna destino en menu_categorias.")
+        cursor.execute("ALTER TABLE menu_categorias ADD COLUMN destino TEXT DEFAULT 'cocina';")
+        _migrate_hardcoded_destinations(cursor)
+
+    columns_emp = _columns(cursor, "empleados")
+    if 'fingerprint_id' not in columns_emp:
+        logger.info("Migracion de esquema: Agregando fingerprint_id en empleados.")
+        cursor.execute("ALTER TABLE empleados ADD COLUMN fingerprint_id INTEGER;")
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_empleados_fingerprint ON empleados(fingerprint_id);")
+    if 'fcm_token' not in columns_emp:
+        cursor.execute("ALTER TABLE empleados ADD COLUMN fcm_token TEXT;")
+    if 'recibe_alertas' not in columns_emp:
+        cursor.execute("ALTER TABLE empleados ADD COLUMN recibe_alertas INTEGER DEFAULT 1;")
+
+    if 'proformas_impresas' not in _columns(cursor, "ordenes"):
+        logger.info("Migracion de esquema: Agregando proformas_impresas en ordenes.")
+        cursor.execute("ALTER TABLE ordenes ADD COLUMN proformas_impresas INTEGER NOT NULL DEFAULT 0;")
+
+    # Con foreign_keys activo ya no se generan huerfanos nuevos; basta limpiar una vez.
+    cursor.execute("DELETE FROM eventos_asistencia WHERE id_empleado NOT IN (SELECT id_empleado FROM empleados);")
+    cursor.execute("DELETE FROM orden_detalle WHERE id_orden NOT IN (SELECT id_orden FROM ordenes);")
+    logger.info("Datos huerfanos limpiados correctamente.")
@@ -0,0 +1,11 @@
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+def upgrade(cursor):
+    # Los reportes filtran por estado = 'cerrada' y un rango semiabierto de fecha_cierre:
+    # el indice compuesto resuelve ambos en un solo SEARCH. Cubre tambien las busquedas por estado solo.
+    logger.info("Creando indices compuestos para reportes por rango de fechas...")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ordenes_estado_fecha_cierre ON ordenes(estado, fecha_cierre);")
+    cursor.execute("DROP INDEX IF EXISTS idx_ordenes_estado;")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_eventos_empleado_timestamp ON eventos_asistencia(id_empleado, timestamp);")
@@ -0,0 +1,12 @@
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+def upgrade(cursor):
+    # Caja y KDS solo leen ordenes activas y detalles pendientes: indices parciales que
+    # crecen con el servicio del dia y no con el historial.
+    logger.info("Creando indices parciales para ordenes activas y comandas pendientes...")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ordenes_activas_mesa ON ordenes(mesa_key) WHERE estado = 'activa';")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_detalle_pendiente_destino ON orden_detalle(destino, id_orden) WHERE estado_item = 'pendiente';")
+    # Sobre la tabla completa estado_item casi siempre vale 'listo': el indice parcial lo reemplaza.
+    cursor.execute("DROP INDEX IF EXISTS idx_orden_detalle_estado_item;")
@@ -0,0 +1,24 @@
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+def _columns(cursor, table):
+    return {info[1] for info in cursor.execute(f"PRAGMA table_info({table})").fetchall()}
+
+def upgrade(cursor):
+    # Totales por orden guardados en la misma fila: caja y reportes ya no suman orden_detalle.
+    # Solo cuentan los renglones no cancelados; items_count son unidades, no renglones.
+    columnas = _columns(cursor, "ordenes")
+    if 'total_centavos' not in columnas:
+        cursor.execute("ALTER TABLE ordenes ADD COLUMN total_centavos INTEGER NOT NULL DEFAULT 0;")
+    if 'items_count' not in columnas:
+        cursor.execute("ALTER TABLE ordenes ADD COLUMN items_count INTEGER NOT NULL DEFAULT 0;")
+
+    logger.info("Calculando totales acumulados de ordenes existentes...")
+    cursor.execute("""
+        UPDATE ordenes SET (total_centavos, items_count) = (
+            SELECT COALESCE(SUM(d.cantidad * d.precio_unitario_congelado), 0), COALESCE(SUM(d.cantidad), 0)
+            FROM orden_detalle d
+            WHERE d.id_orden = ordenes.id_orden AND d.estado_item != 'cancelado'
+        );
+    """)
@@ -0,0 +1,72 @@
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+def _columns(cursor, table):
+    return {info[1] for info in cursor.execute(f"PRAGMA table_info({table})").fetchall()}
+
+def upgrade(cursor):
+    # Mesas fisicas, cuentas (principal o subcuenta) y sus mesas en tablas indexadas; mesa_key
+    # queda como valor derivado para mostrar. Dividir, agrupar y cerrar la cuenta madre dejan
+    # de depender de LIKE 'x-%' y de partir cadenas.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS mesas (
+            id_mesa INTEGER PRIMARY KEY AUTOINCREMENT,
+            etiqueta TEXT NOT NULL UNIQUE
+        );
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cuentas (
+            id_cuenta INTEGER PRIMARY KEY AUTOINCREMENT,
+            mesa_key TEXT NOT NULL,
+            nombre TEXT,
+            id_padre INTEGER,
+            estado TEXT NOT NULL DEFAULT 'abierta',
+            fecha_apertura DATETIME NOT NULL,
+            fecha_cierre DATETIME,
+            FOREIGN KEY (id_padre) REFERENCES cuentas (id_cuenta)
+        );
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cuenta_mesas (
+            id_cuenta INTEGER NOT NULL,
+            id_mesa INTEGER NOT NULL,
+            PRIMARY KEY (id_cuenta, id_mesa),
+            FOREIGN KEY (id_cuenta) REFERENCES cuentas (id_cuenta),
+            FOREIGN KEY (id_mesa) REFERENCES mesas (id_mesa)
+        ) WITHOUT ROWID;
+    """)
+    if 'id_cuenta' not in _columns(cursor, "ordenes"):
+        cursor.execute("ALTER TABLE ordenes ADD COLUMN id_cuenta INTEGER REFERENCES cuentas (id_cuenta);")
+
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_cuentas_abiertas_key ON cuentas(mesa_key) WHERE estado = 'abierta';")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cuentas_padre_abiertas ON cuentas(id_padre) WHERE estado = 'abierta';")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cuenta_mesas_mesa ON cuenta_mesas(id_mesa);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ordenes_activas_cuenta ON ordenes(id_cuenta) WHERE estado = 'activa';")
+
+    # Solo las ordenes activas necesitan cuenta; el historial conserva su mesa_key.
+    activas = cursor.execute("""
+        SELECT mesa_key, MIN(fecha_apertura) FROM ordenes
+        WHERE estado = 'activa' AND id_cuenta IS NULL GROUP BY mesa_key;
+    """).fetchall()
+    if not activas:
+        return
+    logger.info(f"Migrando {len(activas)} cuentas activas al modelo de mesas y cuentas...")
+    principales = {}
+    # Primero las cuentas principales para que las subcuentas encuentren a su madre.
+    for mesa_key, apertura in sorted(activas, key=lambda r: '-' in r[0]):
+        base, _, nombre = mesa_key.partition('-')
+        etiquetas = sorted({m for m in base.split('+') if m}) or [mesa_key]
+        cursor.execute(
+            "INSERT INTO cuentas (mesa_key, nombre, id_padre, estado, fecha_apertura) VALUES (?, ?, ?, 'abierta', ?);",
+            (mesa_key, nombre or None, principales.get(base) if nombre else None, apertura)
+        )
+        id_cuenta = cursor.lastrowid
+        if not nombre:
+            principales[mesa_key] = id_cuenta
+        cursor.executemany("INSERT OR IGNORE INTO mesas (etiqueta) VALUES (?);", [(m,) for m in etiquetas])
+        cursor.execute(
+            f"INSERT INTO cuenta_mesas (id_cuenta, id_mesa) SELECT ?, id_mesa FROM mesas WHERE etiqueta IN ({','.join('?' * len(etiquetas))});",
+            (id_cuenta, *etiquetas)
+        )
+        cursor.execute("UPDATE ordenes SET id_cuenta = ? WHERE mesa_key = ? AND estado = 'activa';", (id_cuenta, mesa_key))
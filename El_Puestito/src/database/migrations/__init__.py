@@ -0,0 +1,12 @@
+# Orden de aplicacion. Cada modulo expone upgrade(cursor) y corre dentro de una transaccion;
+# al terminar se fija PRAGMA user_version al numero de la migracion.
+MIGRATIONS = [
+    (1, "001_centavos_and_indices"),
+    (2, "002_legacy_columns_and_orphans"),
+    (3, "003_report_range_indexes"),
+    (4, "004_active_partial_indexes"),
+    (5, "005_order_running_totals"),
+    (6, "006_table_accounts"),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
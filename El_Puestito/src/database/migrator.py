@@ -0,0 +1,38 @@
+import importlib
+from src.database.connection import db_manager
+from src.database.migrations import MIGRATIONS
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+class MigrationRunner:
+    def __init__(self, db=db_manager, migrations=MIGRATIONS, package="src.database.migrations"):
+        self.db = db
+        self.migrations = sorted(migrations)
+        self.package = package
+        self.latest_version = self.migrations[-1][0] if self.migrations else 0
+
+    def current_version(self):
+        return self.db.fetchone("PRAGMA user_version;", row_mode="tuple")[0]
+
+    def is_up_to_date(self, version=None):
+        return (self.current_version() if version is None else version) >= self.latest_version
+
+    def apply_pending(self, version=None):
+        version = self.current_version() if version is None else version
+        for number, module_name in self.migrations:
+            if number <= version:
+                continue
+            module = importlib.import_module(f"{self.package}.{module_name}")
+            logger.info(f"Aplicando migracion {module_name} (user_version {version} -> {number})...")
+            try:
+                with self.db.transaction() as cursor:
+                    module.upgrade(cursor)
+                    cursor.execute(f"PRAGMA user_version = {int(number)};")
+            except Exception as e:
+                logger.error(f"Error en migracion {module_name}, rollback ejecutado: {e}")
+                return False
+            version = number
+        return True
+
+migration_runner = MigrationRunner()
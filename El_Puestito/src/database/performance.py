@@ -0,0 +1,44 @@
+import re
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+# Perfiles de PRAGMA por conexion. "default" deja los valores de fabrica de SQLite.
+# synchronous=NORMAL en WAL no pierde integridad ante un corte de luz, solo las ultimas
+# transacciones confirmadas que no alcanzaron a llegar al checkpoint.
+PRAGMA_PROFILES = {
+    "default": {},
+    "balanced": {
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 4000,
+        "journal_size_limit": 64 * 1024 * 1024,
+    },
+    "throughput": {
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 10000,
+        "journal_size_limit": 128 * 1024 * 1024,
+    },
+}
+
+ALLOWED_PRAGMAS = {"synchronous", "cache_size", "mmap_size", "temp_store", "wal_autocheckpoint", "journal_size_limit", "cache_spill"}
+_VALUE = re.compile(r"^-?\w+$")
+
+def resolve_pragmas(settings):
+    profile = settings.get("profile", "balanced")
+    if profile not in PRAGMA_PROFILES:
+        logger.warning(f"Perfil de rendimiento desconocido '{profile}'. Usando 'balanced'.")
+        profile = "balanced"
+    pragmas = {**PRAGMA_PROFILES[profile], **settings.get("pragmas", {})}
+    valid = {}
+    for name, value in pragmas.items():
+        if name not in ALLOWED_PRAGMAS or not _VALUE.match(str(value)):
+            logger.warning(f"PRAGMA ignorado en database.performance: {name}={value!r}")
+            continue
+        valid[name] = value
+    return profile, valid
@@ -0,0 +1,186 @@
+import time
+import sqlite3
+import threading
+from collections import deque
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    pass
+
+class ConnectionPool:
+    def __init__(self, factory, min_size=2, max_size=16, checkout_timeout=30.0,
+                 idle_timeout=300.0, health_check_interval=30.0, name="principal"):
+        self.factory = factory
+        self.min_size = max(0, int(min_size))
+        self.max_size = max(1, int(max_size), self.min_size)
+        self.checkout_timeout = float(checkout_timeout)
+        self.idle_timeout = float(idle_timeout)
+        self.health_check_interval = float(health_check_interval)
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0
+        self._closed = False
+        self._counters = {
+            "checkouts": 0, "reused": 0, "created": 0, "closed": 0, "waits": 0,
+            "timeouts": 0, "health_check_failures": 0, "reclaimed": 0, "reaped": 0,
+        }
+        self._wait_time_total = 0.0
+
+        for _ in range(self.min_size):
+            with self._cond:
+                self._size += 1
+            conn = self._create()
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+
+    def _create(self):
+        try:
+            conn = self.factory()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._counters["created"] += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        self._size -= 1
+        self._counters["closed"] += 1
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute("SELECT 1;").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _reclaim_orphans(self):
+        # Conexiones cuyo hilo dueno ya murio sin devolverlas (p.ej. hilos de Werkzeug).
+        reclaimed = 0
+        for key, (conn, owner) in list(self._in_use.items()):
+            if owner is not None and not owner.is_alive():
+                del self._in_use[key]
+                try:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    self._idle.append((conn, time.monotonic()))
+                except sqlite3.Error:
+                    self._discard(conn)
+                reclaimed += 1
+        self._counters["reclaimed"] += reclaimed
+        return reclaimed
+
+    def checkout(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        waited_since = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError(f"Pool '{self.name}' cerrado")
+
+                while self._idle:
+                    conn, last_used = self._idle.pop()
+                    if time.monotonic() - last_used > self.health_check_interval and not self._is_healthy(conn):
+                        self._counters["health_check_failures"] += 1
+                        self._discard(conn)
+                        continue
+                    self._counters["reused"] += 1
+                    return self._lend(conn, waited_since)
+
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+
+                if self._reclaim_orphans():
+                    continue
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"Pool '{self.name}' agotado: {self.max_size} conexiones en uso por mas de {self.checkout_timeout}s"
+                    )
+                if waited_since is None:
+                    waited_since = time.monotonic()
+                    self._counters["waits"] += 1
+                self._cond.wait(remaining)
+
+        conn = self._create()
+        with self._cond:
+            return self._lend(conn, waited_since)
+
+    def _lend(self, conn, waited_since):
+        self._in_use[id(conn)] = (conn, threading.current_thread())
+        self._counters["checkouts"] += 1
+        if waited_since is not None:
+            self._wait_time_total += time.monotonic() - waited_since
+        return conn
+
+    def checkin(self, conn):
+        with self._cond:
+            if self._in_use.pop(id(conn), None) is None:
+                return
+            try:
+                if conn.in_transaction:
+                    logger.warning(f"Conexion devuelta al pool '{self.name}' con transaccion abierta. Rollback.")
+                    conn.rollback()
+            except sqlite3.Error:
+                self._discard(conn)
+                self._cond.notify()
+                return
+
+            if self._closed:
+                self._discard(conn)
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._reap_locked()
+            self._cond.notify()
+
+    def _reap_locked(self):
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size:
+            conn, last_used = self._idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._discard(conn)
+            self._counters["reaped"] += 1
+
+    def reap(self):
+        with self._cond:
+            self._reclaim_orphans()
+            self._reap_locked()
+            self._cond.notify_all()
+
+    def close_all(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._discard(conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._counters)
+            stats.update({
+                "name": self.name,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "wait_time_total_ms": round(self._wait_time_total * 1000, 2),
+            })
+            return stats
@@ -0,0 +1,130 @@
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+ALL_TABLES = "*"
+
+_WRITE_RE = re.compile(
+    r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+"
+    r"(?:[\"`\[]?\w+[\"`\]]?\.)?[\"`\[]?(\w+)",
+    re.IGNORECASE,
+)
+_DDL_RE = re.compile(r"^\s*(?:CREATE|ALTER|DROP)\s", re.IGNORECASE)
+
+@lru_cache(maxsize=1024)
+def written_tables(sql):
+    # Tablas que modifica una sentencia. Los cambios de esquema invalidan todo.
+    match = _WRITE_RE.match(sql)
+    if match:
+        return frozenset((match.group(1).lower(),))
+    if _DDL_RE.match(sql):
+        return frozenset((ALL_TABLES,))
+    return frozenset()
+
+class QueryCache:
+    def __init__(self, max_entries=256, enabled=True):
+        # Con enabled=False no se guardan resultados, pero la deteccion de escrituras y los
+        # suscriptores siguen activos (los usan el catalogo del menu y otros estados en memoria).
+        self.enabled = enabled
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._by_table = {}
+        self._generations = {}
+        self._global_generation = 0
+        self._listeners = []
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "stale_skipped": 0, "invalidations": 0, "evictions": 0}
+
+    def _token(self, tables):
+        return (self._global_generation,) + tuple(self._generations.get(t, 0) for t in tables)
+
+    def get(self, key, tables):
+        # Devuelve (hit, valor, token). El token se usa al guardar para descartar
+        # resultados leidos mientras otra conexion escribia en las mismas tablas.
+        if not self.enabled:
+            return False, None, None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return True, entry[1], None
+            self._counters["misses"] += 1
+            return False, None, self._token(tables)
+
+    def put(self, key, tables, value, token):
+        if not self.enabled:
+            return
+        with self._lock:
+            if token != self._token(tables):
+                self._counters["stale_skipped"] += 1
+                return
+            self._entries[key] = (tables, value)
+            self._entries.move_to_end(key)
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._forget_locked(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def _forget_locked(self, key):
+        entry = self._entries.pop(key, None)
+        tables = entry[0] if entry is not None else ()
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+
+    def invalidate(self, tables, notify=True):
+        # notify=False se usa al detectar la escritura dentro de una transaccion: se purga
+        # la cache de inmediato pero los suscriptores solo se enteran al confirmar.
+        if not tables:
+            return
+        with self._lock:
+            removed = 0
+            if ALL_TABLES in tables:
+                self._global_generation += 1
+                removed = len(self._entries)
+                self._entries.clear()
+                self._by_table.clear()
+            else:
+                for table in tables:
+                    self._generations[table] = self._generations.get(table, 0) + 1
+                    for key in self._by_table.pop(table, ()):
+                        if key in self._entries:
+                            self._forget_locked(key)
+                            removed += 1
+            self._counters["invalidations"] += removed
+            listeners = list(self._listeners) if notify else ()
+        for listener in listeners:
+            try:
+                listener(tables)
+            except Exception as e:
+                logger.error(f"Error en suscriptor de invalidacion de cache ({sorted(tables)}): {e}", exc_info=True)
+
+    def add_listener(self, callback):
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def clear(self):
+        self.invalidate(frozenset((ALL_TABLES,)))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["enabled"] = self.enabled
+            stats["size"] = len(self._entries)
+            stats["max_entries"] = self.max_entries
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
@@ -0,0 +1,102 @@
+from src.database.connection import db_manager
+import datetime
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+def account_key(mesas, nombre=None):
+    # mesa_key derivado para mostrar: mesas ordenadas unidas con '+' y '-nombre' en subcuentas.
+    base = "+".join(sorted(str(m) for m in mesas))
+    return f"{base}-{nombre}" if nombre else base
+
+def parse_mesa_key(mesa_key):
+    # Solo para datos anteriores al modelo de cuentas (migracion y ordenes sin id_cuenta).
+    base, _, nombre = str(mesa_key).partition('-')
+    return [m for m in base.split('+') if m] or [str(mesa_key)], (nombre or None)
+
+class AccountRepository:
+    def get_account(self, cursor, id_cuenta):
+        return cursor.execute("SELECT * FROM cuentas WHERE id_cuenta = ?;", (id_cuenta,)).fetchone()
+
+    def find_open_account(self, cursor, mesa_key):
+        return cursor.execute("SELECT * FROM cuentas WHERE mesa_key = ? AND estado = 'abierta';", (mesa_key,)).fetchone()
+
+    def open_account(self, cursor, mesas, nombre=None, id_padre=None, timestamp=None, mesa_key=None):
+        mesa_key = mesa_key or account_key(mesas, nombre)
+        existente = self.find_open_account(cursor, mesa_key)
+        if existente:
+            return existente
+        if id_padre is None and nombre:
+            padre = self.find_open_account(cursor, account_key(mesas))
+            id_padre = padre['id_cuenta'] if padre else None
+
+        cursor.execute(
+            "INSERT INTO cuentas (mesa_key, nombre, id_padre, estado, fecha_apertura) VALUES (?, ?, ?, 'abierta', ?);",
+            (mesa_key, nombre, id_padre, timestamp or datetime.datetime.now().isoformat())
+        )
+        id_cuenta = cursor.lastrowid
+        etiquetas = sorted({str(m) for m in mesas})
+        cursor.executemany("INSERT OR IGNORE INTO mesas (etiqueta) VALUES (?);", [(m,) for m in etiquetas])
+        cursor.execute(
+            f"INSERT INTO cuenta_mesas (id_cuenta, id_mesa) SELECT ?, id_mesa FROM mesas WHERE etiqueta IN ({','.join('?' * len(etiquetas))});",
+            (id_cuenta, *etiquetas)
+        )
+        return self.get_account(cursor, id_cuenta)
+
+    def account_for_order(self, cursor, id_orden):
+        # Las ordenes sin id_cuenta (creadas antes del modelo o por SQL directo) se asocian al vuelo.
+        orden = cursor.execute("SELECT id_cuenta, mesa_key, fecha_apertura FROM ordenes WHERE id_orden = ?;", (id_orden,)).fetchone()
+        if orden is None:
+            return None
+        if orden['id_cuenta'] is not None:
+            return self.get_account(cursor, orden['id_cuenta'])
+        mesas, nombre = parse_mesa_key(orden['mesa_key'])
+        cuenta = self.open_account(cursor, mesas, nombre, timestamp=orden['fecha_apertura'], mesa_key=orden['mesa_key'])
+        cursor.execute("UPDATE ordenes SET id_cuenta = ? WHERE id_orden = ?;", (cuenta['id_cuenta'], id_orden))
+        return cuenta
+
+    def account_tables(self, cursor, id_cuenta):
+        return [row[0] for row in cursor.execute("""
+            SELECT m.etiqueta FROM cuenta_mesas cm JOIN mesas m ON m.id_mesa = cm.id_mesa
+            WHERE cm.id_cuenta = ? ORDER BY m.etiqueta;
+        """, (id_cuenta,)).fetchall()]
+
+    def open_subaccounts(self, cursor, id_padre):
+        return cursor.execute("SELECT id_cuenta, nombre FROM cuentas WHERE id_padre = ? AND estado = 'abierta';", (id_padre,)).fetchall()
+
+    def close_accounts_if_done(self, cursor, cuenta_ids, estado, timestamp):
+        # Una cuenta se cierra cuando ya no le quedan ordenes activas.
+        ids = [i for i in set(cuenta_ids) if i is not None]
+        if ids:
+            cursor.execute(f"""
+                UPDATE cuentas SET estado = ?, fecha_cierre = ?
+                WHERE id_cuenta IN ({','.join('?' * len(ids))}) AND estado = 'abierta'
+                AND NOT EXISTS (SELECT 1 FROM ordenes o WHERE o.id_cuenta = cuentas.id_cuenta AND o.estado = 'activa');
+            """, (estado, timestamp, *ids))
+
+    def describe_accounts(self, cuenta_ids, db=db_manager):
+        ids = [i for i in set(cuenta_ids) if i is not None]
+        if not ids:
+            return {}
+        descripciones = {}
+        for row in db.fetchall(f"""
+            SELECT c.id_cuenta, c.nombre, c.id_padre, m.etiqueta
+            FROM cuentas c
+            JOIN cuenta_mesas cm ON cm.id_cuenta = c.id_cuenta
+            JOIN mesas m ON m.id_mesa = cm.id_mesa
+            WHERE c.id_cuenta IN ({','.join('?' * len(ids))})
+            ORDER BY c.id_cuenta, m.etiqueta;
+        """, ids, row_mode='record'):
+            cuenta = descripciones.get(row.id_cuenta)
+            if cuenta is None:
+                cuenta = descripciones[row.id_cuenta] = {'id_cuenta': row.id_cuenta, 'nombre': row.nombre, 'id_padre': row.id_padre, 'mesas': []}
+            cuenta['mesas'].append(row.etiqueta)
+        for cuenta in descripciones.values():
+            cuenta['es_grupo'] = len(cuenta['mesas']) > 1
+        return descripciones
+
+    def describe_legacy(self, mesa_key):
+        mesas, nombre = parse_mesa_key(mesa_key)
+        return {'id_cuenta': None, 'nombre': nombre, 'id_padre': None, 'mesas': mesas, 'es_grupo': len(mesas) > 1}
+
+account_repo = AccountRepository()
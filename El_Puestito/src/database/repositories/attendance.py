@@ -1,4 +1,5 @@
 from src.database.connection import db_manager
+from src.database.date_ranges import day_bounds
 import sqlite3
 import datetime
 from logger_setup import setup_logger
@@ -9,14 +10,14 @@ class AttendanceRepository:
     def add_attendance_event(self, employee_id, event_type, timestamp):
         return db_manager.execute("INSERT INTO eventos_asistencia (id_empleado, timestamp, tipo) VALUES (?, ?, ?);", (employee_id, timestamp, event_type))
         
-    def get_attendance_history_range(self, start_date, end_date):
+    def get_attendance_history_range(self, start_date, end_date_exclusive):
         return db_manager.fetchall("""
             SELECT e.nombre, e.rol, ev.timestamp, ev.tipo, ev.id_empleado
             FROM eventos_asistencia ev
             JOIN empleados e ON ev.id_empleado = e.id_empleado
-            WHERE ev.timestamp BETWEEN ? AND ?
+            WHERE ev.timestamp >= ? AND ev.timestamp < ?
             ORDER BY ev.id_empleado, ev.timestamp;
-            """, (start_date, end_date))
+            """, (start_date, end_date_exclusive), lane="analytics")
         
     def clear_all_attendance_history(self):
         return db_manager.execute("DELETE FROM eventos_asistencia;")
@@ -27,24 +28,21 @@ class AttendanceRepository:
     def add_attendance_events_batch(self, events_list):
         query = "INSERT INTO eventos_asistencia (id_empleado, timestamp, tipo) VALUES (?, ?, ?);"
         try:
-            conn = db_manager.get_conn()
-            cursor = conn.cursor()
-            cursor.executemany(query, events_list)
-            conn.commit()
+            with db_manager.transaction() as cursor:
+                cursor.executemany(query, events_list)
             return True
         except sqlite3.Error as e: 
             logger.error(f"Error insertando eventos de asistencia en bloque: {e}")
             return False
     
     def get_events_for_today(self):
-        today_str = datetime.date.today().isoformat()
         query = """
         SELECT id_empleado, tipo, MAX(timestamp) as last_timestamp
         FROM eventos_asistencia
-        WHERE DATE(timestamp) = DATE(?)
+        WHERE timestamp >= ? AND timestamp < ?
         GROUP BY id_empleado, tipo
         ORDER BY last_timestamp;
         """
-        return db_manager.fetchall(query, (today_str,))
+        return db_manager.fetchall(query, day_bounds(datetime.date.today()))
 
 attendance_repo = AttendanceRepository()
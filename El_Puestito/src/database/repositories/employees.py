@@ -6,7 +6,7 @@ logger = setup_logger()
 
 class EmployeeRepository:
     def get_employees(self):
-        return db_manager.fetchall("SELECT * FROM empleados ORDER BY nombre;")
+        return db_manager.fetchall("SELECT * FROM empleados ORDER BY nombre;", cache=("empleados",))
 
     def get_employee_by_id(self, employee_id):
         return db_manager.fetchone("SELECT * FROM empleados WHERE id_empleado = ?;", (employee_id,))
@@ -11,7 +11,7 @@ class InventoryRepository:
         LEFT JOIN menu_items m ON i.id_menu_vinculado = m.id_item
         ORDER BY i.nombre;
         """
-        return db_manager.fetchall(query)
+        return db_manager.fetchall(query, cache=("inventario", "menu_items"))
 
     def agregar_item_inventario(self, nombre, cantidad, es_automatico=0, id_menu_vinculado=None):
         return db_manager.execute(
@@ -5,28 +5,23 @@ logger = setup_logger()
 
 class MenuRepository:
     def get_menu_with_categories(self):
-        categorias = db_manager.fetchall("SELECT * FROM menu_categorias ORDER BY nombre;")
-        items = db_manager.fetchall("SELECT * FROM menu_items;")
+        categorias = db_manager.fetchall("SELECT * FROM menu_categorias ORDER BY nombre;", row_mode='record', cache=("menu_categorias",))
         
         menu_completo = {"categorias": []}
         items_por_categoria = {}
-        for item in items:
-            item_copy = dict(item)
-            if 'precio' in item_copy:
-                item_copy['precio'] = item_copy['precio'] / 100.0
-            if 'precio_michelada' in item_copy:
-                item_copy['precio_michelada'] = item_copy['precio_michelada'] / 100.0
-                
-            cat_id = item_copy['id_categoria']
-            if cat_id not in items_por_categoria:
-                items_por_categoria[cat_id] = []
-            items_por_categoria[cat_id].append(item_copy)
+        for item in db_manager.fetchall("SELECT * FROM menu_items;", row_mode='record', cache=("menu_items",)):
+            item_dict = item._asdict()
+            if 'precio' in item_dict:
+                item_dict['precio'] = item_dict['precio'] / 100.0
+            if 'precio_michelada' in item_dict:
+                item_dict['precio_michelada'] = item_dict['precio_michelada'] / 100.0
+            items_por_categoria.setdefault(item.id_categoria, []).append(item_dict)
             
         for cat in categorias:
             menu_completo["categorias"].append({
-                "nombre": cat['nombre'],
-                "destino": cat.get('destino', 'cocina'), 
-                "items": items_por_categoria.get(cat['id_categoria'], [])
+                "nombre": cat.nombre,
+                "destino": getattr(cat, 'destino', 'cocina'), 
+                "items": items_por_categoria.get(cat.id_categoria, [])
             })
         return menu_completo
 
@@ -1,4 +1,9 @@
 from src.database.connection import db_manager
+from src.database.date_ranges import day_bounds
+from src.database.archive import history_union
+from src.database.menu_catalog import menu_catalog
+from src.database.active_orders import active_orders
+from src.database.repositories.accounts import account_repo, parse_mesa_key
 import sqlite3
 import datetime
 import uuid
@@ -6,277 +11,384 @@ from logger_setup import setup_logger
 
 logger = setup_logger()
 
+# Recalcula total_centavos/items_count desde orden_detalle; los renglones cancelados no cuentan.
+_TOTALES_SET = """(total_centavos, items_count) = (
+    SELECT COALESCE(SUM(d.cantidad * d.precio_unitario_congelado), 0), COALESCE(SUM(d.cantidad), 0)
+    FROM orden_detalle d WHERE d.id_orden = ordenes.id_orden AND d.estado_item != 'cancelado'
+)"""
+
+# Las ordenes archivadas antes de total_centavos no lo tienen: en el historial se suma el detalle.
+_IMPORTES_HISTORIAL = """
+    SELECT d.cantidad * d.precio_unitario_congelado AS importe
+    FROM {ordenes} o JOIN {orden_detalle} d ON o.id_orden = d.id_orden
+    WHERE o.estado = 'cerrada' AND o.fecha_cierre >= ? AND o.fecha_cierre < ?
+"""
+_IMPORTES_DIA_HISTORIAL = """
+    SELECT DATE(o.fecha_cierre) AS fecha, d.cantidad * d.precio_unitario_congelado AS importe
+    FROM {ordenes} o JOIN {orden_detalle} d ON o.id_orden = d.id_orden
+    WHERE o.estado = 'cerrada' AND o.fecha_cierre >= ? AND o.fecha_cierre < ?
+"""
+
 class OrderRepository:
     def check_duplicate_order_id(self, client_uuid):
         return db_manager.fetchone("SELECT id_orden FROM ordenes WHERE client_uuid = ?;", (client_uuid,)) is not None
 
     def create_new_order(self, orden_completa):
-        conn = db_manager.get_conn()
         try:
-            cursor = conn.cursor()
-            
-            target_account = orden_completa.get('target_account_key')
-            new_account = orden_completa.get('new_account_name')
-            
-            mesa_principal = str(orden_completa['numero_mesa'])
-            mesas_enlazadas = orden_completa.get('mesas_enlazadas', [])
-            
-            base_key = mesa_principal
-            if mesas_enlazadas:
-                todas = [mesa_principal] + [str(m) for m in mesas_enlazadas]
-                base_key = "+".join(sorted(todas))
-                
-            if target_account:
-                mesa_key = target_account
-            elif new_account:
-                mesa_key = f"{base_key}-{new_account}"
+            catalogo = menu_catalog.snapshot()
+            with active_orders.tracking() as touched, db_manager.transaction() as cursor:
+                id_orden = self._insert_order(cursor, orden_completa, catalogo)
+                touched.orders.add(id_orden)
+            logger.info(f"Orden {id_orden} creada exitosamente (Atomicidad garantizada).")
+            return id_orden
+        except sqlite3.IntegrityError as e:
+            logger.warning(f"Error de Integridad (posible UUID duplicado): {e}")
+            raise e
+        except Exception as e:
+            logger.error(f"Error logico creando orden. Rollback ejecutado. Causa: {e}")
+            raise e
+
+    def create_orders_batch(self, ordenes):
+        # Lote de ordenes encoladas: un snapshot del menu, una lectura de stock y un solo COMMIT.
+        # Cada orden va en su propio SAVEPOINT; la que falla se revierte sin afectar a las demas.
+        catalogo = menu_catalog.snapshot()
+        resultados = [None] * len(ordenes)
+        validas = []
+        for i, orden in enumerate(ordenes):
+            error = self._batch_order_error(orden)
+            if error:
+                resultados[i] = ("rejected", None, error)
             else:
-                mesa_key = base_key
+                validas.append(i)
+        with active_orders.tracking() as touched, db_manager.transaction() as cursor:
+            stock = self._load_stock(cursor, {item['item_id'] for i in validas for item in ordenes[i]['items']})
+            for i in validas:
+                try:
+                    with db_manager.transaction() as sp_cursor:
+                        id_orden = self._insert_order(sp_cursor, ordenes[i], catalogo, stock)
+                    touched.orders.add(id_orden)
+                    resultados[i] = ("ok", id_orden, None)
+                except ValueError as ve:
+                    resultados[i] = ("rejected", None, str(ve))
+                except sqlite3.IntegrityError as e:
+                    resultados[i] = ("duplicate", None, str(e))
+                except Exception as e:
+                    logger.warning(f"Orden {i} del lote rechazada: {e}")
+                    resultados[i] = ("rejected", None, f"Orden invalida: {e}")
+        creadas = sum(1 for r in resultados if r[0] == "ok")
+        logger.info(f"Lote de {len(ordenes)} ordenes procesado: {creadas} creadas.")
+        return resultados
 
-            timestamp = orden_completa.get('timestamp', datetime.datetime.now().isoformat())
-            client_uuid = orden_completa.get('order_id')
-            
+    def _batch_order_error(self, orden):
+        # Forma minima antes de tocar la base: una orden mal formada se rechaza sola, no tumba el lote.
+        if not isinstance(orden, dict):
+            return "La orden debe ser un objeto."
+        if orden.get('numero_mesa') is None:
+            return "Falta numero_mesa."
+        items = orden.get('items')
+        if not isinstance(items, list):
+            return "items debe ser una lista."
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(item.get('item_id'), str) or not isinstance(item.get('cantidad'), int):
+                return f"Item invalido: {item}"
+        return None
+
+    def _load_stock(self, cursor, item_ids):
+        item_ids = [i for i in item_ids if i is not None]
+        stock_por_item = {}
+        if item_ids:
+            placeholders = ','.join('?' * len(item_ids))
             cursor.execute(
-                "INSERT INTO ordenes (mesa_key, estado, fecha_apertura, client_uuid, proformas_impresas) VALUES (?, 'activa', ?, ?, 0);",
-                (mesa_key, timestamp, client_uuid)
+                f"SELECT id_menu_vinculado, cantidad, es_automatico FROM inventario WHERE id_menu_vinculado IN ({placeholders}) ORDER BY id_inventario",
+                item_ids
             )
-            id_orden = cursor.lastrowid
-            
-            items_data = orden_completa.get('items', [])
-            
-            detalle_batch = []
-            for item in items_data:
-                item_id = item.get('item_id')
-                cantidad = item.get('cantidad')
-                id_cerveza = item.get('id_cerveza')
-                
-                if not isinstance(cantidad, int) or cantidad <= 0:
-                    raise ValueError(f"Cantidad invalida para el item {item_id}.")
-
-                cursor.execute("""
-                    SELECT i.id_item, i.nombre, i.precio, i.precio_michelada, c.destino, i.disponible
-                    FROM menu_items i
-                    JOIN menu_categorias c ON i.id_categoria = c.id_categoria
-                    WHERE i.id_item = ?
-                """, (item_id,))
-                menu_item = cursor.fetchone()
-                
-                if not menu_item or not menu_item['disponible']:
-                    raise ValueError(f"El producto {item_id} no existe o no esta disponible.")
+            for row in cursor.fetchall():
+                if row['id_menu_vinculado'] not in stock_por_item:
+                    stock_por_item[row['id_menu_vinculado']] = {'cantidad': row['cantidad'], 'es_automatico': row['es_automatico']}
+        return stock_por_item
 
-                destino = menu_item['destino']
-                nombre = menu_item['nombre']
-                precio_unitario = menu_item['precio']
+    def _insert_order(self, cursor, orden_completa, catalogo=None, stock=None):
+        catalogo = catalogo or menu_catalog.snapshot()
+        target_account = orden_completa.get('target_account_key')
+        new_account = orden_completa.get('new_account_name')
+        
+        mesa_principal = str(orden_completa['numero_mesa'])
+        mesas_enlazadas = orden_completa.get('mesas_enlazadas', [])
+        timestamp = orden_completa.get('timestamp', datetime.datetime.now().isoformat())
 
-                if id_cerveza and menu_item['precio_michelada'] > 0:
-                    precio_unitario = menu_item['precio_michelada']
-                    
-                nombre_cerveza = item.get('nombre_cerveza')
+        if target_account:
+            cuenta = account_repo.find_open_account(cursor, target_account)
+            if cuenta is None:
+                mesas, nombre = parse_mesa_key(target_account)
+                cuenta = account_repo.open_account(cursor, mesas, nombre, timestamp=timestamp, mesa_key=target_account)
+        else:
+            cuenta = account_repo.open_account(cursor, [mesa_principal] + [str(m) for m in mesas_enlazadas], new_account, timestamp=timestamp)
+        mesa_key = cuenta['mesa_key']
 
-                cursor.execute("SELECT cantidad, es_automatico FROM inventario WHERE id_menu_vinculado = ?", (item_id,))
-                stock_info = cursor.fetchone()
-                
-                if stock_info and stock_info['es_automatico']:
-                    if stock_info['cantidad'] < cantidad:
-                        raise ValueError(f"Stock insuficiente para {nombre}. Solicitado: {cantidad}, Disponible: {stock_info['cantidad']}")
-                    
-                    cursor.execute(
-                        "UPDATE inventario SET cantidad = cantidad - ? WHERE id_menu_vinculado = ?",
-                        (cantidad, item_id)
-                    )
-
-                detalle_batch.append((
-                    id_orden, item_id, cantidad, precio_unitario, nombre,
-                    item.get('imagen'), item.get('notas', ''), destino, id_cerveza, nombre_cerveza
-                ))
+        client_uuid = orden_completa.get('order_id')
+        items_data = orden_completa.get('items', [])
+
+        # Precio de cada renglon y totales de la orden desde el catalogo; un renglon invalido
+        # queda en None y la validacion de abajo revierte la orden completa.
+        precios = []
+        total_centavos = items_count = 0
+        for item in items_data:
+            menu_item = catalogo.get(item.get('item_id'))
+            cantidad = item.get('cantidad')
+            if menu_item is None or not isinstance(cantidad, int):
+                precios.append(None)
+                continue
+            precio_unitario = menu_item.precio
+            if item.get('id_cerveza') and menu_item.precio_michelada > 0:
+                precio_unitario = menu_item.precio_michelada
+            precios.append(precio_unitario)
+            total_centavos += cantidad * precio_unitario
+            items_count += cantidad
+
+        cursor.execute(
+            "INSERT INTO ordenes (mesa_key, id_cuenta, estado, fecha_apertura, client_uuid, proformas_impresas, total_centavos, items_count) VALUES (?, ?, 'activa', ?, ?, 0, ?, ?);",
+            (mesa_key, cuenta['id_cuenta'], timestamp, client_uuid, total_centavos, items_count)
+        )
+        id_orden = cursor.lastrowid
+
+        cantidades_por_item = {}
+        for item in items_data:
+            item_id = item.get('item_id')
+            cantidad = item.get('cantidad')
+            if not isinstance(cantidad, int) or cantidad <= 0:
+                raise ValueError(f"Cantidad invalida para el item {item_id}.")
+            cantidades_por_item[item_id] = cantidades_por_item.get(item_id, 0) + cantidad
+
+        # Precios y destinos salen del catalogo en memoria; con el candado de escritura tomado
+        # solo se consulta el stock, en una sola consulta IN (...) para toda la orden.
+        item_ids = list(cantidades_por_item)
+        for item_id in item_ids:
+            menu_item = catalogo.get(item_id)
+            if not menu_item or not menu_item.disponible:
+                raise ValueError(f"El producto {item_id} no existe o no esta disponible.")
+
+        # En un lote el stock se leyo una vez al inicio y se va descontando en memoria.
+        stock_por_item = stock if stock is not None else self._load_stock(cursor, item_ids)
+
+        descuentos = []
+        for item_id, cantidad in cantidades_por_item.items():
+            stock_info = stock_por_item.get(item_id)
+            if stock_info and stock_info['es_automatico']:
+                if stock_info['cantidad'] < cantidad:
+                    raise ValueError(f"Stock insuficiente para {catalogo.get(item_id).nombre}. Solicitado: {cantidad}, Disponible: {stock_info['cantidad']}")
+                descuentos.append((cantidad, item_id, cantidad))
 
+        if descuentos:
             cursor.executemany(
-                """
-                INSERT INTO orden_detalle (
-                    id_orden, id_item_menu, cantidad, precio_unitario_congelado,
-                    nombre_congelado, imagen_congelada, notas, destino, id_cerveza, nombre_cerveza
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-                """,
-                detalle_batch
+                "UPDATE inventario SET cantidad = cantidad - ? WHERE id_menu_vinculado = ? AND cantidad >= ?",
+                descuentos
             )
+            if cursor.rowcount < len(descuentos):
+                raise ValueError("Stock insuficiente: el inventario cambio mientras se registraba la orden.")
 
-            conn.commit()
-            logger.info(f"Orden {id_orden} creada exitosamente (Atomicidad garantizada).")
-            return id_orden
-            
-        except sqlite3.IntegrityError as e:
-            conn.rollback()
-            logger.warning(f"Error de Integridad (posible UUID duplicado): {e}")
-            raise e
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"Error logico creando orden. Rollback ejecutado. Causa: {e}")
-            raise e
+        detalle_batch = []
+        for item, precio_unitario in zip(items_data, precios):
+            item_id = item.get('item_id')
+            menu_item = catalogo.get(item_id)
+            detalle_batch.append((
+                id_orden, item_id, item.get('cantidad'), precio_unitario, menu_item.nombre,
+                item.get('imagen'), item.get('notas', ''), menu_item.destino, item.get('id_cerveza'), item.get('nombre_cerveza')
+            ))
+
+        cursor.executemany(
+            """
+            INSERT INTO orden_detalle (
+                id_orden, id_item_menu, cantidad, precio_unitario_congelado,
+                nombre_congelado, imagen_congelada, notas, destino, id_cerveza, nombre_cerveza
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+            """,
+            detalle_batch
+        )
+
+        if stock is not None:
+            for cantidad, item_id, _ in descuentos:
+                stock[item_id]['cantidad'] -= cantidad
+        return id_orden
+
+    def _refresh_totals(self, cursor, order_ids):
+        order_ids = [i for i in set(order_ids) if i is not None]
+        if order_ids:
+            cursor.execute(f"UPDATE ordenes SET {_TOTALES_SET} WHERE id_orden IN ({','.join('?' * len(order_ids))});", order_ids)
+
+    def check_order_totals(self, repair=False):
+        # Verificador de consistencia: compara los totales guardados contra orden_detalle.
+        rows = db_manager.fetchall("""
+            SELECT o.id_orden, o.mesa_key, o.estado, o.total_centavos, o.items_count,
+                   COALESCE(SUM(d.cantidad * d.precio_unitario_congelado), 0) AS total_real,
+                   COALESCE(SUM(d.cantidad), 0) AS items_real
+            FROM ordenes o
+            LEFT JOIN orden_detalle d ON d.id_orden = o.id_orden AND d.estado_item != 'cancelado'
+            GROUP BY o.id_orden
+            HAVING o.total_centavos != total_real OR o.items_count != items_real;
+        """)
+        if rows:
+            logger.warning(f"Totales desincronizados en {len(rows)} ordenes: {[r['id_orden'] for r in rows[:20]]}")
+            if repair:
+                with active_orders.tracking() as touched, db_manager.transaction() as cursor:
+                    self._refresh_totals(cursor, [r['id_orden'] for r in rows])
+                    touched.orders.update(r['id_orden'] for r in rows)
+        return rows
 
     def get_active_orders_caja(self):
-        query = """
-        SELECT
-            o.id_orden, o.mesa_key, o.fecha_apertura,
-            d.id_detalle, d.cantidad, d.precio_unitario_congelado AS precio_unitario,
-            d.nombre_congelado AS nombre, d.imagen_congelada AS imagen,
-            d.notas, d.id_item_menu AS item_id, d.estado_item, d.nombre_cerveza
-        FROM ordenes o
-        LEFT JOIN orden_detalle d ON o.id_orden = d.id_orden
-        WHERE o.estado = 'activa'
-        ORDER BY o.fecha_apertura;
-        """
-        rows = db_manager.fetchall(query)
-        
-        caja_data = {}
-        for row in rows:
-            mesa_key = row['mesa_key']
-            if mesa_key not in caja_data:
-                caja_data[mesa_key] = {
-                    'id_orden_db': row['id_orden'],
-                    'fecha_apertura': row['fecha_apertura'],
-                    'items': []
-                }
-            if row['id_detalle'] is not None:
-                item_dict = {
-                    'id_detalle': row['id_detalle'], 'item_id': row['item_id'],
-                    'nombre': row['nombre'], 'cantidad': row['cantidad'],
-                    'precio_unitario': row['precio_unitario'] / 100.0, 'imagen': row['imagen'],
-                    'notas': row['notas'], 'estado_item': row['estado_item'],
-                    'nombre_cerveza': row['nombre_cerveza']
-                }
-                caja_data[mesa_key]['items'].append(item_dict)
-        return caja_data
+        return active_orders.snapshot()
 
     def registrar_impresion_proforma(self, mesa_key):
-        return db_manager.execute(
-            "UPDATE ordenes SET proformas_impresas = proformas_impresas + 1 WHERE mesa_key = ? AND estado = 'activa';",
-            (mesa_key,)
-        )
+        with active_orders.tracking() as touched:
+            touched.mesas.add(mesa_key)
+            return db_manager.execute(
+                "UPDATE ordenes SET proformas_impresas = proformas_impresas + 1 WHERE mesa_key = ? AND estado = 'activa';",
+                (mesa_key,)
+            )
     
     def split_order(self, original_mesa_key, items_to_split, target_account_key=None, new_account_name=None):
-        conn = db_manager.get_conn()
-        cursor = conn.cursor()
-        
         try:
-            orden_orig = db_manager.fetchone("SELECT id_orden, client_uuid FROM ordenes WHERE mesa_key = ? AND estado = 'activa'", (original_mesa_key,))
-            if not orden_orig: return False
-            
-            id_orden_origen = orden_orig['id_orden']
-            temp_key = original_mesa_key.split('+')[0] if '+' in original_mesa_key else original_mesa_key
-            base_mesa_key = temp_key.split('-')[0] if '-' in temp_key else temp_key
-            id_destino = None
-
-            if target_account_key:
-                dest_order = db_manager.fetchone("SELECT id_orden FROM ordenes WHERE mesa_key = ? AND estado = 'activa'", (target_account_key,))
-                if dest_order: id_destino = dest_order['id_orden']
-            
-            if not id_destino:
-                if new_account_name:
-                    new_mesa_key = f"{base_mesa_key}-{new_account_name}"
-                else:
-                    rows = db_manager.fetchall("SELECT mesa_key FROM ordenes WHERE mesa_key LIKE ? AND estado = 'activa'", (f"{base_mesa_key}-%",))
-                    existing_indexes = []
-                    for r in rows:
-                        try:
-                            parts = r['mesa_key'].split('-')
-                            if len(parts) > 1 and parts[-1].isdigit():
-                                existing_indexes.append(int(parts[-1]))
-                        except ValueError: continue
-                    next_index = max(existing_indexes) + 1 if existing_indexes else 1
-                    new_mesa_key = f"{base_mesa_key}-{next_index}"
-                    if new_mesa_key == original_mesa_key:
-                        next_index += 1
-                        new_mesa_key = f"{base_mesa_key}-{next_index}"
+            with active_orders.tracking() as touched, db_manager.transaction() as cursor:
+                orden_orig = cursor.execute("SELECT id_orden, client_uuid FROM ordenes WHERE mesa_key = ? AND estado = 'activa'", (original_mesa_key,)).fetchone()
+                if not orden_orig: return False
                 
-                new_uuid = f"{orden_orig['client_uuid']}_split_{datetime.datetime.now().timestamp()}"
-                cursor.execute(
-                    "INSERT INTO ordenes (mesa_key, estado, fecha_apertura, client_uuid, proformas_impresas) VALUES (?, 'activa', ?, ?, 0)",
-                    (new_mesa_key, datetime.datetime.now().isoformat(), new_uuid)
-                )
-                id_destino = cursor.lastrowid
-            
-            for item in items_to_split:
-                id_detalle = item.get('id') or item.get('id_detalle')
-                qty_split = int(item['cantidad'])
-                if qty_split <= 0: raise ValueError("Cantidad a separar debe ser mayor a 0")
-                row = db_manager.fetchone("SELECT * FROM orden_detalle WHERE id_detalle = ? AND id_orden = ?", (id_detalle, id_orden_origen))
-                if not row or row['cantidad'] < qty_split: 
-                    raise ValueError(f"Item invalido o cantidad solicitada excede el actual para id_detalle {id_detalle}.")
+                id_orden_origen = orden_orig['id_orden']
+                touched.orders.add(id_orden_origen)
+                origen = account_repo.account_for_order(cursor, id_orden_origen)
+                # Las subcuentas siempre cuelgan de la cuenta principal, aunque se divida una subcuenta.
+                id_padre = origen['id_padre'] if origen['id_padre'] is not None else origen['id_cuenta']
+                id_destino = None
+
+                if target_account_key:
+                    dest_order = cursor.execute("SELECT id_orden FROM ordenes WHERE mesa_key = ? AND estado = 'activa'", (target_account_key,)).fetchone()
+                    if dest_order: id_destino = dest_order['id_orden']
                 
-                if row['cantidad'] == qty_split:
-                    cursor.execute("UPDATE orden_detalle SET id_orden = ? WHERE id_detalle = ?", (id_destino, id_detalle))
-                else:
-                    cursor.execute("UPDATE orden_detalle SET cantidad = cantidad - ? WHERE id_detalle = ?", (qty_split, id_detalle))
-                    cursor.execute("""
-                        INSERT INTO orden_detalle (id_orden, id_item_menu, cantidad, precio_unitario_congelado, nombre_congelado, imagen_congelada, notas, destino, estado_item, id_cerveza, nombre_cerveza)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (id_destino, row['id_item_menu'], qty_split, row['precio_unitario_congelado'], row['nombre_congelado'], row['imagen_congelada'], row.get('notas', ''), row['destino'], row['estado_item'], row.get('id_cerveza'), row.get('nombre_cerveza')))
-            
-            if '-' in original_mesa_key:
-                cursor.execute("SELECT COUNT(*) FROM orden_detalle WHERE id_orden = ?", (id_orden_origen,))
-                remaining = cursor.fetchone()[0]
-                if remaining == 0:
-                    cursor.execute("UPDATE ordenes SET estado = 'cancelada', fecha_cierre = ? WHERE id_orden = ?", 
-                                (datetime.datetime.now().isoformat(), id_orden_origen))
+                if not id_destino:
+                    nombre = new_account_name
+                    if not nombre:
+                        indices = [int(c['nombre']) for c in account_repo.open_subaccounts(cursor, id_padre) if str(c['nombre']).isdigit()]
+                        nombre = str(max(indices) + 1 if indices else 1)
+                    timestamp = datetime.datetime.now().isoformat()
+                    destino = account_repo.open_account(cursor, account_repo.account_tables(cursor, id_padre), nombre, id_padre=id_padre, timestamp=timestamp)
+                    if destino['id_cuenta'] == origen['id_cuenta']:
+                        raise ValueError("La cuenta destino es la misma que la de origen.")
+                    dest_order = cursor.execute("SELECT id_orden FROM ordenes WHERE id_cuenta = ? AND estado = 'activa'", (destino['id_cuenta'],)).fetchone()
+                    if dest_order:
+                        id_destino = dest_order['id_orden']
+                    else:
+                        new_uuid = f"{orden_orig['client_uuid']}_split_{datetime.datetime.now().timestamp()}"
+                        cursor.execute(
+                            "INSERT INTO ordenes (mesa_key, id_cuenta, estado, fecha_apertura, client_uuid, proformas_impresas) VALUES (?, ?, 'activa', ?, ?, 0)",
+                            (destino['mesa_key'], destino['id_cuenta'], timestamp, new_uuid)
+                        )
+                        id_destino = cursor.lastrowid
+                touched.orders.add(id_destino)
+                
+                self._move_lines(cursor, id_orden_origen, id_destino, items_to_split)
+                self._refresh_totals(cursor, (id_orden_origen, id_destino))
+                if origen['id_padre'] is not None:
+                    remaining = cursor.execute("SELECT COUNT(*) FROM orden_detalle WHERE id_orden = ?", (id_orden_origen,)).fetchone()[0]
+                    if remaining == 0:
+                        timestamp = datetime.datetime.now().isoformat()
+                        cursor.execute("UPDATE ordenes SET estado = 'cancelada', fecha_cierre = ? WHERE id_orden = ?", (timestamp, id_orden_origen))
+                        account_repo.close_accounts_if_done(cursor, (origen['id_cuenta'],), 'cancelada', timestamp)
 
-            conn.commit()
-            self._cleanup_empty_order(original_mesa_key, id_orden_origen)
+                self._cleanup_empty_order(id_orden_origen)
             return True
         except Exception as e:
-            conn.rollback()
             logger.error(f"Error en split_order: {e}")
             return False
         
     def remove_items_from_order(self, mesa_key, items_to_remove):
-        conn = db_manager.get_conn()
-        cursor = conn.cursor()
         try:
-            orden = db_manager.fetchone("SELECT id_orden FROM ordenes WHERE mesa_key = ? AND estado = 'activa'", (mesa_key,))
-            if not orden: return False
-            id_orden = orden['id_orden']
-            
-            for item in items_to_remove:
-                id_detalle = item['id_detalle']
-                qty_to_remove = int(item['cantidad'])
-                if qty_to_remove <= 0: raise ValueError("La cantidad a eliminar debe ser mayor a 0")
-                row = db_manager.fetchone("SELECT * FROM orden_detalle WHERE id_detalle = ? AND id_orden = ? AND estado_item = 'pendiente'", (id_detalle, id_orden))
-                if not row: 
-                    raise ValueError(f"Item invalido o ya procesado (id_detalle: {id_detalle}).")
-                if row['cantidad'] < qty_to_remove:
-                    raise ValueError(f"Cantidad a eliminar mayor a la existente para item {id_detalle}.")
-
-                if row['cantidad'] == qty_to_remove:
-                    cursor.execute("DELETE FROM orden_detalle WHERE id_detalle = ?", (id_detalle,))
-                else:
-                    cursor.execute("UPDATE orden_detalle SET cantidad = cantidad - ? WHERE id_detalle = ?", (qty_to_remove, id_detalle))
-
-                cursor.execute(
-                    "UPDATE inventario SET cantidad = cantidad + ? WHERE id_menu_vinculado = ? AND es_automatico = 1;",
-                    (qty_to_remove, row['id_item_menu'])
-                )
-            conn.commit()
-            self._cleanup_empty_order(mesa_key, id_orden)
+            with active_orders.tracking() as touched, db_manager.transaction() as cursor:
+                orden = cursor.execute("SELECT id_orden FROM ordenes WHERE mesa_key = ? AND estado = 'activa'", (mesa_key,)).fetchone()
+                if not orden: return False
+                id_orden = orden['id_orden']
+                touched.orders.add(id_orden)
+                
+                self._remove_lines(cursor, id_orden, items_to_remove)
+                self._refresh_totals(cursor, (id_orden,))
+                self._cleanup_empty_order(id_orden)
             return True
         except sqlite3.Error as e:
-            conn.rollback()
             logger.error(f"Error removiendo items: {e}")
             return False
         
-    def _cleanup_empty_order(self, mesa_key, id_orden):
+    def _requested_lines(self, cursor, id_orden, items, solo_pendientes=False):
+        # Valida todo el pedido con una sola consulta. Devuelve [(id_detalle, id_item_menu, cantidad_actual, cantidad_pedida)].
+        pedidas = {}
+        for item in items:
+            try:
+                id_detalle = int(item.get('id_detalle') or item.get('id'))
+                cantidad = int(item['cantidad'])
+            except (TypeError, ValueError, KeyError):
+                raise ValueError(f"Renglon invalido: {item}")
+            if cantidad <= 0: raise ValueError("La cantidad debe ser mayor a 0")
+            pedidas[id_detalle] = pedidas.get(id_detalle, 0) + cantidad
+        if not pedidas:
+            return []
+        filtro = " AND estado_item = 'pendiente'" if solo_pendientes else ""
+        actuales = {row[0]: row for row in cursor.execute(
+            f"SELECT id_detalle, id_item_menu, cantidad FROM orden_detalle WHERE id_orden = ? AND id_detalle IN ({','.join('?' * len(pedidas))}){filtro};",
+            (id_orden, *pedidas)
+        ).fetchall()}
+        lineas = []
+        for id_detalle, cantidad in pedidas.items():
+            row = actuales.get(id_detalle)
+            if row is None:
+                raise ValueError(f"Item invalido o ya procesado (id_detalle: {id_detalle}).")
+            if row[2] < cantidad:
+                raise ValueError(f"Cantidad solicitada mayor a la existente para id_detalle {id_detalle}.")
+            lineas.append((id_detalle, row[1], row[2], cantidad))
+        return lineas
+
+    def _move_lines(self, cursor, id_origen, id_destino, items):
+        # Renglon completo: cambia de orden. Parcial: se descuenta y se copia al destino con la cantidad separada.
+        lineas = self._requested_lines(cursor, id_origen, items)
+        completas = [id_detalle for id_detalle, _, actual, pedida in lineas if actual == pedida]
+        parciales = [(id_detalle, pedida) for id_detalle, _, actual, pedida in lineas if actual > pedida]
+        if completas:
+            cursor.execute(f"UPDATE orden_detalle SET id_orden = ? WHERE id_detalle IN ({','.join('?' * len(completas))});", (id_destino, *completas))
+        if parciales:
+            cursor.executemany("""
+                INSERT INTO orden_detalle (id_orden, id_item_menu, cantidad, precio_unitario_congelado, nombre_congelado, imagen_congelada, notas, destino, estado_item, id_cerveza, nombre_cerveza)
+                SELECT ?, id_item_menu, ?, precio_unitario_congelado, nombre_congelado, imagen_congelada, notas, destino, estado_item, id_cerveza, nombre_cerveza
+                FROM orden_detalle WHERE id_detalle = ?
+            """, [(id_destino, pedida, id_detalle) for id_detalle, pedida in parciales])
+            cursor.executemany("UPDATE orden_detalle SET cantidad = cantidad - ? WHERE id_detalle = ?;", [(pedida, id_detalle) for id_detalle, pedida in parciales])
+
+    def _remove_lines(self, cursor, id_orden, items):
+        lineas = self._requested_lines(cursor, id_orden, items, solo_pendientes=True)
+        completas = [id_detalle for id_detalle, _, actual, pedida in lineas if actual == pedida]
+        parciales = [(pedida, id_detalle) for id_detalle, _, actual, pedida in lineas if actual > pedida]
+        if completas:
+            cursor.execute(f"DELETE FROM orden_detalle WHERE id_detalle IN ({','.join('?' * len(completas))});", completas)
+        if parciales:
+            cursor.executemany("UPDATE orden_detalle SET cantidad = cantidad - ? WHERE id_detalle = ?;", parciales)
+        devoluciones = {}
+        for _, id_item_menu, _, pedida in lineas:
+            devoluciones[id_item_menu] = devoluciones.get(id_item_menu, 0) + pedida
+        cursor.executemany(
+            "UPDATE inventario SET cantidad = cantidad + ? WHERE id_menu_vinculado = ? AND es_automatico = 1;",
+            [(cantidad, id_item_menu) for id_item_menu, cantidad in devoluciones.items()]
+        )
+
+    def _cleanup_empty_order(self, id_orden):
         try:
-            conn = db_manager.get_conn()
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM orden_detalle WHERE id_orden = ?", (id_orden,))
-            remaining = cursor.fetchone()[0]
-            if remaining == 0:
-                if '+' in mesa_key:
-                    return False
-                cursor.execute("UPDATE ordenes SET estado = 'cancelada', fecha_cierre = ? WHERE id_orden = ?", 
-                    (datetime.datetime.now().isoformat(), id_orden))
-                conn.commit()
-                return True
+            with db_manager.transaction() as cursor:
+                remaining = cursor.execute("SELECT COUNT(*) FROM orden_detalle WHERE id_orden = ?", (id_orden,)).fetchone()[0]
+                if remaining == 0:
+                    cuenta = account_repo.account_for_order(cursor, id_orden)
+                    # La cuenta principal de un grupo se conserva vacia mientras tenga subcuentas.
+                    if cuenta and cuenta['id_padre'] is None and len(account_repo.account_tables(cursor, cuenta['id_cuenta'])) > 1:
+                        return False
+                    timestamp = datetime.datetime.now().isoformat()
+                    cursor.execute("UPDATE ordenes SET estado = 'cancelada', fecha_cierre = ? WHERE id_orden = ?", (timestamp, id_orden))
+                    if cuenta:
+                        account_repo.close_accounts_if_done(cursor, (cuenta['id_cuenta'],), 'cancelada', timestamp)
+                    return True
         except Exception as e:
-            pass
+            logger.warning(f"No se pudo limpiar la orden vacia {id_orden}: {e}")
         return False    
     
     def _get_active_orders_by_destino(self, destino_busqueda):
@@ -288,16 +400,15 @@ class OrderRepository:
         WHERE o.estado = 'activa' AND d.destino = ? AND d.estado_item = 'pendiente'
         ORDER BY o.fecha_apertura;
         """
-        rows = db_manager.fetchall(query, (destino_busqueda,))
         ordenes_dict = {}
-        for item in rows:
-            mesa_key = item['mesa_key']
-            if mesa_key not in ordenes_dict:
-                ordenes_dict[mesa_key] = {'numero_mesa': mesa_key, 'timestamp': item['fecha_apertura'], 'items': []}
-            ordenes_dict[mesa_key]['items'].append({
-                'id_detalle': item['id_detalle'], 'nombre': item['nombre'],
-                'cantidad': item['cantidad'], 'notas': item['notas'],
-                'imagen': item['imagen'], 'nombre_cerveza': item['nombre_cerveza']
+        for item in db_manager.iterate(query, (destino_busqueda,), row_mode='record'):
+            orden = ordenes_dict.get(item.mesa_key)
+            if orden is None:
+                orden = ordenes_dict[item.mesa_key] = {'numero_mesa': item.mesa_key, 'timestamp': item.fecha_apertura, 'items': []}
+            orden['items'].append({
+                'id_detalle': item.id_detalle, 'nombre': item.nombre,
+                'cantidad': item.cantidad, 'notas': item.notas,
+                'imagen': item.imagen, 'nombre_cerveza': item.nombre_cerveza
             })
         return list(ordenes_dict.values())
 
@@ -305,24 +416,57 @@ class OrderRepository:
     def get_active_barra_orders(self): return self._get_active_orders_by_destino('barra')
 
     def mark_individual_item_ready(self, id_detalle):
-        conn = db_manager.get_conn()
-        cursor = conn.cursor()
         try:
-            row = db_manager.fetchone("SELECT * FROM orden_detalle WHERE id_detalle = ? AND estado_item = 'pendiente'", (id_detalle,))
-            if not row: return False
-            if row['cantidad'] == 1:
-                cursor.execute("UPDATE orden_detalle SET estado_item = 'listo' WHERE id_detalle = ?", (id_detalle,))
+            return self.mark_items_ready([{'id_detalle': id_detalle, 'cantidad': 1}])[0] > 0
+        except (sqlite3.Error, ValueError):
+            return False
+
+    def mark_items_ready(self, lineas, destino=None):
+        # Varias unidades o renglones en una transaccion. cantidad ausente = renglon completo; si pide
+        # mas de lo pendiente (otra pantalla ya marco parte) se marca lo que queda. Devuelve (unidades, mesas).
+        pedidas = {}
+        for linea in lineas:
+            try:
+                id_detalle = int(linea['id_detalle'])
+                cantidad = None if linea.get('cantidad') is None else int(linea['cantidad'])
+            except (TypeError, ValueError, KeyError):
+                raise ValueError(f"Renglon invalido: {linea}")
+            if cantidad is not None and cantidad <= 0: raise ValueError("La cantidad debe ser mayor a 0")
+            if cantidad is None or pedidas.get(id_detalle, 0) is None:
+                pedidas[id_detalle] = None
             else:
-                cursor.execute("UPDATE orden_detalle SET cantidad = cantidad - 1 WHERE id_detalle = ?", (id_detalle,))
-                cursor.execute("""
+                pedidas[id_detalle] = pedidas.get(id_detalle, 0) + cantidad
+        if not pedidas:
+            return 0, []
+
+        filtro = " AND d.destino = ?" if destino else ""
+        with active_orders.tracking() as touched, db_manager.transaction() as cursor:
+            actuales = cursor.execute(f"""
+                SELECT d.id_detalle, d.id_orden, d.cantidad, o.mesa_key
+                FROM orden_detalle d JOIN ordenes o ON o.id_orden = d.id_orden
+                WHERE d.id_detalle IN ({','.join('?' * len(pedidas))}) AND d.estado_item = 'pendiente' AND o.estado = 'activa'{filtro};
+            """, (*pedidas, *([destino] if destino else []))).fetchall()
+            completas, parciales, mesas, unidades = [], [], [], 0
+            for id_detalle, id_orden, actual, mesa_key in actuales:
+                pedida = min(actual, pedidas[id_detalle] or actual)
+                if pedida == actual:
+                    completas.append(id_detalle)
+                else:
+                    parciales.append((pedida, id_detalle))
+                unidades += pedida
+                touched.orders.add(id_orden)
+                if mesa_key not in mesas:
+                    mesas.append(mesa_key)
+            if completas:
+                cursor.execute(f"UPDATE orden_detalle SET estado_item = 'listo' WHERE id_detalle IN ({','.join('?' * len(completas))});", completas)
+            if parciales:
+                cursor.executemany("""
                     INSERT INTO orden_detalle (id_orden, id_item_menu, cantidad, precio_unitario_congelado, nombre_congelado, imagen_congelada, notas, destino, estado_item, id_cerveza, nombre_cerveza)
-                    VALUES (?, ?, 1, ?, ?, ?, ?, ?, 'listo', ?, ?)
-                """, (row['id_orden'], row['id_item_menu'], row['precio_unitario_congelado'], row['nombre_congelado'], row['imagen_congelada'], row.get('notas', ''), row['destino'], row.get('id_cerveza'), row.get('nombre_cerveza')))
-            conn.commit()
-            return True
-        except sqlite3.Error:
-            conn.rollback()
-            return False
+                    SELECT id_orden, id_item_menu, ?, precio_unitario_congelado, nombre_congelado, imagen_congelada, notas, destino, 'listo', id_cerveza, nombre_cerveza
+                    FROM orden_detalle WHERE id_detalle = ?
+                """, parciales)
+                cursor.executemany("UPDATE orden_detalle SET cantidad = cantidad - ? WHERE id_detalle = ?;", parciales)
+        return unidades, mesas
 
     def _mark_order_items_ready(self, mesa_key, destino_busqueda):
         query = """
@@ -330,73 +474,87 @@ class OrderRepository:
         WHERE destino = ? AND estado_item = 'pendiente'
         AND id_orden IN (SELECT id_orden FROM ordenes WHERE mesa_key = ? AND estado = 'activa');
         """
-        return db_manager.execute(query, (destino_busqueda, mesa_key))
+        with active_orders.tracking() as touched:
+            touched.mesas.add(mesa_key)
+            return db_manager.execute(query, (destino_busqueda, mesa_key))
 
     def mark_cocina_order_ready(self, mesa_key): return self._mark_order_items_ready(mesa_key, 'cocina')
     def mark_barra_order_ready(self, mesa_key): return self._mark_order_items_ready(mesa_key, 'barra')
     
     def cancel_order_by_key(self, mesa_key):
-        conn = db_manager.get_conn()
-        cursor = conn.cursor()
         try:
-            orden = db_manager.fetchone("SELECT id_orden FROM ordenes WHERE mesa_key = ? AND estado = 'activa'", (mesa_key,))
-            if not orden: return False
-            id_orden = orden['id_orden']
-            timestamp = datetime.datetime.now().isoformat()
-            cursor.execute("UPDATE orden_detalle SET estado_item = 'cancelado' WHERE id_orden = ?", (id_orden,))
-            cursor.execute("UPDATE ordenes SET estado = 'cancelada', fecha_cierre = ? WHERE id_orden = ?", (timestamp, id_orden))
-            cursor.execute("SELECT id_item_menu, cantidad FROM orden_detalle WHERE id_orden = ?", (id_orden,))
-            for item in cursor.fetchall():
-                cursor.execute("UPDATE inventario SET cantidad = cantidad + ? WHERE id_menu_vinculado = ? AND es_automatico = 1;", (item['cantidad'], item['id_item_menu']))
-            conn.commit()
+            with active_orders.tracking() as touched, db_manager.transaction() as cursor:
+                orden = cursor.execute("SELECT id_orden, id_cuenta FROM ordenes WHERE mesa_key = ? AND estado = 'activa'", (mesa_key,)).fetchone()
+                if not orden: return False
+                id_orden = orden['id_orden']
+                touched.orders.add(id_orden)
+                timestamp = datetime.datetime.now().isoformat()
+                cursor.execute("UPDATE orden_detalle SET estado_item = 'cancelado' WHERE id_orden = ?", (id_orden,))
+                cursor.execute("UPDATE ordenes SET estado = 'cancelada', fecha_cierre = ?, total_centavos = 0, items_count = 0 WHERE id_orden = ?", (timestamp, id_orden))
+                account_repo.close_accounts_if_done(cursor, (orden['id_cuenta'],), 'cancelada', timestamp)
+                cursor.execute("SELECT id_item_menu, cantidad FROM orden_detalle WHERE id_orden = ?", (id_orden,))
+                for item in cursor.fetchall():
+                    cursor.execute("UPDATE inventario SET cantidad = cantidad + ? WHERE id_menu_vinculado = ? AND es_automatico = 1;", (item['cantidad'], item['id_item_menu']))
             return True
         except sqlite3.Error as e:
-            conn.rollback()
             return False
 
     def complete_order(self, mesa_key):
         orden_a_cerrar = self.get_active_orders_caja().get(mesa_key)
         if not orden_a_cerrar: return None
         timestamp = datetime.datetime.now().isoformat()
-        db_manager.execute("UPDATE ordenes SET estado = 'cerrada', fecha_cierre = ? WHERE mesa_key = ? AND estado = 'activa';", (timestamp, mesa_key))
-        if '-' in mesa_key:
-            try:
-                base_key = mesa_key.rsplit('-', 1)[0]
-                otros_splits = db_manager.fetchone("SELECT COUNT(*) as count FROM ordenes WHERE mesa_key LIKE ? AND estado = 'activa'", (f"{base_key}-%",))
-                if otros_splits and otros_splits['count'] == 0:
-                    orden_madre = db_manager.fetchone("SELECT id_orden, mesa_key FROM ordenes WHERE (mesa_key = ? OR mesa_key LIKE ?) AND estado = 'activa'", (base_key, f"{base_key}+%"))
-                    if orden_madre:
-                        items_madre = db_manager.fetchone("SELECT COUNT(*) as count FROM orden_detalle WHERE id_orden = ?", (orden_madre['id_orden'],))
-                        if items_madre and items_madre['count'] == 0:
-                            db_manager.execute("UPDATE ordenes SET estado = 'cerrada', fecha_cierre = ? WHERE id_orden = ?", (timestamp, orden_madre['id_orden']))
-            except Exception: pass
+        with active_orders.tracking() as touched, db_manager.transaction() as cursor:
+            touched.mesas.add(mesa_key)
+            orden = cursor.execute("SELECT id_orden FROM ordenes WHERE mesa_key = ? AND estado = 'activa'", (mesa_key,)).fetchone()
+            cuenta = account_repo.account_for_order(cursor, orden['id_orden']) if orden else None
+            # El total se recalcula en el mismo UPDATE que cierra: lo cobrado queda congelado en la fila.
+            cursor.execute(f"UPDATE ordenes SET estado = 'cerrada', fecha_cierre = ?, {_TOTALES_SET} WHERE mesa_key = ? AND estado = 'activa';", (timestamp, mesa_key))
+            if cuenta:
+                account_repo.close_accounts_if_done(cursor, (cuenta['id_cuenta'],), 'cerrada', timestamp)
+            if cuenta and cuenta['id_padre'] is not None:
+                try:
+                    # SAVEPOINT: si falla el cierre de la orden madre, la cuenta cobrada sigue cerrada.
+                    with db_manager.transaction():
+                        id_padre = cuenta['id_padre']
+                        if not account_repo.open_subaccounts(cursor, id_padre):
+                            orden_madre = cursor.execute("SELECT id_orden, items_count FROM ordenes WHERE id_cuenta = ? AND estado = 'activa'", (id_padre,)).fetchone()
+                            if orden_madre and orden_madre['items_count'] == 0:
+                                touched.orders.add(orden_madre['id_orden'])
+                                cursor.execute("UPDATE ordenes SET estado = 'cerrada', fecha_cierre = ? WHERE id_orden = ?", (timestamp, orden_madre['id_orden']))
+                                account_repo.close_accounts_if_done(cursor, (id_padre,), 'cerrada', timestamp)
+                except Exception: pass
         return orden_a_cerrar
 
     def update_item_note(self, id_detalle, nota):
         try:
-            db_manager.execute("UPDATE orden_detalle SET notas = ? WHERE id_detalle = ?", (nota, id_detalle))
+            with active_orders.tracking() as touched:
+                db_manager.execute("UPDATE orden_detalle SET notas = ? WHERE id_detalle = ?", (nota, id_detalle))
+                touched.mesas.add(active_orders.mesa_for_detalle(id_detalle))
             return True
         except Exception: return False
 
     def get_sales_report(self, date_str):
-        total_result = db_manager.fetchone("""
-            SELECT SUM(d.cantidad * d.precio_unitario_congelado) AS total
-            FROM ordenes o JOIN orden_detalle d ON o.id_orden = d.id_orden
-            WHERE o.estado = 'cerrada' AND DATE(o.fecha_cierre) = DATE(?);
-        """, (date_str,))
+        desde, hasta = day_bounds(date_str)
+        importes, params = history_union("""
+            SELECT o.total_centavos AS importe FROM {ordenes} o
+            WHERE o.estado = 'cerrada' AND o.fecha_cierre >= ? AND o.fecha_cierre < ?
+        """, (desde, hasta), cold_sql=_IMPORTES_HISTORIAL)
+        total_result = db_manager.fetchone(f"SELECT SUM(importe) AS total FROM ({importes});", params, lane="analytics")
         total_ventas = (total_result['total'] / 100.0) if total_result and total_result['total'] else 0.0
 
-        items_vendidos = db_manager.fetchall("""
-            SELECT id_item, nombre, SUM(cant) AS cantidad_total FROM (
-                SELECT d.id_item_menu AS id_item, d.nombre_congelado AS nombre, d.cantidad AS cant
-                FROM ordenes o JOIN orden_detalle d ON o.id_orden = d.id_orden
-                WHERE o.estado = 'cerrada' AND DATE(o.fecha_cierre) = DATE(?)
-                UNION ALL
-                SELECT d.id_cerveza AS id_item, d.nombre_cerveza AS nombre, d.cantidad AS cant
-                FROM ordenes o JOIN orden_detalle d ON o.id_orden = d.id_orden
-                WHERE o.estado = 'cerrada' AND DATE(o.fecha_cierre) = DATE(?) AND d.id_cerveza IS NOT NULL
-            ) t GROUP BY id_item, nombre ORDER BY cantidad_total DESC;
-        """, (date_str, date_str))
+        lineas, params = history_union("""
+            SELECT d.id_item_menu AS id_item, d.nombre_congelado AS nombre, d.cantidad AS cant
+            FROM {ordenes} o JOIN {orden_detalle} d ON o.id_orden = d.id_orden
+            WHERE o.estado = 'cerrada' AND o.fecha_cierre >= ? AND o.fecha_cierre < ?
+            UNION ALL
+            SELECT d.id_cerveza AS id_item, d.nombre_cerveza AS nombre, d.cantidad AS cant
+            FROM {ordenes} o JOIN {orden_detalle} d ON o.id_orden = d.id_orden
+            WHERE o.estado = 'cerrada' AND o.fecha_cierre >= ? AND o.fecha_cierre < ? AND d.id_cerveza IS NOT NULL
+        """, (desde, hasta, desde, hasta))
+        items_vendidos = db_manager.fetchall(f"""
+            SELECT id_item, nombre, SUM(cant) AS cantidad_total FROM ({lineas}) t
+            GROUP BY id_item, nombre ORDER BY cantidad_total DESC;
+        """, params, lane="analytics")
         return total_ventas, items_vendidos
     
     def get_sales_history_range(self, start_date=None, end_date=None, days=30):
@@ -407,12 +565,14 @@ class OrderRepository:
             if not start_date: start_date_obj = end_date_obj - datetime.timedelta(days=days)
             else: start_date_obj = datetime.datetime.strptime(str(start_date).strip(), '%Y-%m-%d').date()
             
-            rows = db_manager.fetchall("""
-                SELECT DATE(o.fecha_cierre) as fecha, SUM(d.cantidad * d.precio_unitario_congelado) as total_dia
-                FROM ordenes o JOIN orden_detalle d ON o.id_orden = d.id_orden
-                WHERE o.estado = 'cerrada' AND DATE(o.fecha_cierre) BETWEEN DATE(?) AND DATE(?)
-                GROUP BY DATE(o.fecha_cierre) ORDER BY fecha ASC;
-            """, (start_date_obj.isoformat(), end_date_obj.isoformat()))
+            importes, params = history_union("""
+                SELECT DATE(o.fecha_cierre) AS fecha, o.total_centavos AS importe FROM {ordenes} o
+                WHERE o.estado = 'cerrada' AND o.fecha_cierre >= ? AND o.fecha_cierre < ?
+            """, day_bounds(start_date_obj, end_date_obj), cold_sql=_IMPORTES_DIA_HISTORIAL)
+            rows = db_manager.fetchall(f"""
+                SELECT fecha, SUM(importe) as total_dia FROM ({importes}) t
+                GROUP BY fecha ORDER BY fecha ASC;
+            """, params, lane="analytics")
             return {"fechas": [row['fecha'] for row in rows], "totales": [row['total_dia'] / 100.0 for row in rows]}
         except Exception:
             return {"fechas": [], "totales": []}
@@ -424,15 +584,18 @@ class OrderRepository:
         if not start_date: start_date_obj = end_date_obj 
         else: start_date_obj = datetime.datetime.strptime(str(start_date).strip(), '%Y-%m-%d').date()
 
-        rows = db_manager.fetchall("""
-            SELECT nombre, SUM(cant) AS cantidad_total FROM (
-                SELECT d.nombre_congelado AS nombre, d.cantidad AS cant FROM ordenes o JOIN orden_detalle d ON o.id_orden = d.id_orden
-                WHERE o.estado = 'cerrada' AND DATE(o.fecha_cierre) BETWEEN DATE(?) AND DATE(?)
-                UNION ALL
-                SELECT d.nombre_cerveza AS nombre, d.cantidad AS cant FROM ordenes o JOIN orden_detalle d ON o.id_orden = d.id_orden
-                WHERE o.estado = 'cerrada' AND DATE(o.fecha_cierre) BETWEEN DATE(?) AND DATE(?) AND d.id_cerveza IS NOT NULL
-            ) t GROUP BY nombre ORDER BY cantidad_total DESC LIMIT 5;
-        """, (start_date_obj.isoformat(), end_date_obj.isoformat(), start_date_obj.isoformat(), end_date_obj.isoformat()))
+        desde, hasta = day_bounds(start_date_obj, end_date_obj)
+        lineas, params = history_union("""
+            SELECT d.nombre_congelado AS nombre, d.cantidad AS cant FROM {ordenes} o JOIN {orden_detalle} d ON o.id_orden = d.id_orden
+            WHERE o.estado = 'cerrada' AND o.fecha_cierre >= ? AND o.fecha_cierre < ?
+            UNION ALL
+            SELECT d.nombre_cerveza AS nombre, d.cantidad AS cant FROM {ordenes} o JOIN {orden_detalle} d ON o.id_orden = d.id_orden
+            WHERE o.estado = 'cerrada' AND o.fecha_cierre >= ? AND o.fecha_cierre < ? AND d.id_cerveza IS NOT NULL
+        """, (desde, hasta, desde, hasta))
+        rows = db_manager.fetchall(f"""
+            SELECT nombre, SUM(cant) AS cantidad_total FROM ({lineas}) t
+            GROUP BY nombre ORDER BY cantidad_total DESC LIMIT 5;
+        """, params, lane="analytics")
         return [dict(row) for row in rows]
 
 order_repo = OrderRepository()
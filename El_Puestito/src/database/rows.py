@@ -0,0 +1,29 @@
+import threading
+from collections import namedtuple
+
+ROW_MODES = ("dict", "tuple", "record")
+
+_record_classes = {}
+_lock = threading.Lock()
+
+def record_class(description):
+    # Una clase por forma de consulta (tupla de nombres de columna), compartida entre llamadas.
+    # namedtuple no tiene __dict__ por instancia: cada fila cuesta lo mismo que una tupla.
+    columns = tuple(col[0] for col in description)
+    cls = _record_classes.get(columns)
+    if cls is None:
+        with _lock:
+            cls = _record_classes.get(columns)
+            if cls is None:
+                cls = namedtuple("Registro", columns, rename=True)
+                _record_classes[columns] = cls
+    return cls
+
+def row_converter(cursor, row_mode):
+    if row_mode == "dict":
+        return dict
+    if row_mode == "record":
+        return record_class(cursor.description)._make
+    if row_mode == "tuple":
+        return None
+    raise ValueError(f"row_mode invalido: {row_mode!r}. Opciones: {', '.join(ROW_MODES)}")
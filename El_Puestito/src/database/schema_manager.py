@@ -1,6 +1,7 @@
 import os
 import json
 from src.database.connection import db_manager
+from src.database.migrator import migration_runner
 from logger_setup import setup_logger
 from src.path_manager import get_asset_path
 
@@ -12,9 +13,15 @@ class SchemaManager:
         self.initialize_schema()
 
     def initialize_schema(self):
+        version = migration_runner.current_version()
+        if migration_runner.is_up_to_date(version):
+            logger.info(f"Esquema al dia (user_version {version}).")
+            return
         self.create_tables()
-        self._check_and_update_schema()
-        self._clean_orphans()
+        if not migration_runner.apply_pending(version):
+            # user_version no avanzo: arrancar sobre un esquema a medias solo esconderia el error.
+            logger.critical("Una migracion fallo; se aborta el arranque. Revise el log antes de reintentar.")
+            raise RuntimeError("Fallo la migracion del esquema de la base de datos.")
         self.run_migration_if_needed()
 
     def create_tables(self):
@@ -71,10 +78,44 @@ class SchemaManager:
             fecha_apertura DATETIME NOT NULL,
             fecha_cierre DATETIME,
             client_uuid TEXT UNIQUE,
-            proformas_impresas INTEGER NOT NULL DEFAULT 0
+            proformas_impresas INTEGER NOT NULL DEFAULT 0,
+            total_centavos INTEGER NOT NULL DEFAULT 0,
+            items_count INTEGER NOT NULL DEFAULT 0,
+            id_cuenta INTEGER,
+            FOREIGN KEY (id_cuenta) REFERENCES cuentas (id_cuenta)
         );
         """)
 
+        db_manager.execute("""
+        CREATE TABLE IF NOT EXISTS mesas (
+            id_mesa INTEGER PRIMARY KEY AUTOINCREMENT,
+            etiqueta TEXT NOT NULL UNIQUE
+        );
+        """)
+
+        db_manager.execute("""
+        CREATE TABLE IF NOT EXISTS cuentas (
+            id_cuenta INTEGER PRIMARY KEY AUTOINCREMENT,
+            mesa_key TEXT NOT NULL,
+            nombre TEXT,
+            id_padre INTEGER,
+            estado TEXT NOT NULL DEFAULT 'abierta',
+            fecha_apertura DATETIME NOT NULL,
+            fecha_cierre DATETIME,
+            FOREIGN KEY (id_padre) REFERENCES cuentas (id_cuenta)
+        );
+        """)
+
+        db_manager.execute("""
+        CREATE TABLE IF NOT EXISTS cuenta_mesas (
+            id_cuenta INTEGER NOT NULL,
+            id_mesa INTEGER NOT NULL,
+            PRIMARY KEY (id_cuenta, id_mesa),
+            FOREIGN KEY (id_cuenta) REFERENCES cuentas (id_cuenta),
+            FOREIGN KEY (id_mesa) REFERENCES mesas (id_mesa)
+        ) WITHOUT ROWID;
+        """)
+
         db_manager.execute("""
         CREATE TABLE IF NOT EXISTS inventario (
             id_inventario INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -105,67 +146,6 @@ class SchemaManager:
         );
         """)
 
-    def _check_and_update_schema(self):
-        try:
-            conn = db_manager.get_conn()
-            cursor = conn.cursor()
-
-            cursor.execute("PRAGMA table_info(menu_items)")
-            columns_menu = [info[1] for info in cursor.fetchall()]
-            if 'precio_michelada' not in columns_menu:
-                logger.info("Migracion de esquema: Agregando columna precio_michelada en menu_items")
-                db_manager.execute("ALTER TABLE menu_items ADD COLUMN precio_michelada INTEGER DEFAULT 0;")
-
-            cursor.execute("PRAGMA table_info(orden_detalle)")
-            columns_det = [info[1] for info in cursor.fetchall()]
-            
-            if 'id_cerveza' not in columns_det:
-                db_manager.execute("ALTER TABLE orden_detalle ADD COLUMN id_cerveza TEXT;")
-                db_manager.execute("ALTER TABLE orden_detalle ADD COLUMN nombre_cerveza TEXT;")
-            
-            cursor.execute("PRAGMA table_info(menu_categorias)")
-            columns = [info[1] for info in cursor.fetchall()]
-            
-            if 'destino' not in columns:
-                logger.info("Migracion de esquema: Falta columna destino en menu_categorias.")
-                db_manager.execute("ALTER TABLE menu_categorias ADD COLUMN destino TEXT DEFAULT 'cocina';")
-                self._migrate_hardcoded_destinations_to_db()
-
-            cursor.execute("PRAGMA table_info(empleados)")
-            columns_emp = [info[1] for info in cursor.fetchall()]
-            
-            if 'fingerprint_id' not in columns_emp:
-                logger.info("Migracion de esquema: Agregando fingerprint_id en empleados.")
-                db_manager.execute("ALTER TABLE empleados ADD COLUMN fingerprint_id INTEGER;")
-                db_manager.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_empleados_fingerprint ON empleados(fingerprint_id);")
-                
-            if 'fcm_token' not in columns_emp:
-                db_manager.execute("ALTER TABLE empleados ADD COLUMN fcm_token TEXT;")
-                
-            if 'recibe_alertas' not in columns_emp:
-                db_manager.execute("ALTER TABLE empleados ADD COLUMN recibe_alertas INTEGER DEFAULT 1;")
-                
-            cursor.execute("PRAGMA table_info(ordenes)")
-            columns_ordenes = [info[1] for info in cursor.fetchall()]
-            
-            if 'proformas_impresas' not in columns_ordenes:
-                logger.info("Migracion de esquema: Agregando proformas_impresas en ordenes.")
-                db_manager.execute("ALTER TABLE ordenes ADD COLUMN proformas_impresas INTEGER NOT NULL DEFAULT 0;")
-
-        except Exception as e:
-            logger.error(f"Error verificando o actualizando esquema: {e}")
-
-    def _clean_orphans(self):
-        try:
-            conn = db_manager.get_conn()
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM eventos_asistencia WHERE id_empleado NOT IN (SELECT id_empleado FROM empleados);")
-            cursor.execute("DELETE FROM orden_detalle WHERE id_orden NOT IN (SELECT id_orden FROM ordenes);")
-            conn.commit()
-            logger.info("Datos huerfanos limpiados correctamente.")
-        except Exception as e:
-            logger.error(f"Error limpiando huerfanos: {e}")
-
     def _migrate_hardcoded_destinations_to_db(self):
         PREFIJOS_ANTIGUOS = ("MIC", "OBA", "BSA", "CER", "RTD")
         logger.info("Migrando logica de prefijos a base de datos...")
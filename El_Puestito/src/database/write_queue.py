@@ -0,0 +1,145 @@
+import time
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+class WriteResult:
+    __slots__ = ("lastrowid", "rowcount")
+
+    def __init__(self, lastrowid, rowcount):
+        self.lastrowid = lastrowid
+        self.rowcount = rowcount
+
+class WriteQueue:
+    _STOP = object()
+
+    def __init__(self, connection_factory, max_batch=64, max_wait_ms=2.0):
+        self.connection_factory = connection_factory
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._counters = {"writes": 0, "batches": 0, "failed": 0, "max_batch_seen": 0}
+        self._lock = threading.Lock()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, query, params=()):
+        future = Future()
+        # Bajo el candado: _fail() no puede vaciar la cola entre la revision de _error y el put.
+        with self._lock:
+            if self._error is None:
+                self._queue.put((query, params, future))
+                return future
+            error = self._error
+        future.set_exception(error)
+        return future
+
+    def is_writer_thread(self):
+        return threading.current_thread() is self._thread
+
+    def stop(self, timeout=5.0):
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["writer_error"] = str(self._error) if self._error else None
+        stats["pending"] = self._queue.qsize()
+        stats["avg_batch"] = round(stats["writes"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+    def _collect_batch(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                remaining = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            if item is self._STOP:
+                break
+        return batch
+
+    def _run(self):
+        try:
+            conn = self.connection_factory()
+            conn.isolation_level = None
+        except Exception as e:
+            logger.critical(f"El hilo escritor no pudo abrir su conexion: {e}")
+            self._fail(e)
+            return
+        stopping = False
+        try:
+            while not stopping:
+                batch = self._collect_batch(self._queue.get())
+                if batch[-1] is self._STOP:
+                    batch.pop()
+                    stopping = True
+                if batch:
+                    self._commit_batch(conn, batch)
+        except Exception as e:
+            logger.critical(f"El hilo escritor se detuvo: {e}")
+            self._fail(e)
+        finally:
+            conn.close()
+
+    def _fail(self, error):
+        # Sin hilo escritor nadie atenderia la cola: las escrituras pendientes y las futuras fallan de inmediato.
+        with self._lock:
+            self._error = error
+            pendientes = []
+            while True:
+                try:
+                    pendientes.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+        for item in pendientes:
+            if item is not self._STOP and item[2].set_running_or_notify_cancel():
+                item[2].set_exception(error)
+
+    def _commit_batch(self, conn, batch):
+        # Group commit: todas las escrituras pendientes en una sola transaccion.
+        # Cada sentencia corre en su propio SAVEPOINT para que una falla no arrastre a las demas.
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            for query, params, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    conn.execute("SAVEPOINT escritura;")
+                    cursor = conn.execute(query, params)
+                    conn.execute("RELEASE escritura;")
+                    outcomes.append((future, WriteResult(cursor.lastrowid, cursor.rowcount), None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO escritura;")
+                    conn.execute("RELEASE escritura;")
+                    outcomes.append((future, None, e))
+            conn.execute("COMMIT;")
+        except Exception as e:
+            logger.error(f"Fallo el group commit de {len(batch)} escrituras: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK;")
+            outcomes = [(f, None, e) for _, _, f in batch if not f.cancelled()]
+
+        failed = 0
+        for future, result, error in outcomes:
+            if error is not None:
+                failed += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        with self._lock:
+            self._counters["batches"] += 1
+            self._counters["writes"] += len(outcomes)
+            self._counters["failed"] += failed
+            self._counters["max_batch_seen"] = max(self._counters["max_batch_seen"], len(batch))
@@ -0,0 +1,101 @@
+import time
+import threading
+from src.database.connection import db_manager
+from logger_setup import setup_logger
+
+logger = setup_logger()
+
+DEFAULT_BROADCAST_SETTINGS = {
+    "enabled": True,
+    "coalesce_window_ms": 50,
+}
+
+class CoalescingBroadcaster:
+    def __init__(self, emit, settings=None):
+        settings = {**DEFAULT_BROADCAST_SETTINGS, **(settings or {})}
+        self.emit = emit
+        self.enabled = bool(settings["enabled"])
+        self.window = max(0.0, float(settings["coalesce_window_ms"]) / 1000.0)
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        # (evento, sala) -> tarea; el orden de insercion se respeta al enviar.
+        self._pending = {}
+        self._first_mark = None
+        self._thread = None
+        self._stopping = False
+        self._counters = {"marks": 0, "coalesced": 0, "flushes": 0, "emitted": 0, "errors": 0}
+
+    def mark(self, event, payload=None, to=None):
+        # payload puede ser un callable: se calcula una sola vez al enviar, no en cada marca.
+        def task():
+            self.emit(event, payload() if callable(payload) else payload, to)
+        self.mark_task((event, to), task)
+
+    def mark_task(self, key, task):
+        with self._cond:
+            self._counters["marks"] += 1
+            if key in self._pending:
+                self._counters["coalesced"] += 1
+            self._pending[key] = task
+            if self.enabled and self.window > 0:
+                if self._first_mark is None:
+                    self._first_mark = time.monotonic()
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="broadcast-flusher", daemon=True)
+                    self._thread.start()
+                self._cond.notify()
+                return
+        self.flush()
+
+    def _run(self):
+        # Un solo hilo para todas las ventanas: espera la primera marca, deja pasar la ventana y envia.
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                while not self._stopping and self._first_mark is not None:
+                    restante = self._first_mark + self.window - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._cond.wait(restante)
+                if self._stopping:
+                    return
+            try:
+                self.flush()
+            finally:
+                # Las tareas (emitir_mesas) pueden leer la base: la conexion vuelve al pool en cada ventana.
+                db_manager.close_conn_for_thread()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._first_mark = None
+            if not pending:
+                return
+            self._counters["flushes"] += 1
+        for key, task in pending.items():
+            try:
+                task()
+                with self._lock:
+                    self._counters["emitted"] += 1
+            except Exception as e:
+                with self._lock:
+                    self._counters["errors"] += 1
+                logger.error(f"Error emitiendo {key[0]}: {e}")
+
+    def stop(self):
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._cond.notify_all()
+        if thread:
+            thread.join(timeout=5.0)
+        with self._lock:
+            self._stopping = False
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({"enabled": self.enabled, "window_ms": self.window * 1000.0, "pending": len(self._pending)})
+        return stats
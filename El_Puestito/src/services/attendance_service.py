@@ -10,8 +10,8 @@ class AttendanceService:
             timestamp = datetime.datetime.now().isoformat()
         return attendance_repo.add_attendance_event(employee_id, event_type, timestamp)
         
-    def get_attendance_history_range(self, start_date, end_date):
-        return attendance_repo.get_attendance_history_range(start_date, end_date)
+    def get_attendance_history_range(self, start_date, end_date_exclusive):
+        return attendance_repo.get_attendance_history_range(start_date, end_date_exclusive)
         
     def get_last_attendance_event(self, employee_id):
         return attendance_repo.get_last_attendance_event(employee_id)
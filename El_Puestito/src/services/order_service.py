@@ -1,4 +1,6 @@
+import sqlite3
 from src.database.repositories.orders import order_repo
+from src.database.idempotency import order_idempotency, OrderOutcome
 from logger_setup import setup_logger
 
 logger = setup_logger()
@@ -6,6 +8,48 @@ logger = setup_logger()
 class OrderService:
     def create_new_order(self, orden_completa):
         return order_repo.create_new_order(orden_completa)
+
+    def submit_order(self, orden_completa):
+        # Pedidos de la app: el order_id es la llave de idempotencia. Devuelve (outcome, replayed).
+        order_id = orden_completa.get("order_id")
+        recuperado = []
+
+        def ejecutar():
+            try:
+                return OrderOutcome("ok", order_repo.create_new_order(orden_completa), None)
+            except ValueError as ve:
+                return OrderOutcome("rejected", None, str(ve))
+            except sqlite3.IntegrityError:
+                existente = order_idempotency.recover(order_id) if order_id else None
+                if existente is None:
+                    raise
+                recuperado.append(existente)
+                return existente
+
+        outcome, replayed = order_idempotency.run(order_id, ejecutar)
+        return outcome, replayed or bool(recuperado)
+
+    def submit_orders_batch(self, ordenes):
+        # Devuelve [(outcome, replayed)] en el mismo orden que las ordenes recibidas.
+        keys = [orden.get("order_id") for orden in ordenes]
+        recuperados = set()
+
+        def ejecutar(indices):
+            outcomes = {}
+            for i, (status, id_orden, error) in zip(indices, order_repo.create_orders_batch([ordenes[i] for i in indices])):
+                if status == "duplicate":
+                    existente = order_idempotency.recover(keys[i]) if keys[i] else None
+                    if existente is None:
+                        outcomes[i] = OrderOutcome("rejected", None, error)
+                        continue
+                    recuperados.add(i)
+                    outcomes[i] = existente
+                else:
+                    outcomes[i] = OrderOutcome(status, id_orden, error)
+            return outcomes
+
+        resultados = order_idempotency.run_many(keys, ejecutar)
+        return [(outcome, replayed or i in recuperados) for i, (outcome, replayed) in enumerate(resultados)]
         
     def complete_order(self, mesa_key):
         return order_repo.complete_order(mesa_key)
@@ -36,6 +80,9 @@ class OrderService:
             
     def mark_individual_item_ready(self, id_detalle):
         return order_repo.mark_individual_item_ready(id_detalle)
+
+    def mark_items_ready(self, lineas, destino=None):
+        return order_repo.mark_items_ready(lineas, destino)
         
     def get_sales_report(self, date_str):
         return order_repo.get_sales_report(date_str)
@@ -98,15 +98,19 @@ class PrinterService:
             self.printer.text("-" * 32 + "\n")
             
             mesa_key = str(order_data.get('mesa_key', ''))
+            cuenta = order_data.get('cuenta') or {}
             if mesa_key:
                 self.printer.set(align='left', bold=True)
-                if '-' in mesa_key:
+                if cuenta.get('nombre'):
+                    self.printer.text(f"Mesa: {'+'.join(cuenta.get('mesas') or [mesa_key])}\n")
+                    self.printer.text(f"Sub-cuenta: {cuenta['nombre']}\n")
+                elif '-' in mesa_key and not cuenta:
                     parts = mesa_key.split('-')
                     mesa_base = parts[0]
                     nombre_subcuenta = "-".join(parts[1:])
                     self.printer.text(f"Mesa: {mesa_base}\n")
                     self.printer.text(f"Sub-cuenta: {nombre_subcuenta}\n")
-                elif '+' in mesa_key:
+                elif cuenta.get('es_grupo') or '+' in mesa_key:
                     self.printer.text(f"Mesa(s): {mesa_key}\n")
                     self.printer.text("Cuenta Principal\n")
                 else:
@@ -36,10 +36,15 @@ def clean_db():
     db_manager.execute("DELETE FROM orden_detalle")
     db_manager.execute("DELETE FROM inventario")
     db_manager.execute("DELETE FROM ordenes")
+    db_manager.execute("DELETE FROM cuenta_mesas")
+    db_manager.execute("DELETE FROM cuentas")
+    db_manager.execute("DELETE FROM mesas")
     db_manager.execute("DELETE FROM menu_items")
     db_manager.execute("DELETE FROM menu_categorias")
     db_manager.execute("DELETE FROM eventos_asistencia")
     db_manager.execute("DELETE FROM empleados")
+    from src.database.idempotency import order_idempotency
+    order_idempotency.clear()
     yield
 
 @pytest.fixture
@@ -0,0 +1,348 @@
+import os
+import tempfile
+import threading
+import pytest
+from src.database.connection import DatabaseManager, db_manager
+from src.database.pool import PoolTimeoutError
+
+@pytest.fixture
+def temp_db_path():
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    yield path
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+
+def test_pool_reuses_connections_between_requests(temp_db_path):
+    """Prueba que el teardown de cada peticion devuelve la conexion al pool en lugar de cerrarla"""
+    db = DatabaseManager(db_path=temp_db_path, settings={"pool": {"min_size": 1, "max_size": 2}})
+    conexiones = []
+
+    def peticion():
+        conexiones.append(db.get_conn())
+        db.fetchone("SELECT 1 AS uno")
+        db.close_conn_for_thread()
+
+    for _ in range(5):
+        hilo = threading.Thread(target=peticion)
+        hilo.start()
+        hilo.join()
+
+    stats = db.pool_stats()
+    assert len({id(c) for c in conexiones}) == 1
+    assert stats["created"] == 1
+    assert stats["checkouts"] == 5
+    assert stats["in_use"] == 0
+    db.close_all()
+
+def test_pool_reclaims_connections_from_dead_threads(temp_db_path):
+    """Prueba que un hilo que muere sin liberar su conexion no agota el pool"""
+    db = DatabaseManager(db_path=temp_db_path, settings={"pool": {"min_size": 0, "max_size": 1, "checkout_timeout": 0.2}})
+
+    hilo = threading.Thread(target=db.get_conn)
+    hilo.start()
+    hilo.join()
+
+    conn = db.get_conn()
+    assert conn is not None
+    assert db.pool_stats()["reclaimed"] == 1
+
+    bloqueado = []
+    def otro_hilo():
+        try:
+            db.get_conn()
+        except PoolTimeoutError:
+            bloqueado.append(True)
+    hilo = threading.Thread(target=otro_hilo)
+    hilo.start()
+    hilo.join()
+    assert bloqueado == [True]
+    db.close_all()
+
+def test_checkpoint_scheduler_reaps_idle_pool_connections(temp_db_path):
+    """Prueba que el planificador cierra las conexiones ociosas aunque no se devuelva otra al pool"""
+    import time
+    from src.database.checkpoint import CheckpointScheduler
+    db = DatabaseManager(db_path=temp_db_path, settings={"pool": {"min_size": 0, "max_size": 2, "idle_timeout": 0.05}})
+
+    hilo = threading.Thread(target=lambda: (db.fetchone("SELECT 1 AS uno"), db.close_conn_for_thread()))
+    hilo.start()
+    hilo.join()
+    assert db.pool_stats()["idle"] == 1
+
+    scheduler = CheckpointScheduler(db=db, settings={"poll_seconds": 0.1, "closing_time": "23:59"})
+    scheduler.start()
+    time.sleep(0.5)
+    scheduler.stop(truncate=False)
+
+    stats = db.pool_stats()
+    assert stats["reaped"] == 1
+    assert stats["size"] == 0
+    db.close_all()
+
+def test_write_queue_group_commit_isolates_failures(temp_db_path):
+    """Prueba que el hilo escritor agrupa escrituras concurrentes y que una falla no revierte las demas"""
+    db = DatabaseManager(db_path=temp_db_path, settings={"write_queue": {"enabled": True, "max_wait_ms": 20}})
+    db.execute("CREATE TABLE mesas_prueba (id INTEGER PRIMARY KEY, nombre TEXT UNIQUE)")
+
+    futuros = [db.execute_async("INSERT INTO mesas_prueba (nombre) VALUES (?)", (f"Mesa {i}",)) for i in range(20)]
+    futuros.append(db.execute_async("INSERT INTO mesas_prueba (nombre) VALUES (?)", ("Mesa 0",)))
+
+    resultados = [f.result(timeout=5) for f in futuros[:-1]]
+    with pytest.raises(Exception):
+        futuros[-1].result(timeout=5)
+
+    assert len({r.lastrowid for r in resultados}) == 20
+    assert db.fetchone("SELECT COUNT(*) AS total FROM mesas_prueba")["total"] == 20
+    stats = db.write_queue_stats()
+    assert stats["failed"] == 1
+    assert stats["batches"] < stats["writes"]
+    db.close_all()
+
+def test_write_queue_fails_fast_when_writer_cannot_connect():
+    """Prueba que si el hilo escritor no puede abrir su conexion las escrituras fallan en vez de quedarse esperando"""
+    import sqlite3
+    from src.database.write_queue import WriteQueue
+    arranque = threading.Event()
+
+    def fabrica():
+        arranque.wait(5)
+        raise sqlite3.OperationalError("unable to open database file")
+
+    cola = WriteQueue(fabrica)
+    encolada = cola.submit("INSERT INTO mesas_prueba (nombre) VALUES (?)", ("Mesa 1",))
+    arranque.set()
+    with pytest.raises(sqlite3.OperationalError):
+        encolada.result(timeout=5)
+    with pytest.raises(sqlite3.OperationalError):
+        cola.submit("INSERT INTO mesas_prueba (nombre) VALUES (?)", ("Mesa 2",)).result(timeout=5)
+    assert "unable to open" in cola.stats()["writer_error"]
+
+def test_transaction_nested_savepoint_rolls_back_only_inner_block(temp_db_path):
+    """Prueba que un bloque anidado que falla solo revierte su SAVEPOINT y la unidad externa confirma una vez"""
+    db = DatabaseManager(db_path=temp_db_path, settings={"pool": {"min_size": 1, "max_size": 1}})
+    db.execute("CREATE TABLE mesas_prueba (id INTEGER PRIMARY KEY, nombre TEXT UNIQUE)")
+
+    with db.transaction() as cursor:
+        cursor.execute("INSERT INTO mesas_prueba (nombre) VALUES ('Mesa 1')")
+        with pytest.raises(Exception):
+            with db.transaction() as interno:
+                interno.execute("INSERT INTO mesas_prueba (nombre) VALUES ('Mesa 2')")
+                interno.execute("INSERT INTO mesas_prueba (nombre) VALUES ('Mesa 1')")
+        db.execute("INSERT INTO mesas_prueba (nombre) VALUES ('Mesa 3')")
+        assert db.in_transaction()
+
+    assert not db.in_transaction()
+    assert not db.get_conn().in_transaction
+    nombres = [r["nombre"] for r in db.fetchall("SELECT nombre FROM mesas_prueba ORDER BY id")]
+    assert nombres == ["Mesa 1", "Mesa 3"]
+
+    with pytest.raises(ValueError):
+        with db.transaction() as cursor:
+            cursor.execute("INSERT INTO mesas_prueba (nombre) VALUES ('Mesa 4')")
+            raise ValueError("falla de negocio")
+    assert db.fetchone("SELECT COUNT(*) AS total FROM mesas_prueba")["total"] == 2
+    db.close_all()
+
+def test_row_modes_and_streaming_iterate(temp_db_path):
+    """Prueba que los modos tuple/record devuelven los mismos datos que dict y que iterate hace streaming por lotes"""
+    db = DatabaseManager(db_path=temp_db_path, settings={"pool": {"min_size": 1, "max_size": 1}})
+    db.execute("CREATE TABLE mesas_prueba (id INTEGER PRIMARY KEY, nombre TEXT)")
+    with db.transaction() as cursor:
+        cursor.executemany("INSERT INTO mesas_prueba (nombre) VALUES (?)", [(f"Mesa {i}",) for i in range(10)])
+
+    query = "SELECT id, nombre, COUNT(*) OVER () FROM mesas_prueba ORDER BY id"
+    como_dict = db.fetchall(query)
+    como_tupla = db.fetchall(query, row_mode="tuple")
+    como_record = db.fetchall(query, row_mode="record")
+
+    assert como_tupla[0] == (1, "Mesa 0", 10)
+    assert como_record[0].nombre == "Mesa 0"
+    assert [tuple(r.values()) for r in como_dict] == [tuple(r) for r in como_record] == como_tupla
+    assert type(como_record[0]) is type(db.fetchone(query, row_mode="record"))
+
+    flujo = db.iterate(query, row_mode="record", batch_size=3)
+    assert next(flujo).id == 1
+    assert [r.id for r in flujo] == list(range(2, 11))
+
+    with pytest.raises(ValueError):
+        db.fetchall(query, row_mode="objeto")
+    db.close_all()
+
+def test_query_cache_invalidates_on_writes_to_declared_tables(temp_db_path):
+    """Prueba que la cache sirve lecturas repetidas y se invalida al escribir en las tablas declaradas"""
+    db = DatabaseManager(db_path=temp_db_path, settings={"pool": {"min_size": 1, "max_size": 2}, "cache": {"max_entries": 2}})
+    db.execute("CREATE TABLE mesas_prueba (id INTEGER PRIMARY KEY, nombre TEXT)")
+    db.execute("CREATE TABLE otra_prueba (id INTEGER PRIMARY KEY)")
+    db.execute("INSERT INTO mesas_prueba (nombre) VALUES ('Mesa 1')")
+    avisos = []
+    db.add_invalidation_listener(lambda tablas: avisos.append(set(tablas)))
+    query = "SELECT id, nombre FROM mesas_prueba ORDER BY id"
+
+    primera = db.fetchall(query, cache=("mesas_prueba",))
+    primera[0]["nombre"] = "modificada por el llamador"
+    assert db.fetchall(query, cache=("mesas_prueba",))[0]["nombre"] == "Mesa 1"
+    assert db.cache_stats()["hits"] == 1
+
+    db.execute("INSERT INTO otra_prueba DEFAULT VALUES")
+    assert db.cache_stats()["size"] == 1
+
+    with db.transaction() as cursor:
+        cursor.execute("UPDATE mesas_prueba SET nombre = 'Mesa 1A' WHERE id = 1")
+        assert db.cache_stats()["size"] == 0
+        assert {"mesas_prueba"} not in avisos
+    assert {"mesas_prueba"} in avisos
+    assert db.fetchall(query, cache=("mesas_prueba",))[0]["nombre"] == "Mesa 1A"
+
+    for i in range(3):
+        db.fetchall("SELECT ? AS n", (i,), cache=("mesas_prueba",))
+    stats = db.cache_stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 2
+    db.close_all()
+
+def test_query_stats_group_by_fingerprint_and_log_slow_plan(temp_db_path, caplog):
+    """Prueba que las consultas se agrupan por huella normalizada y que las lentas se registran con su plan"""
+    db = DatabaseManager(db_path=temp_db_path, settings={
+        "pool": {"min_size": 1, "max_size": 1},
+        "instrumentation": {"slow_query_ms": 0.0, "explain_interval_s": 0.0},
+    })
+    db.execute("CREATE TABLE mesas_prueba (id INTEGER PRIMARY KEY, nombre TEXT)")
+    for i in range(5):
+        db.fetchall(f"SELECT * FROM mesas_prueba WHERE id IN (?, ?) AND nombre = 'Mesa {i}'", (i, i + 1))
+    with db.transaction() as cursor:
+        cursor.executemany("INSERT INTO mesas_prueba (nombre) VALUES (?)", [("a",), ("b",)])
+
+    consultas = {q["fingerprint"]: q for q in db.query_stats()["queries"]}
+    select = consultas["SELECT * FROM mesas_prueba WHERE id IN (?+) AND nombre = ?"]
+    assert select["count"] == 5
+    assert select["p50_ms"] <= select["p95_ms"] <= select["max_ms"]
+    assert consultas["INSERT INTO mesas_prueba (nombre) VALUES (?)"]["count"] == 1
+    assert any("params=(int, int)" in r.message and "plan:" in r.message for r in caplog.records)
+    assert any("params=2 x (str)" in r.message for r in caplog.records)
+
+    db.reset_query_stats()
+    assert db.query_stats()["queries"] == []
+    db.close_all()
+
+def test_migration_runner_upgrades_legacy_db_once(temp_db_path):
+    """Prueba que una base vieja (precios REAL, columnas faltantes) se migra una vez y luego solo se lee user_version"""
+    from src.database.migrator import MigrationRunner
+    db = DatabaseManager(db_path=temp_db_path, settings={"pool": {"min_size": 1, "max_size": 1}})
+    with db.transaction() as cursor:
+        cursor.execute("CREATE TABLE empleados (id_empleado TEXT PRIMARY KEY, nombre TEXT NOT NULL, rol TEXT, deviceId TEXT UNIQUE)")
+        cursor.execute("CREATE TABLE menu_categorias (id_categoria INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT NOT NULL UNIQUE)")
+        cursor.execute("CREATE TABLE menu_items (id_item TEXT PRIMARY KEY, id_categoria INTEGER NOT NULL, nombre TEXT NOT NULL, descripcion TEXT, precio REAL NOT NULL, imagen TEXT, disponible INTEGER NOT NULL DEFAULT 1)")
+        cursor.execute("CREATE TABLE eventos_asistencia (id_evento INTEGER PRIMARY KEY AUTOINCREMENT, id_empleado TEXT NOT NULL, timestamp DATETIME NOT NULL, tipo TEXT NOT NULL)")
+        cursor.execute("CREATE TABLE ordenes (id_orden INTEGER PRIMARY KEY AUTOINCREMENT, mesa_key TEXT NOT NULL, estado TEXT NOT NULL DEFAULT 'activa', fecha_apertura DATETIME NOT NULL, fecha_cierre DATETIME, client_uuid TEXT UNIQUE)")
+        cursor.execute("CREATE TABLE orden_detalle (id_detalle INTEGER PRIMARY KEY AUTOINCREMENT, id_orden INTEGER NOT NULL, id_item_menu TEXT NOT NULL, cantidad INTEGER NOT NULL, precio_unitario_congelado REAL NOT NULL, nombre_congelado TEXT NOT NULL, imagen_congelada TEXT, notas TEXT, destino TEXT NOT NULL, estado_item TEXT NOT NULL DEFAULT 'pendiente')")
+        cursor.execute("INSERT INTO menu_categorias (nombre) VALUES ('Cervezas')")
+        cursor.execute("INSERT INTO menu_items (id_item, id_categoria, nombre, precio) VALUES ('CER01', 1, 'Nacional', 45.5)")
+        cursor.execute("INSERT INTO orden_detalle (id_orden, id_item_menu, cantidad, precio_unitario_congelado, nombre_congelado, destino) VALUES (99, 'CER01', 1, 45.5, 'Nacional', 'barra')")
+        cursor.execute("INSERT INTO ordenes (mesa_key, fecha_apertura) VALUES ('1+2', '2026-01-01'), ('1+2-Ana', '2026-01-01'), ('7', '2026-01-01')")
+
+    runner = MigrationRunner(db=db)
+    assert runner.current_version() == 0
+    assert runner.apply_pending()
+    assert runner.current_version() == runner.latest_version
+
+    item = db.fetchone("SELECT precio, precio_michelada FROM menu_items")
+    assert item == {"precio": 4550, "precio_michelada": 0}
+    assert db.fetchone("SELECT destino FROM menu_categorias")["destino"] == "barra"
+    assert db.fetchone("SELECT COUNT(*) AS total FROM orden_detalle")["total"] == 0
+    assert db.fetchone("SELECT name FROM sqlite_master WHERE name = 'idx_ordenes_fecha_cierre'")
+    cuentas = db.fetchall("SELECT c.mesa_key, p.mesa_key AS padre, COUNT(cm.id_mesa) AS mesas FROM cuentas c LEFT JOIN cuentas p ON p.id_cuenta = c.id_padre JOIN cuenta_mesas cm ON cm.id_cuenta = c.id_cuenta GROUP BY c.id_cuenta ORDER BY c.mesa_key")
+    assert [tuple(c.values()) for c in cuentas] == [("1+2", None, 2), ("1+2-Ana", "1+2", 2), ("7", None, 1)]
+    assert db.fetchone("SELECT COUNT(*) AS total FROM ordenes WHERE id_cuenta IS NULL")["total"] == 0
+
+    db.reset_query_stats()
+    assert runner.is_up_to_date()
+    assert runner.apply_pending()
+    assert [q["fingerprint"] for q in db.query_stats()["queries"]] == ["PRAGMA user_version"]
+    db.close_all()
+
+def test_failed_migration_aborts_startup(monkeypatch):
+    """Prueba que si una migracion falla el esquema no sigue con la carga inicial y el arranque se aborta"""
+    from src.database.schema_manager import SchemaManager
+    from src.database.migrator import migration_runner
+    cargas = []
+    monkeypatch.setattr(migration_runner, "is_up_to_date", lambda version=None: False)
+    monkeypatch.setattr(migration_runner, "apply_pending", lambda version=None: False)
+    monkeypatch.setattr(SchemaManager, "run_migration_if_needed", lambda self: cargas.append(True))
+    with pytest.raises(RuntimeError):
+        SchemaManager()
+    assert cargas == []
+
+def test_online_backup_checks_integrity_and_rotates(temp_db_path, tmp_path):
+    """Prueba que el respaldo en linea copia una instantanea integra y conserva solo los N mas recientes"""
+    import sqlite3
+    from src.database.backup import BackupManager
+    db = DatabaseManager(db_path=temp_db_path, settings={"pool": {"min_size": 1, "max_size": 1}})
+    db.execute("CREATE TABLE mesas_prueba (id INTEGER PRIMARY KEY, nombre TEXT)")
+    with db.transaction() as cursor:
+        cursor.executemany("INSERT INTO mesas_prueba (nombre) VALUES (?)", [(f"Mesa {i}" * 20,) for i in range(2000)])
+
+    directorio = tmp_path / "backups"
+    directorio.mkdir()
+    for viejo in ("puestito_20250101_000000.db", "puestito_20250102_000000.db"):
+        (directorio / viejo).write_bytes(b"")
+
+    backup = BackupManager(db=db, settings={"directory": str(directorio), "keep": 2, "pages_per_step": 8, "pause_ms": 0})
+    resultado = backup.run()[0]
+
+    assert resultado["ok"] and resultado["integrity"] == "ok"
+    assert sorted(os.listdir(directorio)) == ["puestito_20250102_000000.db", os.path.basename(resultado["path"])]
+    copia = sqlite3.connect(resultado["path"])
+    assert copia.execute("SELECT COUNT(*) FROM mesas_prueba").fetchone()[0] == 2000
+    copia.close()
+    db.close_all()
+
+def test_backups_in_the_same_instant_get_distinct_files(temp_db_path, tmp_path, monkeypatch):
+    """Prueba que dos respaldos con la misma marca de tiempo no se pisan"""
+    import datetime
+    from src.database import backup as backup_module
+    instante = datetime.datetime(2026, 1, 1, 12, 0, 0, 123000)
+
+    class RelojFijo(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return instante
+    monkeypatch.setattr(backup_module.datetime, "datetime", RelojFijo)
+
+    db = DatabaseManager(db_path=temp_db_path, settings={"pool": {"min_size": 1, "max_size": 1}})
+    db.execute("CREATE TABLE mesas_prueba (id INTEGER PRIMARY KEY)")
+    backup = backup_module.BackupManager(db=db, settings={"directory": str(tmp_path), "keep": 5, "pause_ms": 0})
+    rutas = [backup.backup_file(temp_db_path, "puestito")["path"] for _ in range(2)]
+
+    assert [os.path.basename(r) for r in rutas] == ["puestito_20260101_120000_123.db", "puestito_20260101_120000_123_1.db"]
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(r) for r in rutas)
+    db.close_all()
+
+def test_performance_profile_and_checkpoint_scheduler(temp_db_path):
+    """Prueba que el perfil de PRAGMA se aplica a cada conexion y que el planificador hace PASSIVE en reposo y TRUNCATE al cierre"""
+    import datetime
+    from src.database.checkpoint import CheckpointScheduler
+    db = DatabaseManager(db_path=temp_db_path, settings={
+        "pool": {"min_size": 1, "max_size": 1},
+        "performance": {"profile": "throughput", "pragmas": {"cache_size": -2000, "foreign_keys": "OFF"}},
+    })
+    assert db.fetchone("PRAGMA synchronous", row_mode="tuple")[0] == 1
+    assert db.fetchone("PRAGMA cache_size", row_mode="tuple")[0] == -2000
+    assert db.fetchone("PRAGMA foreign_keys", row_mode="tuple")[0] == 1
+
+    db.execute("CREATE TABLE mesas_prueba (id INTEGER PRIMARY KEY, nombre TEXT)")
+    with db.transaction() as cursor:
+        cursor.executemany("INSERT INTO mesas_prueba (nombre) VALUES (?)", [("x" * 200,) for _ in range(500)])
+
+    scheduler = CheckpointScheduler(db=db, settings={"idle_seconds": 0, "min_wal_bytes": 1, "closing_time": "23:59"})
+    mediodia = datetime.datetime.combine(datetime.date.today(), datetime.time(12, 0))
+    assert scheduler.tick(now=mediodia) is None
+    pasivo = scheduler.tick(now=mediodia)
+    assert pasivo["mode"] == "PASSIVE" and pasivo["checkpointed"] == pasivo["wal_frames"] > 0
+
+    cierre = scheduler.tick(now=mediodia.replace(hour=23, minute=59))
+    assert cierre["mode"] == "TRUNCATE"
+    assert scheduler.stats()["wal_bytes"] == 0
+    assert scheduler.tick(now=mediodia.replace(hour=23, minute=59, second=30)) is None
+    db.close_all()
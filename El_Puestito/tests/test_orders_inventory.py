@@ -76,6 +76,20 @@ def test_create_order_invalid_quantity(client, api_key, setup_menu_and_inventory
     assert response.status_code == 400
     assert b"Cantidad invalida" in response.data or b"inv\xc3\xa1lida" in response.data
 
+def test_create_order_aggregates_duplicate_lines_for_stock(setup_menu_and_inventory):
+    """Prueba que los renglones repetidos de un mismo producto se suman antes de validar y descontar stock"""
+    order_repo.create_new_order({"numero_mesa": "Mesa 4", "order_id": "UUID-DUP-1", "items": [
+        {"item_id": "ITEM_2_INV", "cantidad": 2}, {"item_id": "ITEM_1", "cantidad": 1}, {"item_id": "ITEM_2_INV", "cantidad": 2}
+    ]})
+    assert db_manager.fetchone("SELECT cantidad FROM inventario WHERE id_menu_vinculado = 'ITEM_2_INV'")["cantidad"] == 1
+
+    with pytest.raises(ValueError, match="Solicitado: 2, Disponible: 1"):
+        order_repo.create_new_order({"numero_mesa": "Mesa 5", "order_id": "UUID-DUP-2", "items": [
+            {"item_id": "ITEM_2_INV", "cantidad": 1}, {"item_id": "ITEM_2_INV", "cantidad": 1}
+        ]})
+    assert db_manager.fetchone("SELECT cantidad FROM inventario WHERE id_menu_vinculado = 'ITEM_2_INV'")["cantidad"] == 1
+    assert db_manager.fetchone("SELECT * FROM ordenes WHERE mesa_key = 'Mesa 5'") is None
+
 def test_split_order_validation(setup_menu_and_inventory):
     """Prueba la validacion de cuentas divididas en la logica del servicio"""
     # Crear orden base
@@ -100,3 +114,518 @@ def test_remove_item_validation(setup_menu_and_inventory):
     # Verificar stock restaurado (tenia 5, se inserto a la mala sin restar, asi que si sumamos 1, debe haber 6)
     inv = db_manager.fetchone("SELECT cantidad FROM inventario WHERE id_menu_vinculado = 'ITEM_2_INV'")
     assert inv['cantidad'] == 6
+
+def test_split_and_remove_apply_all_lines_or_none(setup_menu_and_inventory):
+    """Prueba que dividir y remover validan todos los renglones en una consulta y, si uno falla, no aplican ninguno"""
+    order_repo.create_new_order({"numero_mesa": "8", "order_id": "UUID-S-1", "items": [
+        {"item_id": "ITEM_1", "cantidad": 3}, {"item_id": "ITEM_2_INV", "cantidad": 2}, {"item_id": "ITEM_2_INV", "cantidad": 1}
+    ]})
+    d1, d2, d3 = [i["id_detalle"] for i in order_repo.get_active_orders_caja()["8"]["items"]]
+
+    assert not order_repo.split_order("8", [{"id_detalle": d1, "cantidad": 1}, {"id_detalle": d2, "cantidad": 5}])
+    assert sum(i["cantidad"] for i in order_repo.get_active_orders_caja()["8"]["items"]) == 6
+
+    assert order_repo.split_order("8", [{"id_detalle": d1, "cantidad": 1}, {"id_detalle": d1, "cantidad": 1}, {"id_detalle": d3, "cantidad": 1}])
+    caja = order_repo.get_active_orders_caja()
+    assert [(i["id_detalle"], i["cantidad"]) for i in caja["8"]["items"]] == [(d1, 1), (d2, 2)]
+    assert sorted((i["item_id"], i["cantidad"]) for i in caja["8-1"]["items"]) == [("ITEM_1", 2), ("ITEM_2_INV", 1)]
+
+    with pytest.raises(ValueError):
+        order_repo.remove_items_from_order("8", [{"id_detalle": d2, "cantidad": 1}, {"id_detalle": 999999, "cantidad": 1}])
+    assert db_manager.fetchone("SELECT cantidad FROM inventario WHERE id_menu_vinculado = 'ITEM_2_INV'")["cantidad"] == 2
+
+    assert order_repo.remove_items_from_order("8", [{"id_detalle": d2, "cantidad": 2}, {"id_detalle": d1, "cantidad": 1}])
+    assert db_manager.fetchone("SELECT cantidad FROM inventario WHERE id_menu_vinculado = 'ITEM_2_INV'")["cantidad"] == 4
+    assert sorted(order_repo.get_active_orders_caja()) == ["8-1"]
+
+def test_archiver_moves_old_orders_and_reports_read_both(setup_menu_and_inventory, tmp_path):
+    """Prueba que las ordenes cerradas viejas pasan al historial y los reportes siguen sumandolas"""
+    import datetime
+    from src.database.archive import OrderArchiver, HISTORY_SCHEMA
+
+    hace_200_dias = datetime.datetime.now() - datetime.timedelta(days=200)
+    hace_2_dias = datetime.datetime.now() - datetime.timedelta(days=2)
+    for mesa, fecha in (("Mesa Vieja", hace_200_dias), ("Mesa Reciente", hace_2_dias)):
+        id_orden = db_manager.execute(
+            "INSERT INTO ordenes (mesa_key, estado, fecha_apertura, fecha_cierre, client_uuid, total_centavos, items_count) VALUES (?, 'cerrada', ?, ?, ?, 10000, 2)",
+            (mesa, fecha.isoformat(), fecha.isoformat(), f"UUID-{mesa}")
+        )
+        db_manager.execute(
+            "INSERT INTO orden_detalle (id_orden, id_item_menu, cantidad, precio_unitario_congelado, nombre_congelado, destino, estado_item) VALUES (?, 'ITEM_1', 2, 5000, 'Item Basico', 'cocina', 'listo')",
+            (id_orden,)
+        )
+
+    archiver = OrderArchiver(settings={"retention_days": 90, "batch_size": 1, "history_path": str(tmp_path / "historial.db")})
+    try:
+        assert archiver.run() == 1
+        assert db_manager.fetchone("SELECT COUNT(*) AS n FROM ordenes")["n"] == 1
+        assert db_manager.fetchone("SELECT COUNT(*) AS n FROM orden_detalle")["n"] == 1
+        assert db_manager.has_attachment(HISTORY_SCHEMA)
+
+        total, items = order_repo.get_sales_report(hace_200_dias.date().isoformat())
+        assert total == 100.0
+        assert items[0]["cantidad_total"] == 2
+        historial = order_repo.get_sales_history_range(hace_200_dias.date().isoformat(), hace_2_dias.date().isoformat())
+        assert historial["totales"] == [100.0, 100.0]
+
+        assert archiver.run() == 0
+        with pytest.raises(Exception):
+            db_manager.execute(f"DELETE FROM {HISTORY_SCHEMA}.ordenes")
+    finally:
+        db_manager.detach(HISTORY_SCHEMA)
+        db_manager.get_conn()
+
+def test_archiver_moves_closed_accounts_with_their_orders(setup_menu_and_inventory, tmp_path):
+    """Prueba que las cuentas cerradas viejas se mudan al historial con sus mesas y las abiertas se quedan"""
+    import datetime
+    from src.database.archive import OrderArchiver, HISTORY_SCHEMA, history_union
+
+    vieja = (datetime.datetime.now() - datetime.timedelta(days=200)).isoformat()
+    with db_manager.transaction() as cursor:
+        id_mesa = cursor.execute("INSERT INTO mesas (etiqueta) VALUES ('7');").lastrowid
+        madre = cursor.execute("INSERT INTO cuentas (mesa_key, estado, fecha_apertura, fecha_cierre) VALUES ('7', 'cerrada', ?, ?);", (vieja, vieja)).lastrowid
+        hija = cursor.execute("INSERT INTO cuentas (mesa_key, id_padre, estado, fecha_apertura, fecha_cierre) VALUES ('7', ?, 'cerrada', ?, ?);", (madre, vieja, vieja)).lastrowid
+        abierta = cursor.execute("INSERT INTO cuentas (mesa_key, estado, fecha_apertura) VALUES ('8', 'abierta', ?);", (vieja,)).lastrowid
+        for id_cuenta in (madre, hija):
+            cursor.execute("INSERT INTO cuenta_mesas (id_cuenta, id_mesa) VALUES (?, ?);", (id_cuenta, id_mesa))
+            cursor.execute(
+                "INSERT INTO ordenes (mesa_key, id_cuenta, estado, fecha_apertura, fecha_cierre, client_uuid, total_centavos, items_count) VALUES ('7', ?, 'cerrada', ?, ?, ?, 5000, 1)",
+                (id_cuenta, vieja, vieja, f"UUID-CUENTA-{id_cuenta}")
+            )
+
+    archiver = OrderArchiver(settings={"retention_days": 90, "batch_size": 1, "history_path": str(tmp_path / "historial.db")})
+    try:
+        assert archiver.run() == 2
+        restantes = [r["id_cuenta"] for r in db_manager.fetchall("SELECT id_cuenta FROM cuentas")]
+        assert restantes == [abierta]
+        assert db_manager.fetchone("SELECT COUNT(*) AS n FROM cuenta_mesas")["n"] == 0
+        assert db_manager.fetchone("SELECT etiqueta FROM mesas WHERE id_mesa = ?", (id_mesa,))["etiqueta"] == "7"
+
+        sql, params = history_union(
+            "SELECT c.id_cuenta, m.etiqueta FROM {cuentas} c JOIN {cuenta_mesas} cm ON cm.id_cuenta = c.id_cuenta JOIN {mesas} m ON m.id_mesa = cm.id_mesa"
+        )
+        assert sorted(tuple(r) for r in db_manager.fetchall(sql, params, row_mode="tuple")) == [(madre, "7"), (hija, "7")]
+        assert archiver.run() == 0
+    finally:
+        db_manager.detach(HISTORY_SCHEMA)
+        db_manager.get_conn()
+
+def test_year_report_on_analytics_lane_while_orders_are_created(setup_menu_and_inventory):
+    """Prueba que un reporte de 12 meses corre en el carril de analitica (solo lectura) sin bloquear la creacion de ordenes"""
+    import datetime
+    import sqlite3
+    import threading
+
+    hoy = datetime.datetime.now().replace(hour=13, minute=0, second=0, microsecond=0)
+    with db_manager.transaction() as cursor:
+        for dias in range(365):
+            fecha = (hoy - datetime.timedelta(days=dias)).isoformat()
+            for n in range(4):
+                cursor.execute(
+                    "INSERT INTO ordenes (mesa_key, estado, fecha_apertura, fecha_cierre, client_uuid, total_centavos, items_count) VALUES ('9', 'cerrada', ?, ?, ?, 5000, 1)",
+                    (fecha, fecha, f"HIST-{dias}-{n}")
+                )
+                cursor.execute(
+                    "INSERT INTO orden_detalle (id_orden, id_item_menu, cantidad, precio_unitario_congelado, nombre_congelado, destino, estado_item) VALUES (?, 'ITEM_1', 1, 5000, 'Item Basico', 'cocina', 'listo')",
+                    (cursor.lastrowid,)
+                )
+
+    inicio = (hoy - datetime.timedelta(days=364)).date().isoformat()
+    fin = hoy.date().isoformat()
+    checkouts_antes = db_manager.analytics_pool_stats()["checkouts"]
+    errores, totales = [], []
+    detener = threading.Event()
+
+    def reportes():
+        try:
+            while not detener.is_set():
+                historial = order_repo.get_sales_history_range(inicio, fin)
+                totales.append(sum(historial["totales"]))
+                order_repo.get_top_products_range(inicio, fin)
+        except Exception as e:
+            errores.append(e)
+        finally:
+            db_manager.close_conn_for_thread()
+
+    hilo = threading.Thread(target=reportes)
+    hilo.start()
+    try:
+        for n in range(40):
+            order_repo.create_new_order({"numero_mesa": f"Mesa {n % 5}", "order_id": f"CONC-{n}", "items": [{"item_id": "ITEM_1", "cantidad": 1}]})
+        # Un cursor de analitica a medio consumir no impide que el POS escriba.
+        lectura = db_manager.iterate("SELECT id_orden FROM ordenes WHERE estado = 'cerrada'", lane="analytics", batch_size=1)
+        next(lectura)
+        order_repo.create_new_order({"numero_mesa": "Mesa 9", "order_id": "CONC-LECTURA", "items": [{"item_id": "ITEM_1", "cantidad": 1}]})
+        lectura.close()
+    finally:
+        detener.set()
+        hilo.join()
+
+    assert errores == []
+    assert totales and all(t == 365 * 4 * 50.0 for t in totales)
+    assert db_manager.fetchone("SELECT COUNT(*) AS n FROM ordenes WHERE estado = 'activa'")["n"] == 41
+    assert db_manager.analytics_pool_stats()["checkouts"] > checkouts_antes
+    with pytest.raises(sqlite3.OperationalError):
+        db_manager.fetchall("DELETE FROM ordenes", lane="analytics")
+
+def test_menu_catalog_swaps_snapshot_after_menu_writes(client, api_key, setup_menu_and_inventory):
+    """Prueba que el catalogo en memoria se recarga al escribir en el menu y que las ordenes se validan contra el"""
+    from src.database.menu_catalog import menu_catalog
+
+    anterior = menu_catalog.snapshot()
+    assert menu_catalog.snapshot() is anterior
+    assert anterior.get("ITEM_1").precio == 5000
+    assert "ITEM_1" in anterior.available_ids
+
+    db_manager.execute("UPDATE menu_items SET precio = 5500, disponible = 0 WHERE id_item = 'ITEM_1'")
+    nuevo = menu_catalog.snapshot()
+    assert nuevo is not anterior
+    assert anterior.get("ITEM_1").precio == 5000
+    assert nuevo.get("ITEM_1").precio == 5500
+    assert "ITEM_1" not in nuevo.available_ids
+
+    response = client.get('/menu', headers={"X-API-KEY": api_key})
+    ids = [item["id"] for cat in response.get_json()["categorias"] for item in cat["items"]]
+    assert ids == ["ITEM_2_INV"]
+
+    with pytest.raises(ValueError, match="no esta disponible"):
+        order_repo.create_new_order({"numero_mesa": "Mesa 6", "order_id": "UUID-CAT-1", "items": [{"item_id": "ITEM_1", "cantidad": 1}]})
+
+    db_manager.execute("UPDATE menu_items SET disponible = 1 WHERE id_item = 'ITEM_1'")
+    id_orden = order_repo.create_new_order({"numero_mesa": "Mesa 6", "order_id": "UUID-CAT-2", "items": [{"item_id": "ITEM_1", "cantidad": 1}]})
+    detalle = db_manager.fetchone("SELECT precio_unitario_congelado, destino FROM orden_detalle WHERE id_orden = ?", (id_orden,))
+    assert detalle["precio_unitario_congelado"] == 5500
+    assert detalle["destino"] == "cocina"
+
+def test_menu_endpoint_revalidates_with_etag_and_gzip(client, api_key, setup_menu_and_inventory):
+    """Prueba que /menu responde 304 con el mismo ETag, comprime con gzip y cambia de ETag al editar el menu"""
+    import gzip
+    import json
+
+    headers = {"X-API-KEY": api_key}
+    primera = client.get('/menu', headers={**headers, "Accept-Encoding": "gzip"})
+    assert primera.status_code == 200
+    assert primera.headers["Content-Encoding"] == "gzip"
+    etag = primera.headers["ETag"]
+    menu = json.loads(gzip.decompress(primera.data))
+    assert {item["id"] for cat in menu["categorias"] for item in cat["items"]} == {"ITEM_1", "ITEM_2_INV"}
+
+    revalidacion = client.get('/menu', headers={**headers, "If-None-Match": etag})
+    assert revalidacion.status_code == 304
+    assert revalidacion.data == b""
+
+    sin_gzip = client.get('/menu', headers=headers)
+    assert "Content-Encoding" not in sin_gzip.headers
+    assert sin_gzip.get_json() == menu
+
+    db_manager.execute("UPDATE menu_items SET nombre = 'Item Renombrado' WHERE id_item = 'ITEM_1'")
+    cambiado = client.get('/menu', headers={**headers, "If-None-Match": etag})
+    assert cambiado.status_code == 200
+    assert cambiado.headers["ETag"] != etag
+
+def test_active_orders_store_updates_in_place_and_verifies(setup_menu_and_inventory):
+    """Prueba que el estado de ordenes activas se actualiza por mesa tras cada escritura y se corrige contra SQLite"""
+    from src.database.active_orders import active_orders
+
+    assert order_repo.get_active_orders_caja() == {}
+    rebuilds = active_orders.stats()["rebuilds"]
+
+    id_orden = order_repo.create_new_order({"numero_mesa": "Mesa 7", "order_id": "UUID-AO-1", "items": [
+        {"item_id": "ITEM_1", "cantidad": 2}, {"item_id": "ITEM_2_INV", "cantidad": 1}
+    ]})
+    order_repo.create_new_order({"numero_mesa": "Mesa 8", "order_id": "UUID-AO-2", "items": [{"item_id": "ITEM_1", "cantidad": 1}]})
+    antes = order_repo.get_active_orders_caja()
+    assert antes["Mesa 7"]["id_orden_db"] == id_orden
+    assert [i["cantidad"] for i in antes["Mesa 7"]["items"]] == [2, 1]
+
+    id_detalle = antes["Mesa 7"]["items"][0]["id_detalle"]
+    assert order_repo.mark_individual_item_ready(id_detalle)
+    assert order_repo.update_item_note(id_detalle, "sin cebolla")
+    despues = order_repo.get_active_orders_caja()
+    assert despues is not antes
+    assert despues["Mesa 8"] is antes["Mesa 8"]
+    assert [(i["cantidad"], i["estado_item"]) for i in despues["Mesa 7"]["items"]] == [(1, "pendiente"), (1, "pendiente"), (1, "listo")]
+    assert despues["Mesa 7"]["items"][0]["notas"] == "sin cebolla"
+
+    order_repo.complete_order("Mesa 8")
+    assert list(order_repo.get_active_orders_caja()) == ["Mesa 7"]
+    assert active_orders.stats()["rebuilds"] == rebuilds
+
+    with active_orders.tracking():
+        db_manager.execute("UPDATE orden_detalle SET notas = 'cambio sin registrar' WHERE id_detalle = ?", (id_detalle,))
+    assert active_orders.verify() is False
+    assert order_repo.get_active_orders_caja()["Mesa 7"]["items"][0]["notas"] == "cambio sin registrar"
+    assert active_orders.verify() is True
+
+    db_manager.execute("UPDATE ordenes SET estado = 'cancelada' WHERE id_orden = ?", (id_orden,))
+    assert order_repo.get_active_orders_caja() == {}
+    assert active_orders.stats()["rebuilds"] > rebuilds
+
+def test_mesas_delta_broadcast_with_seq_and_resync(worker, client, api_key, setup_menu_and_inventory):
+    """Prueba que los clientes en modo delta reciben solo las mesas cambiadas con seq y pueden resincronizar"""
+    from src.database.active_orders import active_orders
+
+    delta_client = worker.socketio.test_client(worker.app, query_string=f"api_key={api_key}&mesas=delta")
+    full_client = worker.socketio.test_client(worker.app, query_string=f"api_key={api_key}")
+    headers = {"X-API-KEY": api_key}
+
+    inicial = client.get('/api/mesas/resync', headers=headers).get_json()
+    assert inicial["mesas"] == {} and inicial["epoch"] == active_orders.epoch
+    seq = inicial["seq"]
+
+    for mesa, uuid in (("Mesa 1", "UUID-D-1"), ("Mesa 2", "UUID-D-2")):
+        resp = client.post('/nueva-orden', json={"numero_mesa": mesa, "order_id": uuid, "items": [{"item_id": "ITEM_1", "cantidad": 1}]}, headers=headers)
+        assert resp.status_code == 200
+        worker.broadcaster.flush()
+
+    deltas = [m["args"][0] for m in delta_client.get_received() if m["name"] == "mesas_delta"]
+    assert [list(d["upserts"]) for d in deltas][-1] == ["Mesa 2"]
+    assert deltas[-1]["base_seq"] == deltas[-2]["seq"]
+    completos = [m["args"][0] for m in full_client.get_received() if m["name"] == "mesas_actualizadas"]
+    assert set(completos[-1]) == {"Mesa 1", "Mesa 2"}
+
+    cambios = client.get(f'/api/mesas/resync?since={seq}&epoch={inicial["epoch"]}', headers=headers).get_json()
+    assert set(cambios["upserts"]) == {"Mesa 1", "Mesa 2"} and cambios["seq"] == deltas[-1]["seq"]
+
+    order_repo.cancel_order_by_key("Mesa 1")
+    cambios = client.get(f'/api/mesas/resync?since={deltas[-1]["seq"]}&epoch={inicial["epoch"]}', headers=headers).get_json()
+    assert cambios["deletes"] == ["Mesa 1"] and cambios["upserts"] == {}
+
+    otra_epoch = client.get(f'/api/mesas/resync?since={seq}&epoch=otra', headers=headers).get_json()
+    assert list(otra_epoch["mesas"]) == ["Mesa 2"]
+
+    delta_client.disconnect()
+    full_client.disconnect()
+
+def test_broadcaster_coalesces_events_within_window(worker, client, api_key, setup_menu_and_inventory):
+    """Prueba que varias escrituras en la misma ventana producen un solo kds_update por sala y un solo estado de mesas"""
+    worker.broadcaster.window = 60.0
+    socket_client = worker.socketio.test_client(worker.app, query_string=f"api_key={api_key}&mesas=delta")
+    headers = {"X-API-KEY": api_key}
+
+    for n in range(3):
+        resp = client.post('/nueva-orden', json={"numero_mesa": f"Mesa {n}", "order_id": f"UUID-C-{n}", "items": [{"item_id": "ITEM_1", "cantidad": 1}]}, headers=headers)
+        assert resp.status_code == 200
+    worker.on_internal_emit('mesas_update', {})
+    assert worker.broadcaster.stats()["pending"] == 3
+    worker.broadcaster.stop()
+
+    recibidos = [m["name"] for m in socket_client.get_received()]
+    assert recibidos.count("mesas_delta") == 1
+    stats = worker.broadcaster.stats()
+    assert stats["coalesced"] == 7 and stats["flushes"] == 1 and stats["emitted"] == 3
+    socket_client.disconnect()
+
+def test_broadcaster_flusher_thread_returns_its_connection(clean_db):
+    """Prueba que las ventanas se envian desde un solo hilo que devuelve su conexion al pool tras cada envio"""
+    import threading
+    from src.realtime.broadcaster import CoalescingBroadcaster
+    enviados, hilos = [], set()
+    listo = threading.Event()
+
+    def tarea():
+        hilos.add(threading.get_ident())
+        enviados.append(db_manager.fetchone("SELECT COUNT(*) AS n FROM ordenes")["n"])
+        listo.set()
+
+    broadcaster = CoalescingBroadcaster(lambda *a: None, {"coalesce_window_ms": 5})
+    en_uso = db_manager.pool_stats().get("in_use", 0)
+    for _ in range(3):
+        listo.clear()
+        broadcaster.mark_task(("mesas", None), tarea)
+        assert listo.wait(2.0)
+    broadcaster.stop()
+    assert enviados == [0, 0, 0] and len(hilos) == 1
+    assert db_manager.pool_stats().get("in_use", 0) == en_uso
+
+def test_order_retries_replay_original_outcome(client, api_key, setup_menu_and_inventory):
+    """Prueba que los reintentos de /nueva-orden repiten la respuesta original, incluso concurrentes o tras un reinicio"""
+    import threading
+    from src.database.idempotency import order_idempotency
+    from src.services.order_service import order_service
+
+    antes = order_idempotency.stats()
+    headers = {"X-API-KEY": api_key}
+    orden = {"numero_mesa": "Mesa 3", "order_id": "UUID-IDEM-1", "items": [{"item_id": "ITEM_2_INV", "cantidad": 2}]}
+
+    resultados = []
+    barrera = threading.Barrier(4)
+    def reintento():
+        barrera.wait()
+        resultados.append(order_service.submit_order(orden))
+        db_manager.close_conn_for_thread()
+    hilos = [threading.Thread(target=reintento) for _ in range(4)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    assert sorted(replayed for _, replayed in resultados) == [False, True, True, True]
+    assert len({outcome.id_orden for outcome, _ in resultados}) == 1
+    assert inventory_repo.get_inventario_completo()[0]['cantidad'] == 3
+    assert client.post('/nueva-orden', json=orden, headers=headers).get_json() == {"status": "ok_duplicate"}
+
+    agotada = {"numero_mesa": "Mesa 3", "order_id": "UUID-IDEM-2", "items": [{"item_id": "ITEM_2_INV", "cantidad": 50}]}
+    primera = client.post('/nueva-orden', json=agotada, headers=headers)
+    assert primera.status_code == 400
+    assert client.post('/nueva-orden', json=agotada, headers=headers).get_json() == primera.get_json()
+
+    order_idempotency.clear()
+    assert client.post('/nueva-orden', json=orden, headers=headers).get_json() == {"status": "ok_duplicate"}
+    stats = order_idempotency.stats()
+    assert stats["recovered"] - antes["recovered"] == 1
+    assert stats["replayed"] - antes["replayed"] == 5
+    assert db_manager.fetchone("SELECT COUNT(*) AS n FROM ordenes WHERE client_uuid = 'UUID-IDEM-1'")["n"] == 1
+
+def test_orders_batch_commits_each_order_in_its_own_savepoint(worker, client, api_key, setup_menu_and_inventory):
+    """Prueba que /api/orders/batch procesa un lote con resultados por orden y una sola notificacion"""
+    headers = {"X-API-KEY": api_key}
+    assert client.post('/nueva-orden', json={"numero_mesa": "Mesa 1", "order_id": "UUID-B-0", "items": [{"item_id": "ITEM_1", "cantidad": 1}]}, headers=headers).status_code == 200
+    worker.broadcaster.flush()
+    worker.broadcaster.window = 60.0
+    marcas = worker.broadcaster.stats()["marks"]
+
+    lote = [
+        {"numero_mesa": "Mesa 1", "order_id": "UUID-B-0", "items": [{"item_id": "ITEM_1", "cantidad": 1}]},
+        {"numero_mesa": "Mesa 2", "order_id": "UUID-B-1", "items": [{"item_id": "ITEM_2_INV", "cantidad": 3}]},
+        {"numero_mesa": "Mesa 3", "order_id": "UUID-B-2", "items": [{"item_id": "ITEM_2_INV", "cantidad": 3}]},
+        {"numero_mesa": "Mesa 3", "order_id": "UUID-B-3", "items": [{"item_id": "ITEM_2_INV", "cantidad": 2}, {"item_id": "ITEM_1", "cantidad": 1}]},
+        {"numero_mesa": "Mesa 2", "order_id": "UUID-B-1", "items": [{"item_id": "ITEM_2_INV", "cantidad": 3}]},
+        {"order_id": "UUID-B-4", "items": []},
+    ]
+    resp = client.post('/api/orders/batch', json={"ordenes": lote}, headers=headers)
+    assert resp.status_code == 200
+    resultados = resp.get_json()["resultados"]
+    assert [r["status"] for r in resultados] == ["ok_duplicate", "ok_new", "rejected", "ok_new", "ok_duplicate", "rejected"]
+    assert "Stock insuficiente" in resultados[2]["mensaje"]
+    assert [r["order_id"] for r in resultados] == [o.get("order_id") for o in lote]
+
+    assert inventory_repo.get_inventario_completo()[0]['cantidad'] == 0
+    assert db_manager.fetchone("SELECT COUNT(*) AS n FROM ordenes WHERE client_uuid LIKE 'UUID-B-%'")["n"] == 3
+    assert [len(o["items"]) for o in order_repo.get_active_orders_caja().values()] == [1, 1, 2]
+    assert worker.broadcaster.stats()["marks"] - marcas == 3
+    worker.broadcaster.stop()
+
+def test_orders_batch_rejects_malformed_orders_alone(worker, client, api_key, setup_menu_and_inventory):
+    """Prueba que una orden mal formada dentro del lote se rechaza sola y no revierte las buenas"""
+    lote = [
+        {"numero_mesa": "Mesa 1", "order_id": "UUID-M-0", "items": [{"item_id": "ITEM_1", "cantidad": 1}]},
+        {"numero_mesa": "Mesa 2", "order_id": "UUID-M-1", "items": [{"item_id": ["ITEM_1"], "cantidad": 1}]},
+        {"numero_mesa": "Mesa 3", "order_id": "UUID-M-2", "items": ["ITEM_1"]},
+        {"numero_mesa": "Mesa 4", "order_id": ["UUID-M-3"], "items": []},
+        {"numero_mesa": "Mesa 5", "order_id": "UUID-M-4", "items": [{"item_id": "ITEM_2_INV", "cantidad": 2}]},
+    ]
+    resp = client.post('/api/orders/batch', json={"ordenes": lote}, headers={"X-API-KEY": api_key})
+    assert resp.status_code == 200
+    assert [r["status"] for r in resp.get_json()["resultados"]] == ["ok_new", "rejected", "rejected", "rejected", "ok_new"]
+
+    resultados = order_repo.create_orders_batch([
+        {"numero_mesa": "Mesa 6", "order_id": "UUID-M-5", "items": [{"item_id": "ITEM_1", "cantidad": 1}]},
+        {"order_id": "UUID-M-6", "items": [{"item_id": "ITEM_1", "cantidad": 1}]},
+        "no es una orden",
+    ])
+    assert [r[0] for r in resultados] == ["ok", "rejected", "rejected"]
+    assert sorted(order_repo.get_active_orders_caja()) == ["Mesa 1", "Mesa 5", "Mesa 6"]
+    worker.broadcaster.stop()
+
+def test_order_running_totals_follow_every_write(setup_menu_and_inventory):
+    """Prueba que total_centavos e items_count se mantienen en cada escritura y que el verificador detecta y corrige desviaciones"""
+    import datetime
+
+    def totales(mesa_key):
+        return db_manager.fetchone("SELECT total_centavos, items_count FROM ordenes WHERE mesa_key = ? ORDER BY id_orden DESC", (mesa_key,), row_mode='tuple')
+
+    order_repo.create_new_order({"numero_mesa": "5", "order_id": "UUID-T-1", "items": [
+        {"item_id": "ITEM_1", "cantidad": 3}, {"item_id": "ITEM_2_INV", "cantidad": 2}
+    ]})
+    assert totales("5") == (27000, 5)
+    assert order_repo.get_active_orders_caja()["5"]["total"] == 270.0
+
+    items = {i["item_id"]: i["id_detalle"] for i in order_repo.get_active_orders_caja()["5"]["items"]}
+    assert order_repo.split_order("5", [{"id_detalle": items["ITEM_1"], "cantidad": 1}], new_account_name="Ana")
+    assert totales("5") == (22000, 4) and totales("5-Ana") == (5000, 1)
+
+    assert order_repo.remove_items_from_order("5", [{"id_detalle": items["ITEM_2_INV"], "cantidad": 1}])
+    assert totales("5") == (16000, 3)
+
+    order_repo.create_new_order({"numero_mesa": "6", "order_id": "UUID-T-2", "items": [{"item_id": "ITEM_1", "cantidad": 1}]})
+    assert order_repo.cancel_order_by_key("6")
+    assert totales("6") == (0, 0)
+
+    order_repo.complete_order("5-Ana")
+    order_repo.complete_order("5")
+    assert order_repo.check_order_totals() == []
+    total, _ = order_repo.get_sales_report(datetime.date.today().isoformat())
+    assert total == 210.0
+
+    db_manager.execute("UPDATE ordenes SET total_centavos = 1 WHERE mesa_key = '5'")
+    drift = order_repo.check_order_totals(repair=True)
+    assert [(r["mesa_key"], r["total_centavos"], r["total_real"]) for r in drift] == [("5", 1, 16000)]
+    assert order_repo.check_order_totals() == []
+
+def test_group_accounts_split_and_close_parent_by_id(setup_menu_and_inventory):
+    """Prueba que grupos y subcuentas viven en cuentas/cuenta_mesas y que cerrar la ultima subcuenta cierra la madre vacia"""
+    order_repo.create_new_order({"numero_mesa": "2", "mesas_enlazadas": ["1"], "order_id": "UUID-G-1", "items": [
+        {"item_id": "ITEM_1", "cantidad": 2}, {"item_id": "ITEM_2_INV", "cantidad": 1}
+    ]})
+    caja = order_repo.get_active_orders_caja()
+    assert caja["1+2"]["cuenta"]["mesas"] == ["1", "2"] and caja["1+2"]["cuenta"]["es_grupo"]
+
+    items = {i["item_id"]: i["id_detalle"] for i in caja["1+2"]["items"]}
+    assert order_repo.split_order("1+2", [{"id_detalle": items["ITEM_1"], "cantidad": 2}])
+    assert order_repo.split_order("1+2", [{"id_detalle": items["ITEM_2_INV"], "cantidad": 1}])
+    caja = order_repo.get_active_orders_caja()
+    assert sorted(caja) == ["1+2", "1+2-1", "1+2-2"]
+    madre = db_manager.fetchone("SELECT id_cuenta FROM cuentas WHERE mesa_key = '1+2'")["id_cuenta"]
+    assert [caja[k]["cuenta"]["id_padre"] for k in ("1+2-1", "1+2-2")] == [madre, madre]
+
+    # Dividir una subcuenta crea una hermana colgando de la misma madre, no una nieta.
+    sub_item = caja["1+2-1"]["items"][0]["id_detalle"]
+    assert order_repo.split_order("1+2-1", [{"id_detalle": sub_item, "cantidad": 1}], new_account_name="Ana")
+    assert order_repo.get_active_orders_caja()["1+2-Ana"]["cuenta"]["id_padre"] == madre
+
+    for key in ("1+2-1", "1+2-2"):
+        order_repo.complete_order(key)
+    assert "1+2" in order_repo.get_active_orders_caja()
+    order_repo.complete_order("1+2-Ana")
+    assert order_repo.get_active_orders_caja() == {}
+    assert db_manager.fetchone("SELECT COUNT(*) AS n FROM cuentas WHERE estado = 'abierta'")["n"] == 0
+
+def test_legacy_orders_without_account_are_adopted(setup_menu_and_inventory):
+    """Prueba que una orden activa sin id_cuenta se muestra por su mesa_key y se asocia a una cuenta al dividirla"""
+    db_manager.execute("INSERT INTO ordenes (id_orden, mesa_key, fecha_apertura, client_uuid, total_centavos, items_count) VALUES (50, '3+4', '2026-01-01', 'LEGACY-1', 10000, 2)")
+    db_manager.execute("""
+        INSERT INTO orden_detalle (id_detalle, id_orden, id_item_menu, cantidad, precio_unitario_congelado, nombre_congelado, destino)
+        VALUES (500, 50, 'ITEM_1', 2, 5000, 'Item Basico', 'cocina')
+    """)
+    assert order_repo.get_active_orders_caja()["3+4"]["cuenta"] == {"id_cuenta": None, "nombre": None, "id_padre": None, "mesas": ["3", "4"], "es_grupo": True}
+
+    assert order_repo.split_order("3+4", [{"id_detalle": 500, "cantidad": 1}])
+    caja = order_repo.get_active_orders_caja()
+    assert caja["3+4"]["cuenta"]["id_cuenta"] == caja["3+4-1"]["cuenta"]["id_padre"] is not None
+
+def test_kds_marks_units_and_lines_in_one_request(client, worker, setup_menu_and_inventory):
+    """Prueba que el KDS marca N unidades y varios renglones en una peticion, con una sola notificacion"""
+    order_repo.create_new_order({"numero_mesa": "4", "order_id": "UUID-K-1", "items": [
+        {"item_id": "ITEM_1", "cantidad": 6}, {"item_id": "ITEM_2_INV", "cantidad": 2}
+    ]})
+    d1, d2 = [i["id_detalle"] for i in order_repo.get_active_orders_caja()["4"]["items"]]
+    with client.session_transaction() as sess:
+        sess['kds_access'] = 'cocina'
+
+    marcas = worker.broadcaster.stats()["marks"]
+    response = client.post('/api/kds-complete', json={"destino": "cocina", "items": [{"id_detalle": d1, "cantidad": 4}, {"id_detalle": d2}]})
+    assert response.status_code == 200
+    assert worker.broadcaster.stats()["marks"] - marcas == 2
+    estados = db_manager.fetchall("SELECT id_item_menu, cantidad, estado_item FROM orden_detalle ORDER BY id_detalle", row_mode='tuple')
+    assert estados == [("ITEM_1", 2, "pendiente"), ("ITEM_2_INV", 2, "listo"), ("ITEM_1", 4, "listo")]
+    assert order_repo.get_active_orders_caja()["4"]["total"] == 420.0
+
+    assert client.post('/api/kds-complete', json={"destino": "cocina", "items": [{"id_detalle": d1, "cantidad": 0}]}).status_code == 400
+    assert client.post('/api/kds-complete', json={"destino": "cocina", "items": [{"id_detalle": d2}]}).status_code == 409
+
+    # Pedir mas de lo pendiente marca lo que queda; un destino ajeno no toca el renglon.
+    assert order_repo.mark_items_ready([{"id_detalle": d1, "cantidad": 1}], destino="barra") == (0, [])
+    assert order_repo.mark_items_ready([{"id_detalle": d1, "cantidad": 10}]) == (2, ["4"])
+    assert order_repo.get_active_cocina_orders() == []
+    worker.broadcaster.stop()
@@ -0,0 +1,66 @@
+import datetime
+import pytest
+from src.database.connection import db_manager
+from src.database.repositories.orders import order_repo
+from src.database.repositories.attendance import attendance_repo
+
+@pytest.fixture
+def captured_queries(monkeypatch):
+    capturadas = []
+    fetchone, fetchall, iterate = db_manager.fetchone, db_manager.fetchall, db_manager.iterate
+
+    def capturar(original):
+        def wrapper(query, params=(), **kwargs):
+            capturadas.append((query, params))
+            return original(query, params, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(db_manager, "fetchone", capturar(fetchone))
+    monkeypatch.setattr(db_manager, "fetchall", capturar(fetchall))
+    monkeypatch.setattr(db_manager, "iterate", capturar(iterate))
+    return capturadas
+
+def query_plan(query, params):
+    rows = db_manager.get_conn().execute(f"EXPLAIN QUERY PLAN {query.strip().rstrip(';')}", params).fetchall()
+    return [row[3] for row in rows]
+
+def test_sales_reports_use_estado_fecha_cierre_index(captured_queries):
+    """Prueba que los reportes de ventas buscan por rango en el indice (estado, fecha_cierre) en lugar de recorrer ordenes"""
+    hoy = datetime.date.today().isoformat()
+    order_repo.get_sales_report(hoy)
+    order_repo.get_sales_history_range(hoy, hoy)
+    order_repo.get_top_products_range(hoy, hoy)
+
+    assert len(captured_queries) == 4
+    for query, params in captured_queries:
+        plan = query_plan(query, params)
+        assert any("idx_ordenes_estado_fecha_cierre (estado=? AND fecha_cierre>? AND fecha_cierre<?)" in paso for paso in plan), plan
+        assert not any(paso.startswith("SCAN o") for paso in plan), plan
+
+def test_attendance_ranges_use_timestamp_index(captured_queries):
+    """Prueba que las consultas de asistencia por dia o por rango no envuelven timestamp en DATE()"""
+    attendance_repo.get_events_for_today()
+    attendance_repo.get_attendance_history_range("2026-01-01", "2026-01-16")
+
+    for query, params in captured_queries:
+        plan = query_plan(query, params)
+        assert any("timestamp>? AND timestamp<?" in paso for paso in plan), plan
+
+def test_active_order_lookups_use_partial_indexes(captured_queries):
+    """Prueba que KDS y la busqueda de mesa activa usan los indices parciales y no los de todo el historial"""
+    order_repo.get_active_cocina_orders()
+    query, params = captured_queries[0]
+    plan = query_plan(query, params)
+    assert any("idx_detalle_pendiente_destino (destino=?)" in paso for paso in plan), plan
+
+    plan = query_plan("SELECT id_orden FROM ordenes WHERE mesa_key = ? AND estado = 'activa'", ("1",))
+    assert plan == ["SEARCH ordenes USING INDEX idx_ordenes_activas_mesa (mesa_key=?)"]
+
+def test_account_lookups_are_point_queries():
+    """Prueba que buscar la cuenta abierta, sus subcuentas y la orden de una cuenta usan indices parciales"""
+    plan = query_plan("SELECT * FROM cuentas WHERE mesa_key = ? AND estado = 'abierta'", ("1",))
+    assert plan == ["SEARCH cuentas USING INDEX idx_cuentas_abiertas_key (mesa_key=?)"]
+    plan = query_plan("SELECT id_cuenta, nombre FROM cuentas WHERE id_padre = ? AND estado = 'abierta'", (1,))
+    assert plan == ["SEARCH cuentas USING INDEX idx_cuentas_padre_abiertas (id_padre=?)"]
+    plan = query_plan("SELECT id_orden, items_count FROM ordenes WHERE id_cuenta = ? AND estado = 'activa'", (1,))
+    assert plan == ["SEARCH ordenes USING INDEX idx_ordenes_activas_cuenta (id_cuenta=?)"]
@@ -57,3 +57,10 @@ def test_xss_protection_in_order_notes(client, api_key):
     # Como el item NO_EXISTE fallara en validacion de producto o inventario, 
     # comprobamos que no devuelva un error SQL (500)
     assert response.status_code == 400 or response.status_code == 500 # Si el item no existe, el codigo original de orders.py devuelve error 400
+
+def test_db_diagnostics_requires_api_key(client, api_key):
+    """Prueba que las estadisticas de consultas solo se exponen con X-API-KEY"""
+    assert client.get('/api/diagnostics/db').status_code == 401
+    response = client.get('/api/diagnostics/db', headers={'X-API-KEY': api_key})
+    assert response.status_code == 200
+    assert "queries" in response.json and "pool" in response.json
@@ -81,19 +81,11 @@ class TablesTab(QWidget):
         for card in self.table_widgets.values():
             card.set_status(False)
             
-        for mesa_key in ordenes_activas.keys():
-            if '+' in mesa_key:
-                mesas_agrupadas = mesa_key.split('+')
-                for m in mesas_agrupadas:
-                    if m in self.table_widgets:
-                        self.table_widgets[m].set_status(True)
-            elif '-' in mesa_key:
-                base_mesa = mesa_key.split('-')[0]
-                if base_mesa in self.table_widgets:
-                    self.table_widgets[base_mesa].set_status(True)
-            else:
-                if mesa_key in self.table_widgets:
-                    self.table_widgets[mesa_key].set_status(True)
+        for mesa_key, orden in ordenes_activas.items():
+            mesas = orden.get('cuenta', {}).get('mesas') or [mesa_key]
+            for m in mesas:
+                if m in self.table_widgets:
+                    self.table_widgets[m].set_status(True)
 
     def add_table(self):
         current_total = self.current_config.get("total_mesas", 10)
@@ -222,7 +222,7 @@ class CajaPage(QWidget):
             
             a_agregar = ids_bd - ids_pantalla
             for key in a_agregar:
-                display_text = self._formatear_nombre_mesa(key)
+                display_text = self._formatear_nombre_mesa(key, nuevas_ordenes[key].get('cuenta'))
                 btn = MesaCard(display_text, key)
                 self.mesas_button_group.addButton(btn)
                 self.botones_mesas[key] = btn
@@ -257,20 +257,17 @@ class CajaPage(QWidget):
         finally:
             self.mesas_container.setUpdatesEnabled(True)
 
-    def _formatear_nombre_mesa(self, mesa_key):
+    def _formatear_nombre_mesa(self, mesa_key, cuenta=None):
+        cuenta = cuenta or {}
         base_key = mesa_key
         suffix = ""
-        
-        if "-" in mesa_key:
-            try:
-                parts = mesa_key.rsplit('-', 1)
-                if len(parts) == 2 and parts[1].isdigit():
-                    base_key = parts[0]
-                    suffix = f"\n(Sub {parts[1]})"
-            except Exception as e: 
-                logger.warning(f"Error al formatear nombre: {e}")
 
-        prefix = "Grupo" if "+" in base_key else "Mesa"
+        nombre = cuenta.get('nombre')
+        if nombre and str(nombre).isdigit():
+            base_key = "+".join(cuenta.get('mesas') or [mesa_key])
+            suffix = f"\n(Sub {nombre})"
+
+        prefix = "Grupo" if cuenta.get('es_grupo', "+" in base_key) else "Mesa"
         return f"{prefix} {base_key}{suffix}"
 
     def al_seleccionar_mesa(self, button):
@@ -317,7 +314,7 @@ class CajaPage(QWidget):
             self.tabla_cuenta.setItem(row, 2, item_price)
             self.tabla_cuenta.setItem(row, 3, item_sub)
             
-        self.total_label.setText(f"C$ {total:,.2f}")
+        self.total_label.setText(f"C$ {orden.get('total', total):,.2f}")
         self.tabla_cuenta.setUpdatesEnabled(True)
 
     def _preparar_datos_orden(self, mesa_key):
@@ -326,9 +323,13 @@ class CajaPage(QWidget):
             return None
             
         items = orden.get('items', [])
-        total = sum(item['cantidad'] * item['precio_unitario'] for item in items)
+        total = orden.get('total')
+        if total is None:
+            total = sum(item['cantidad'] * item['precio_unitario'] for item in items)
         
         return {
+            'mesa_key': mesa_key,
+            'cuenta': orden.get('cuenta'),
             'items': items,
             'total': total
         }
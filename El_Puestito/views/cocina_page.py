@@ -74,16 +74,16 @@ class CocinaPage(QWidget):
         try:
             ticket_widget = OrderTicket(datos) 
             ticket_widget.btn_listo.clicked.connect(lambda: self._marcar_listo(key))
-            ticket_widget.item_marcado_listo.connect(lambda id_detalle, k=key: self._marcar_item_individual(id_detalle, k))
+            ticket_widget.items_marcados_listos.connect(lambda lineas, k=key: self._marcar_items(lineas, k))
             self.tickets_en_pantalla[key] = ticket_widget
         except Exception as e:
             logger.error(f"Error instanciando widget de orden {key}: {e}")
 
-    def _marcar_item_individual(self, id_detalle, mesa_key):
+    def _marcar_items(self, lineas, mesa_key):
         try:
-            self.controller.procesar_item_individual_listo(id_detalle, mesa_key, "cocina")
+            self.controller.procesar_items_listos(lineas, mesa_key, "cocina")
         except Exception as e:
-            logger.error(f"Error al marcar como listo el item individual {id_detalle} de la comanda {mesa_key}: {e}")
+            logger.error(f"Error al marcar como listos los items {lineas} de la comanda {mesa_key}: {e}")
 
     def _eliminar_widget_memoria(self, key):
         if key in self.tickets_en_pantalla:
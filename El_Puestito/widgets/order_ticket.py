@@ -4,16 +4,25 @@ from PyQt6.QtWidgets import (
     QWidget
 )
 from PyQt6.QtGui import QPixmap
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import Qt, pyqtSignal, QTimer
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Toques seguidos de ✓ se acumulan y se envian juntos cuando pasa esta pausa.
+VENTANA_AGRUPAR_MS = 800
+
 class OrderTicket(QFrame):
-    item_marcado_listo = pyqtSignal(int)
+    # [{'id_detalle': int, 'cantidad': int}]: todas las unidades marcadas en la ventana.
+    items_marcados_listos = pyqtSignal(list)
 
     def __init__(self, orden_data, parent=None):
         super().__init__(parent)
         self.datos = orden_data 
+        self._pendientes = {}
+        self._timer_envio = QTimer(self)
+        self._timer_envio.setSingleShot(True)
+        self._timer_envio.setInterval(VENTANA_AGRUPAR_MS)
+        self._timer_envio.timeout.connect(self._enviar_pendientes)
         self.setObjectName("order_ticket")
         self.setFixedWidth(300)
         
@@ -105,9 +114,32 @@ class OrderTicket(QFrame):
             if child.widget():
                 child.widget().deleteLater()
 
-        for item in self.datos.get('items', []):
+        items = self.datos.get('items', [])
+        cantidades = {item.get('id_detalle'): item.get('cantidad', 1) for item in items}
+        self._pendientes = {k: min(v, cantidades[k]) for k, v in self._pendientes.items() if k in cantidades}
+        self._titulos = {}
+        for item in items:
             self._add_item_row(self.items_layout, item)
 
+    def _marcar_unidades(self, id_detalle, cantidad, total):
+        self._pendientes[id_detalle] = min(total, self._pendientes.get(id_detalle, 0) + cantidad)
+        self._actualizar_titulo(id_detalle)
+        self._timer_envio.start()
+
+    def _enviar_pendientes(self):
+        lineas = [{'id_detalle': k, 'cantidad': v} for k, v in self._pendientes.items() if v > 0]
+        self._pendientes = {}
+        if lineas:
+            self.items_marcados_listos.emit(lineas)
+
+    def _actualizar_titulo(self, id_detalle):
+        entrada = self._titulos.get(id_detalle)
+        if entrada is None:
+            return
+        title, texto = entrada
+        marcadas = self._pendientes.get(id_detalle, 0)
+        title.setText(f"{texto}  (✓{marcadas})" if marcadas else texto)
+
     def _add_item_row(self, layout, item):
         row_widget = QWidget()
         row_layout = QHBoxLayout(row_widget)
@@ -150,6 +182,9 @@ class OrderTicket(QFrame):
         title.setWordWrap(True)
         title.setStyleSheet("font-weight: bold; font-size: 15px; color: #fff;")
         info_layout.addWidget(title)
+        id_detalle = item.get('id_detalle', -1)
+        self._titulos[id_detalle] = (title, f"{qty}x  {name}")
+        self._actualizar_titulo(id_detalle)
         
         cerveza = item.get('nombre_cerveza')
         if cerveza:
@@ -167,10 +202,7 @@ class OrderTicket(QFrame):
             
         row_layout.addWidget(info_container)
 
-        btn_indiv = QPushButton("✓")
-        btn_indiv.setFixedSize(35, 35)
-        btn_indiv.setCursor(Qt.CursorShape.PointingHandCursor)
-        btn_indiv.setStyleSheet("""
+        estilo_boton = """
             QPushButton {
                 background-color: #333;
                 color: #00d26a;
@@ -187,11 +219,20 @@ class OrderTicket(QFrame):
                 background-color: #00d26a;
                 color: black;
             }
-        """)
-        
-        id_detalle = item.get('id_detalle', -1)
-        btn_indiv.clicked.connect(lambda checked, id_d=id_detalle: self.item_marcado_listo.emit(id_d))
-        
+        """
+        btn_indiv = QPushButton("✓")
+        btn_indiv.setFixedSize(35, 35)
+        btn_indiv.setCursor(Qt.CursorShape.PointingHandCursor)
+        btn_indiv.setStyleSheet(estilo_boton)
+        btn_indiv.clicked.connect(lambda checked, id_d=id_detalle, q=qty: self._marcar_unidades(id_d, 1, q))
         row_layout.addWidget(btn_indiv)
+
+        if qty > 1:
+            btn_todas = QPushButton(f"✓{qty}")
+            btn_todas.setFixedSize(45, 35)
+            btn_todas.setCursor(Qt.CursorShape.PointingHandCursor)
+            btn_todas.setStyleSheet(estilo_boton)
+            btn_todas.clicked.connect(lambda checked, id_d=id_detalle, q=qty: self._marcar_unidades(id_d, q, q))
+            row_layout.addWidget(btn_todas)
         
         layout.addWidget(row_widget)
\ No newline at end of file
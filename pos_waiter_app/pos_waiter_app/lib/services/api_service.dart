@@ -130,13 +130,27 @@ class ApiService {
     }
   }
 
+  // Ultimo menu recibido y su ETag: el servidor responde 304 si no ha cambiado.
+  static String? _menuEtag;
+  static String? _menuUrl;
+  static Map<String, dynamic>? _menuCache;
+
   Future<Map<String, dynamic>?> getMenu() async {
     final baseUrl = await getServerUrl();
     if (baseUrl == null) return null;
     try {
       final headers = await _getHeaders();
+      if (_menuEtag != null && _menuCache != null && _menuUrl == baseUrl) {
+        headers['If-None-Match'] = _menuEtag!;
+      }
       final response = await http.get(Uri.parse('$baseUrl/menu'), headers: headers);
-      return (response.statusCode == 200) ? json.decode(response.body) : null;
+      if (response.statusCode == 304) return _menuCache;
+      if (response.statusCode != 200) return null;
+      final menu = json.decode(utf8.decode(response.bodyBytes)) as Map<String, dynamic>;
+      _menuCache = menu;
+      _menuEtag = response.headers['etag'];
+      _menuUrl = baseUrl;
+      return menu;
     } catch (e) {
       return null;
     }
@@ -165,6 +179,27 @@ class ApiService {
     }
   }
 
+  // Envia varias ordenes encoladas en una sola peticion. Devuelve un resultado por orden
+  // (status ok_new / ok_duplicate / rejected) o null si el servidor no respondio.
+  Future<List<Map<String, dynamic>>?> enviarOrdenesLote(List<Map<String, dynamic>> ordenes) async {
+    final baseUrl = await getServerUrl();
+    if (baseUrl == null) return null;
+
+    try {
+      final headers = await _getHeaders();
+      final response = await http.post(
+        Uri.parse('$baseUrl/api/orders/batch'),
+        headers: headers,
+        body: json.encode({'ordenes': ordenes}),
+      );
+      if (response.statusCode != 200) return null;
+      final body = json.decode(utf8.decode(response.bodyBytes));
+      return List<Map<String, dynamic>>.from(body['resultados']);
+    } catch (_) {
+      return null;
+    }
+  }
+
   Future<Map<String, dynamic>?> getConfiguracion() async {
     final baseUrl = await getServerUrl();
     if (baseUrl == null) return null;
@@ -184,4 +219,20 @@ class ApiService {
       return (response.statusCode == 200) ? json.decode(response.body) : null;
     } catch (_) { return null; }
   }
+
+  Future<Map<String, dynamic>?> resyncMesas({int? since, String? epoch}) async {
+    final baseUrl = await getServerUrl();
+    if (baseUrl == null) return null;
+    try {
+      final headers = await _getHeaders();
+      final params = <String, String>{};
+      if (since != null && epoch != null) {
+        params['since'] = since.toString();
+        params['epoch'] = epoch;
+      }
+      final uri = Uri.parse('$baseUrl/api/mesas/resync').replace(queryParameters: params.isEmpty ? null : params);
+      final response = await http.get(uri, headers: headers);
+      return (response.statusCode == 200) ? json.decode(utf8.decode(response.bodyBytes)) : null;
+    } catch (_) { return null; }
+  }
 }
\ No newline at end of file
@@ -9,6 +9,9 @@ class SocketService with ChangeNotifier {
   IO.Socket? _socket;
   bool _isConnected = false;
   Map<String, dynamic> _mesasState = {}; 
+  int _mesasSeq = 0;
+  String? _mesasEpoch;
+  bool _resyncEnCurso = false;
   final ApiService _apiService = ApiService();
 
   bool get isConnected => _isConnected;
@@ -30,13 +33,73 @@ class SocketService with ChangeNotifier {
   }
 
   Future<void> _fetchInitialData() async {
-    final data = await _apiService.getEstadoMesas();
-    if (data != null) {
-      _mesasState = data;
+    final data = await _apiService.resyncMesas();
+    if (data != null && data['mesas'] is Map) {
+      _aplicarSnapshot(data);
+      return;
+    }
+    final legacy = await _apiService.getEstadoMesas();
+    if (legacy != null) {
+      _mesasState = legacy;
       notifyListeners(); 
     }
   }
 
+  void _aplicarSnapshot(Map<String, dynamic> data) {
+    _mesasState = Map<String, dynamic>.from(data['mesas'] as Map);
+    _mesasSeq = (data['seq'] as num?)?.toInt() ?? 0;
+    _mesasEpoch = data['epoch']?.toString();
+    notifyListeners();
+  }
+
+  void _aplicarDelta(Map<String, dynamic> delta) {
+    final nuevoEstado = Map<String, dynamic>.from(_mesasState);
+    for (final mesaKey in (delta['deletes'] as List? ?? const [])) {
+      nuevoEstado.remove(mesaKey.toString());
+    }
+    final upserts = delta['upserts'];
+    if (upserts is Map) {
+      upserts.forEach((mesaKey, orden) => nuevoEstado[mesaKey.toString()] = orden);
+    }
+    _mesasState = nuevoEstado;
+    _mesasSeq = (delta['seq'] as num?)?.toInt() ?? _mesasSeq;
+    notifyListeners();
+  }
+
+  void _onMesasDelta(dynamic data) {
+    if (data is! Map) return;
+    final delta = Map<String, dynamic>.from(data);
+    final epoch = delta['epoch']?.toString();
+    final seq = (delta['seq'] as num?)?.toInt() ?? 0;
+
+    if (delta['reset'] == true) {
+      _aplicarSnapshot({'epoch': epoch, 'seq': seq, 'mesas': delta['upserts'] ?? {}});
+      return;
+    }
+    if (epoch == _mesasEpoch && seq <= _mesasSeq) return;
+    if (epoch != _mesasEpoch || (delta['base_seq'] as num?)?.toInt() != _mesasSeq) {
+      _resincronizarMesas();
+      return;
+    }
+    _aplicarDelta(delta);
+  }
+
+  Future<void> _resincronizarMesas() async {
+    if (_resyncEnCurso) return;
+    _resyncEnCurso = true;
+    try {
+      final data = await _apiService.resyncMesas(since: _mesasSeq, epoch: _mesasEpoch);
+      if (data == null) return;
+      if (data['mesas'] is Map) {
+        _aplicarSnapshot(data);
+      } else if ((data['base_seq'] as num?)?.toInt() == _mesasSeq) {
+        _aplicarDelta(data);
+      }
+    } finally {
+      _resyncEnCurso = false;
+    }
+  }
+
   void _mostrarAlertaSuperior(String mensaje) {
     try {
       globalMessengerKey.currentState?.hideCurrentSnackBar();
@@ -89,12 +152,14 @@ class SocketService with ChangeNotifier {
       _socket = IO.io(serverUrl, <String, dynamic>{
         'transports': ['websocket'],
         'autoConnect': true,
-        'query': {'api_key': apiKey},
+        'query': {'api_key': apiKey, 'mesas': 'delta'},
       });
 
       _socket!.onConnect((_) {
         _isConnected = true;
         notifyListeners();
+        // Pudo perder deltas mientras estuvo desconectado.
+        _resincronizarMesas();
       });
 
       _socket!.onDisconnect((_) {
@@ -102,12 +167,7 @@ class SocketService with ChangeNotifier {
         notifyListeners();
       });
 
-      _socket!.on('mesas_actualizadas', (data) {
-        if (data is Map<String, dynamic>) {
-          _mesasState = data;
-          notifyListeners(); 
-        }
-      });
+      _socket!.on('mesas_delta', _onMesasDelta);
 
       _socket!.on('menu_actualizado', (_) => _menuController.add(null));
 